@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from api import db
+
+        request_finished.connect(db.close_dead_threads, dispatch_uid='api.db.close_dead_threads')
@@ -0,0 +1,49 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from common.permissions import JWTAuthentication
+from restaurant_web import checkout
+
+
+class Checkout(APIView):
+    """
+    Сагснаас захиалга үүсгэх
+
+    POST /api/checkout/
+        Header: Idempotency-Key: <unique key>   (давтан илгээвэл эхний хариуг буцаана)
+        Body: {
+            "location": "...",
+            "payment_method": "cash|card|qpay",
+            "coupon_code": "SALE10",      (optional)
+            "zone_id": 1                  (DeliveryPrice, optional)
+        }
+    """
+    authentication_classes = [JWTAuthentication]
+
+    def post(self, request):
+        user_id = getattr(request.user, 'id', None)
+        if not user_id:
+            return Response({'error': 'authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        location = (request.data.get('location') or '').strip()
+        if not location:
+            return Response({'error': 'location шаардлагатай'}, status=status.HTTP_400_BAD_REQUEST)
+        zone_id = request.data.get('zone_id')
+        if zone_id not in (None, ''):
+            try:
+                zone_id = int(zone_id)
+            except (TypeError, ValueError):
+                return Response({'error': 'zone_id бүхэл тоо байх ёстой'}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = checkout.checkout(
+            user_id,
+            location,
+            payment_method=request.data.get('payment_method') or 'cash',
+            coupon_code=request.data.get('coupon_code') or None,
+            zone_id=zone_id or None,
+            idempotency_key=request.headers.get('Idempotency-Key'),
+        )
+        response = Response(result.data, status=status.HTTP_200_OK if result.replayed else status.HTTP_201_CREATED)
+        if result.replayed:
+            response['Idempotent-Replayed'] = 'true'
+        return response
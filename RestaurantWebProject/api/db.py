@@ -1,10 +1,113 @@
+import atexit
 import sqlite3
+import threading
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
+DB_PATH = BASE_DIR / 'db_api.sqlite3'
+
+# Connection tuning for the legacy SQLite store
+BUSY_TIMEOUT = 5.0                # seconds to wait on a locked database
+MMAP_SIZE = 64 * 1024 * 1024      # read pages through a memory map
+CACHED_STATEMENTS = 256           # prepared statements kept per connection
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_registry = {}                    # connection -> the thread that opened it
+_wal_lock = threading.Lock()
+_wal_ready = False
+
+
+def _ensure_wal():
+    """Switch the database file to WAL once so readers never block the writer."""
+    global _wal_ready
+    if _wal_ready:
+        return
+    with _wal_lock:
+        if not _wal_ready:
+            conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+            finally:
+                conn.close()
+            _wal_ready = True
+
+
+def _connect(readonly):
+    _ensure_wal()
+    # only the owning thread uses a connection; check_same_thread is off so
+    # close_dead_threads() can close it once that thread is gone
+    if readonly:
+        conn = sqlite3.connect(
+            f'{DB_PATH.as_uri()}?mode=ro', uri=True, check_same_thread=False,
+            timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS,
+        )
+        conn.execute('PRAGMA query_only = ON')
+    else:
+        conn = sqlite3.connect(
+            DB_PATH, check_same_thread=False,
+            timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS,
+        )
+        conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    with _registry_lock:
+        _registry[conn] = threading.current_thread()
+    return conn
+
+
+def get_db(readonly=False):
+    """Return this thread's pooled sqlite3 connection to the API database.
+
+    Connections are opened once per thread and reused across requests, so
+    sqlite's prepared-statement cache stays warm. Pass ``readonly=True`` for
+    query-only paths; they get a separate ``mode=ro`` connection.
+    Do not close the returned connection, use `close_db()`. Connections of
+    threads that have exited are closed after each request, see
+    `close_dead_threads()`.
+    """
+    attr = 'reader' if readonly else 'writer'
+    conn = getattr(_local, attr, None)
+    if conn is None:
+        conn = _connect(readonly)
+        setattr(_local, attr, conn)
+    return conn
+
+
+def close_db():
+    """Close the current thread's connections (e.g. before a worker thread exits)."""
+    for attr in ('reader', 'writer'):
+        conn = getattr(_local, attr, None)
+        if conn is not None:
+            setattr(_local, attr, None)
+            with _registry_lock:
+                _registry.pop(conn, None)
+            conn.close()
+
+
+def close_dead_threads(**kwargs):
+    """Close the connections of threads that have exited.
+
+    Connected to `request_finished` (see ApiConfig.ready). Closing every
+    connection after each request would throw away the statement cache,
+    but servers that run a thread per request (runserver, some thread
+    pools) would otherwise leave one open connection per finished thread.
+    """
+    with _registry_lock:
+        dead = [conn for conn, thread in _registry.items() if not thread.is_alive()]
+        for conn in dead:
+            del _registry[conn]
+    for conn in dead:
+        conn.close()
+
+
+@atexit.register
+def close_all():
+    with _registry_lock:
+        conns = list(_registry)
+        _registry.clear()
+    for conn in conns:
+        conn.close()
 
-def get_db():
-    return sqlite3.connect(BASE_DIR / 'db_api.sqlite3')
 
 def auth_db():
     """Compatibility alias used by views that import `auth_db`.
@@ -1,3 +1,5 @@
+from contextlib import closing
+
 from api.db import get_db
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -5,6 +7,13 @@ from rest_framework import status
 from common.permissions import JWTAuthentication
 
 
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+# Kept as a constant so sqlite reuses the prepared statement
+MENU_PAGE_SQL = "SELECT id, name, price FROM menu WHERE id > ? ORDER BY id LIMIT ?"
+
+
 class Menu(APIView):
     authentication_classes = [JWTAuthentication]
 
@@ -13,11 +22,22 @@ class Menu(APIView):
         if not getattr(request, 'user', None):
             return Response({'error': 'authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        db = get_db()
-        cur = db.cursor()
-        cur.execute("SELECT id,name,price FROM menu")
-        rows = cur.fetchall()
+        try:
+            limit = min(max(int(request.query_params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+            after = int(request.query_params.get('after', 0))
+        except ValueError:
+            return Response({'error': 'limit and after must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        db = get_db(readonly=True)
+        with closing(db.cursor()) as cur:
+            cur.execute(MENU_PAGE_SQL, (after, limit))
+            rows = cur.fetchall()
 
         # Convert sqlite row tuples into dicts for clearer API responses
         result = [{'id': r[0], 'name': r[1], 'price': r[2]} for r in rows]
-        return Response(result)
+        response = Response(result)
+        if len(rows) == limit:
+            # keyset pagination: the body stays a plain list, the next page is in the Link header
+            next_url = request.build_absolute_uri(f'{request.path}?limit={limit}&after={rows[-1][0]}')
+            response['Link'] = f'<{next_url}>; rel="next"'
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:43
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model('api', 'Order')
+    OrderFood = apps.get_model('api', 'OrderFood')
+    lines = OrderFood.objects.filter(orderID=OuterRef('pk')).order_by().values('orderID')
+    Order.objects.update(
+        total_price=Coalesce(Subquery(lines.annotate(v=Sum(F('price') * F('stock'))).values('v')), Value(0)),
+        items_count=Coalesce(Subquery(lines.annotate(v=Count('pk')).values('v')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='items_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_order_totals'),
+        # its rows are merged into the order event log first
+        ('restaurant_web', '0006_order_event'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='History',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delete_history'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='items_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='total_price',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -97,13 +97,32 @@ class Order(models.Model):
     date = models.DateField()
     location = models.CharField(max_length=255)
     status = models.CharField(max_length=255, null=True, blank=True)
+    # denormalized from OrderFood rows, kept current by restaurant_web.order_totals
+    total_price = models.IntegerField(default=0, editable=False)
+    items_count = models.IntegerField(default=0, editable=False)
+
+    DERIVED_FIELDS = ('total_price', 'items_count')
 
     class Meta:
         db_table = 'tbl_order'
+        indexes = [
+            models.Index(fields=['-date', '-orderID'], name='order_date_id_idx'),
+        ]
 
     def __str__(self):
         return str(self.orderID)
 
+    def save(self, *args, **kwargs):
+        # An instance loaded before its lines changed holds stale totals;
+        # updates leave them to order_totals unless named in update_fields.
+        if not self._state.adding and not args and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class OrderFood(models.Model):
     ID = models.BigAutoField(primary_key=True)
@@ -136,6 +155,9 @@ class Delivery(models.Model):
 
     class Meta:
         db_table = 'tbl_delivery'
+        indexes = [
+            models.Index(fields=['-startdate', '-payID'], name='delivery_start_id_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -149,6 +171,9 @@ class Comment(models.Model):
 
     class Meta:
         db_table = 'tbl_comment'
+        indexes = [
+            models.Index(fields=['-date', '-commID'], name='comment_date_id_idx'),
+        ]
 
 
 class Cart(models.Model):
@@ -180,16 +205,6 @@ class DeliveryPrice(models.Model):
         db_table = 'tbl_deliveryPrice'
 
 
-class History(models.Model):
-    ID = models.BigAutoField(primary_key=True)
-    orderID = models.ForeignKey(Order, on_delete=models.CASCADE)
-    status = models.CharField(max_length=255)
-    date = models.DateField()
-
-    class Meta:
-        db_table = 'tbl_history'
-
-
 class Notification(models.Model):
     ID = models.BigAutoField(primary_key=True)
     userID = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -0,0 +1,55 @@
+"""
+Shared setup of the benchmark scripts.
+
+Each script runs against its own database: DATABASE_URL when set,
+otherwise a fresh SQLite file in the temp directory. Run them from
+RestaurantWebProject, e.g. ``python -m benchmarks.menu_serialization``.
+"""
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def django_setup(name, fresh=True):
+    """
+    Configure Django for the benchmark `name` and migrate its database.
+    Returns False when an existing SQLite file was kept (fresh=False).
+    """
+    created = True
+    if 'DATABASE_URL' not in os.environ:
+        path = os.path.join(tempfile.gettempdir(), f'bench_{name}.sqlite3')
+        if os.path.exists(path):
+            if fresh:
+                os.remove(path)
+            else:
+                created = False
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    sys.path.insert(0, BASE_DIR)
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return created
+
+
+def timed(func, repeat=3):
+    """(best wall time in seconds, last result) of `repeat` calls."""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def report(label, seconds, baseline=None):
+    line = f'{label:<64} {seconds * 1000:10.1f} ms'
+    if baseline:
+        line += f'   x{baseline / seconds:.1f}'
+    print(line)
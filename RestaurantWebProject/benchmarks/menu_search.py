@@ -0,0 +1,85 @@
+"""
+Menu search on 100k foods: the substring scan (`foodName__icontains` over
+name and description) the menu list ran before user-002 against the FTS5
+and term index backends of restaurant_web.search.
+
+    python -m benchmarks.menu_search [--foods 100000] [--reuse]
+
+--reuse keeps the SQLite database of the previous run instead of seeding
+again.
+"""
+import argparse
+import random
+
+from benchmarks.harness import django_setup, report, timed
+
+RESTAURANTS = 50
+WORDS = [
+    'buuz', 'khuushuur', 'tsuivan', 'bansh', 'soup', 'beef', 'mutton', 'chicken', 'rice', 'noodle',
+    'salad', 'fried', 'steamed', 'spicy', 'cheese', 'pizza', 'burger', 'tea', 'milk', 'dessert',
+]
+# names and descriptions also draw from a long tail of rarer words, like a real menu
+RARE = [f'{word}{n}' for word in ('aral', 'borts', 'khailmag', 'tarag') for n in range(1000)]
+# broad (cut at MAX_RESULTS), prefix, selective
+QUERIES = ['buuz', 'spicy beef', 'kha', 'aral17', 'borts250 tarag9']
+
+
+def seed(n):
+    from django.db import transaction
+    from api.models import Category, Food, Restaurant, RestaurantType
+    from restaurant_web import search
+
+    rng = random.Random(1)
+    kind = RestaurantType.objects.create(name='fast')
+    restaurants = [
+        Restaurant.objects.create(resName=f'R{i}', location='UB', cateID=kind, branch=str(i), phone=i)
+        for i in range(RESTAURANTS)
+    ]
+    categories = [Category.objects.create(catName=name) for name in ('Main', 'Soup', 'Drinks')]
+    # bulk_create sends no signals; the index is built once below
+    with transaction.atomic():
+        Food.objects.bulk_create([
+            Food(
+                foodName=' '.join(rng.sample(WORDS, 1) + rng.sample(RARE, 1)),
+                description=' '.join(rng.sample(WORDS, 2) + rng.sample(RARE, 2)),
+                resID=restaurants[i % RESTAURANTS], catID=categories[i % 3], price=100, image='',
+            )
+            for i in range(n)
+        ], batch_size=5000)
+    search.clear_index()
+    search.reindex_foods(Food.objects.values_list('foodID', flat=True))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--foods', type=int, default=100000)
+    parser.add_argument('--reuse', action='store_true')
+    args = parser.parse_args()
+    if django_setup('menu_search', fresh=not args.reuse):
+        seed(args.foods)
+
+    from django.db.models import Q
+    from django.test.utils import override_settings
+    from api.models import Food
+    from restaurant_web import search
+
+    print(f'{Food.objects.count()} foods')
+    for backend in ('fts5', 'terms'):
+        with override_settings(MENU_SEARCH_BACKEND=backend):
+            if backend == 'terms':
+                search.clear_index()
+                search.reindex_foods(Food.objects.values_list('foodID', flat=True))
+            for query in QUERIES:
+                tokens = search.tokenize(query)
+                condition = Q()
+                for token in tokens:
+                    condition &= Q(foodName__icontains=token) | Q(description__icontains=token)
+                baseline, _ = timed(lambda: list(Food.objects.filter(condition).values_list('foodID', flat=True)))
+                seconds, found = timed(lambda: search.search_foods(query))
+                report(f'{backend} "{query}" ({len(found)} of at most {search.MAX_RESULTS})', seconds, baseline)
+                seconds, _ = timed(lambda: search.search_foods(query, restaurant_id=3))
+                report(f'{backend} "{query}" restaurant 3', seconds, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Menu list serialization on 100k foods: model instances (before user-008)
+against FieldSet value rows, and the detail `is_available` flag loaded
+per food against one batched query per page.
+
+    python -m benchmarks.menu_serialization [--foods 100000]
+"""
+import argparse
+
+from benchmarks.harness import django_setup, report, timed
+
+PAGE = 10000
+
+
+def seed(n):
+    from api.models import Category, Food, Restaurant, RestaurantType
+    from restaurant_web.models import Menu
+
+    kind = RestaurantType.objects.create(name='fast')
+    restaurants = [
+        Restaurant.objects.create(resName=f'R{i}', location='UB', cateID=kind, branch=str(i), phone=i)
+        for i in range(2)
+    ]
+    categories = [Category.objects.create(catName=f'C{i}') for i in range(3)]
+    Food.objects.bulk_create([
+        Food(foodName=f'F{i}', resID=restaurants[i % 2], catID=categories[i % 3], price=i, description='d' * 40, image='')
+        for i in range(n)
+    ], batch_size=5000)
+    menus = []
+    for food in Food.objects.order_by('foodID').only('foodID', 'resID_id', 'catID_id'):
+        menus.append(Menu(food=food, restaurant_id=food.resID_id, category_id=food.catID_id,
+                          is_available=food.foodID % 7 != 0))
+        if food.foodID % 10 == 0:
+            # a second entry in a lower category decides the flag
+            menus.append(Menu(food=food, restaurant_id=food.resID_id, category_id=categories[0].pk,
+                              is_available=food.foodID % 20 == 0))
+    Menu.objects.bulk_create(menus, batch_size=5000)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--foods', type=int, default=100000)
+    args = parser.parse_args()
+    django_setup('menu_serialization')
+
+    from api.models import Food
+    from restaurant_web.models import Menu
+    from restaurant_web.menu_io import menu_flags
+    from restaurant_web.views import MENU_DETAIL_FIELDS, MENU_FIELDS
+    from common.fieldsets import Selection
+
+    seed(args.foods)
+
+    def instances():
+        return [{
+            'foodID': food.foodID, 'foodName': food.foodName,
+            'restaurant': {'resID': food.resID.resID, 'resName': food.resID.resName},
+            'category': {'catID': food.catID.catID, 'catName': food.catID.catName},
+            'price': food.price, 'description': food.description, 'image': food.image,
+        } for food in Food.objects.select_related('resID', 'catID').order_by('foodID')]
+
+    selection = Selection(MENU_FIELDS.spec)
+
+    def value_rows():
+        return selection.serialize(list(selection.query(Food.objects.order_by('foodID'))))
+
+    before, expected = timed(instances)
+    after, got = timed(value_rows)
+    assert got == expected
+    report(f'list, instances ({len(got)} rows)', before)
+    report(f'list, value rows ({len(got)} rows)', after, before)
+
+    food_ids = list(Food.objects.order_by('foodID').values_list('foodID', flat=True))
+    sample = food_ids[:PAGE]
+
+    def per_food():
+        return {
+            food_id: Menu.objects.filter(food_id=food_id).values_list('is_available', flat=True).first() is not False
+            for food_id in sample
+        }
+
+    detail = Selection(MENU_DETAIL_FIELDS.spec)
+
+    def batched():
+        rows = []
+        for start in range(0, len(food_ids), PAGE):
+            page = food_ids[start:start + PAGE]
+            rows += detail.serialize(list(detail.query(Food.objects.filter(foodID__in=page).order_by('foodID'))))
+        return rows
+
+    before, flags = timed(per_food, repeat=1)
+    assert {food_id: menu_flags([food_id]).get(food_id, True) for food_id in sample} == flags
+    after, rows = timed(batched)
+    assert {row['foodID']: row['is_available'] for row in rows[:PAGE]} == flags
+    report(f'detail flag, per food ({len(sample)} rows)', before)
+    report(f'detail rows, batched ({len(rows)} rows)', after)
+
+
+if __name__ == '__main__':
+    main()
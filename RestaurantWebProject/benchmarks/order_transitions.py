@@ -0,0 +1,132 @@
+"""
+Order status throughput with many concurrent writers: the read-check-save
+the order views did before user-014 against order_workflow.transition
+(compare-and-set UPDATE). Every writer picks a random order, reads its
+status and moves it one step along pending -> approved -> preparing ->
+ready -> delivered.
+
+Reported per strategy: successful transitions per second, outcomes, and
+event rows beyond one per status step (duplicates from lost updates).
+SQLite runs one write transaction at a time, so the numbers only show
+real contention on PostgreSQL.
+
+    DATABASE_URL=postgres://... python -m benchmarks.order_transitions [--writers 16]
+"""
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+
+from benchmarks.harness import django_setup
+
+NEXT = {'pending': 'approved', 'approved': 'preparing', 'preparing': 'ready', 'ready': 'delivered'}
+
+
+def seed(n):
+    from api.models import Category, Food, Order, OrderFood, Restaurant, RestaurantType, User
+    from restaurant_web.models import OrderEvent
+
+    OrderEvent.objects.all().delete()
+    Order.objects.all().delete()
+    user = User.objects.first() or User.objects.create(userName='bench', email='b@x', phone=1, password='x')
+    food = Food.objects.first()
+    if food is None:
+        kind = RestaurantType.objects.create(name='fast')
+        restaurant = Restaurant.objects.create(resName='R', location='UB', cateID=kind, branch='1', phone=1)
+        food = Food.objects.create(foodName='F', resID=restaurant, catID=Category.objects.create(catName='C'), price=1)
+    orders = Order.objects.bulk_create([
+        Order(userID=user, date='2026-01-01', location='UB', status='pending') for _ in range(n)
+    ])
+    OrderFood.objects.bulk_create([OrderFood(orderID=order, foodID=food, stock=1, price=1) for order in orders])
+    return [order.pk for order in orders]
+
+
+def read_check_save(order_id):
+    from api.models import Order
+    from restaurant_web import order_events
+
+    order = Order.objects.get(orderID=order_id)
+    target = NEXT.get(order.status or 'pending')
+    if target is None:
+        return 'final'
+    order.status = target
+    order.save()
+    order_events.append([order_id], order_events.code_of(target))
+    return 'updated'
+
+
+def compare_and_set(order_id):
+    from api.models import Order
+    from restaurant_web import order_workflow
+
+    current = Order.objects.filter(orderID=order_id).values_list('status', flat=True).get() or 'pending'
+    target = NEXT.get(current)
+    if target is None:
+        return 'final'
+    return order_workflow.transition(order_id, target, expected=current).result
+
+
+def run(strategy, order_ids, writers, attempts):
+    from django.db import connection
+
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def writer(seed):
+        rng = random.Random(seed)
+        mine = Counter()
+        try:
+            for _ in range(attempts):
+                try:
+                    mine[strategy(rng.choice(order_ids))] += 1
+                except Exception as exc:
+                    mine[type(exc).__name__] += 1
+        finally:
+            connection.close()
+            with lock:
+                outcomes.update(mine)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, outcomes
+
+
+def duplicates(order_ids):
+    from django.db.models import Count
+    from api.models import Order
+    from restaurant_web.models import OrderEvent
+
+    steps = {'pending': 0, 'approved': 1, 'preparing': 2, 'ready': 3, 'delivered': 4}
+    events = dict(
+        OrderEvent.objects.filter(order_id__in=order_ids).values('order_id').annotate(n=Count('pk'))
+        .values_list('order_id', 'n')
+    )
+    return sum(
+        events.get(order_id, 0) - steps[status or 'pending']
+        for order_id, status in Order.objects.filter(orderID__in=order_ids).values_list('orderID', 'status')
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--attempts', type=int, default=100, help='Transitions tried per writer')
+    args = parser.parse_args()
+    django_setup('order_transitions')
+
+    for name, strategy in (('read-check-save', read_check_save), ('compare-and-set', compare_and_set)):
+        order_ids = seed(args.orders)
+        seconds, outcomes = run(strategy, order_ids, args.writers, args.attempts)
+        updated = outcomes['updated']
+        print(f'{name:<16} {updated / seconds:8.1f} transitions/s  {dict(outcomes)}  '
+              f'duplicate events: {duplicates(order_ids)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Revenue report on 200k orders / 1M order lines: the per-order Python loop
+RevenueReportView ran before user-018 against restaurant_web.reports,
+first over the raw tables and then with the daily rollups built. Every
+result is checked against the Python one.
+
+    python -m benchmarks.revenue_report [--orders 200000] [--reuse]
+
+--reuse keeps the SQLite database of the previous run instead of seeding
+again (seeding 1M lines takes a few minutes).
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+from benchmarks.harness import django_setup, report, timed
+
+LINES = 5
+RESTAURANTS = 20
+FOODS = 400
+
+
+def seed(n):
+    from django.db import transaction
+    from api.models import Category, Food, Order, OrderFood, Restaurant, RestaurantType, User
+    from restaurant_web import order_links, order_totals
+
+    rng = random.Random(1)
+    kind = RestaurantType.objects.create(name='fast')
+    restaurants = [
+        Restaurant.objects.create(resName=f'R{i}', location='UB', cateID=kind, branch=str(i), phone=i)
+        for i in range(RESTAURANTS)
+    ]
+    category = Category.objects.create(catName='Main')
+    foods = Food.objects.bulk_create([
+        Food(foodName=f'F{i}', resID=restaurants[i % RESTAURANTS], catID=category, price=100 + i, description='', image='')
+        for i in range(FOODS)
+    ])
+    user = User.objects.create(userName='bench', email='bench@example.com', phone=1, password='x')
+    today = date.today()
+    statuses = ['pending', 'delivered', 'cancelled', 'approved']
+    with transaction.atomic():
+        Order.objects.bulk_create([
+            Order(userID=user, date=today - timedelta(days=i % 365), location='UB', status=statuses[i % 4])
+            for i in range(n)
+        ], batch_size=5000)
+        order_ids = list(Order.objects.values_list('orderID', flat=True))
+        lines = []
+        for order_id in order_ids:
+            for j in range(LINES):
+                food = foods[rng.randrange(FOODS)]
+                lines.append(OrderFood(orderID_id=order_id, foodID_id=food.foodID, stock=1 + j, price=food.price))
+        OrderFood.objects.bulk_create(lines, batch_size=10000)
+    for start in range(0, len(order_ids), 20000):
+        order_totals.refresh_orders(order_ids[start:start + 20000])
+    for _ in order_links.backfill(chunk_size=20000):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--reuse', action='store_true')
+    args = parser.parse_args()
+    if django_setup('revenue_report', fresh=not args.reuse):
+        seed(args.orders)
+
+    from api.models import OrderFood
+    from restaurant_web import reports, rollups
+    from restaurant_web.models import DailyRevenue
+    from restaurant_web.tests import python_revenue_report
+
+    print(f'{OrderFood.objects.count()} order lines')
+    month_ago = str(date.today() - timedelta(days=30))
+    cases = [
+        {'group_by': 'day'}, {'group_by': 'month'}, {'group_by': 'restaurant'},
+        {'date_from': month_ago}, {'date_from': month_ago, 'restaurant_id': 3, 'group_by': 'restaurant'},
+    ]
+
+    DailyRevenue.objects.all().delete()
+    baselines = {}
+    for params in cases:
+        label = ','.join(f'{k}={v}' for k, v in params.items())
+        baselines[label], expected = timed(lambda: python_revenue_report(**params), repeat=1)
+        seconds, got = timed(lambda: reports.revenue_report(**params))
+        assert got == expected, label
+        report(f'{label} python', baselines[label])
+        report(f'{label} sql', seconds, baselines[label])
+
+    for _ in rollups.rebuild():
+        pass
+    for params in cases:
+        label = ','.join(f'{k}={v}' for k, v in params.items())
+        seconds, got = timed(lambda: reports.revenue_report(**params))
+        assert got == python_revenue_report(**params), label
+        report(f'{label} rollups', seconds, baselines[label])
+
+
+if __name__ == '__main__':
+    main()
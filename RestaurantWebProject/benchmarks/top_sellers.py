@@ -0,0 +1,72 @@
+"""
+Top sellers report on the revenue_report data set (200k orders / 1M order
+lines over a year): every day aggregated from the order lines, then with
+the per food daily rollups built. Both must return the same report.
+Planner statistics are gathered (ANALYZE) before each round, as a
+production database has them.
+
+    python -m benchmarks.top_sellers [--orders 200000] [--reuse]
+
+--reuse keeps the SQLite database of the previous run instead of seeding
+again.
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.harness import django_setup, report, timed
+from benchmarks.revenue_report import seed
+
+RANGES = (7, 30, 365)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--reuse', action='store_true')
+    args = parser.parse_args()
+    if django_setup('top_sellers', fresh=not args.reuse):
+        seed(args.orders)
+
+    from django.core.cache import cache
+    from django.db import connection
+    from django.utils import timezone
+    from api.models import OrderFood
+    from restaurant_web import rollups, top_sellers
+    from restaurant_web.models import DailyFoodSales, DailyRevenue
+
+    print(f'{OrderFood.objects.count()} order lines')
+    today = timezone.localdate()
+    cases = [
+        {'date_from': today - timedelta(days=days - 1), 'date_to': today, **extra}
+        for days in RANGES for extra in ({}, {'restaurant_id': 3})
+    ]
+
+    def run(params):
+        cache.clear()
+        return top_sellers.top_sellers(**params)
+
+    DailyRevenue.objects.all().delete()
+    DailyFoodSales.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    baselines, expected = {}, {}
+    for i, params in enumerate(cases):
+        days = (params['date_to'] - params['date_from']).days + 1
+        label = f'{days} days' + (f", restaurant {params['restaurant_id']}" if 'restaurant_id' in params else '')
+        baselines[i], expected[i] = timed(lambda: run(params), repeat=1)
+        report(f'{label} order lines', baselines[i])
+
+    seconds, _ = timed(lambda: list(rollups.rebuild()), repeat=1)
+    report(f'rebuild rollups ({DailyFoodSales.objects.count()} food days)', seconds)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    for i, params in enumerate(cases):
+        days = (params['date_to'] - params['date_from']).days + 1
+        label = f'{days} days' + (f", restaurant {params['restaurant_id']}" if 'restaurant_id' in params else '')
+        seconds, got = timed(lambda: run(params))
+        assert got == expected[i], label
+        report(f'{label} rollups', seconds, baselines[i])
+
+
+if __name__ == '__main__':
+    main()
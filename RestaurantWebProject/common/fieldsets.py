@@ -0,0 +1,170 @@
+from rest_framework import exceptions
+
+from common.serialization import RowTemplate
+
+
+MAX_CACHED_SELECTIONS = 256
+
+
+class InvalidFields(exceptions.APIException):
+    status_code = 400
+    default_detail = {'error': 'Буруу талбар'}
+
+
+class Computed:
+    """A response value derived from one or more columns of the same row.
+
+    `func` is called with the values of the `requires` paths, in order.
+    """
+
+    def __init__(self, func, requires=()):
+        self.func = func
+        self.requires = tuple(requires)
+
+
+class Batch:
+    """A response value loaded for a whole page at once.
+
+    `loader(keys)` gets the distinct values of the `key` column and returns
+    ``{key: value}``; rows missing from it get `default`. Fields sharing a
+    loader share its single query; `item` picks one element when the
+    loader returns tuples.
+    """
+
+    def __init__(self, loader, key, default=None, item=None):
+        self.loader = loader
+        self.key = key
+        self.default = default
+        self.item = item
+
+
+class FieldSet:
+    """Declarative response shape of an endpoint.
+
+    `spec` maps output keys to an ORM path (``'resID__resName'``), a nested
+    dict for nested objects, a `Computed` or a `Batch`. `select(request)`
+    applies the client's `?fields=` / `?exclude=` (comma separated, dotted
+    for nested keys, e.g. ``fields=foodID,foodName,restaurant.resName``)
+    and returns a `Selection` that knows which columns the response needs.
+    Selections are compiled once per distinct field list and reused.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._selections = {}
+
+    def select(self, request):
+        fields = _split(request.query_params.get('fields'))
+        exclude = _split(request.query_params.get('exclude'))
+        cache_key = (tuple(fields), tuple(exclude))
+        selection = self._selections.get(cache_key)
+        if selection is None:
+            spec = self.spec
+            if fields:
+                spec = _keep(spec, [f.split('.') for f in fields])
+            if exclude:
+                spec = _drop(spec, [f.split('.') for f in exclude])
+            selection = Selection(spec)
+            if len(self._selections) < MAX_CACHED_SELECTIONS:
+                self._selections[cache_key] = selection
+        return selection
+
+
+def _split(raw):
+    return [part.strip() for part in (raw or '').split(',') if part.strip()]
+
+
+def _unknown(path):
+    raise InvalidFields({'error': f'Буруу талбар: {".".join(path)}'})
+
+
+def _keep(spec, paths, prefix=()):
+    wanted = {}
+    for path in paths:
+        if path[0] not in spec:
+            _unknown(prefix + (path[0],))
+        wanted.setdefault(path[0], []).append(path[1:])
+
+    result = {}
+    # keep the declared key order, not the order of the request
+    for key, value in spec.items():
+        if key not in wanted:
+            continue
+        rests = wanted[key]
+        if any(not rest for rest in rests) or not isinstance(value, dict):
+            if any(rest for rest in rests) and not isinstance(value, dict):
+                _unknown(prefix + (key, next(rest for rest in rests if rest)[0]))
+            result[key] = value
+        else:
+            result[key] = _keep(value, rests, prefix + (key,))
+    return result
+
+
+def _drop(spec, paths, prefix=()):
+    result = dict(spec)
+    for path in paths:
+        key = path[0]
+        if key not in spec:
+            _unknown(prefix + (key,))
+        if len(path) == 1:
+            result.pop(key, None)
+        elif isinstance(spec[key], dict):
+            if key in result:
+                result[key] = _drop(result[key], [path[1:]], prefix + (key,))
+        else:
+            _unknown(prefix + tuple(path[:2]))
+    return result
+
+
+class Selection:
+    """The selected part of a `FieldSet`, compiled for value rows.
+
+    `query(queryset)` turns a queryset into a `values_list` of just the
+    needed columns (joins follow from the paths), `serialize(rows)`
+    renders those rows into response dicts without model instances.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.columns = []
+        self.loaders = []
+        self.template = RowTemplate(self._shape(spec))
+
+    def _column(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+        return self.columns.index(path)
+
+    def _shape(self, spec):
+        shape = {}
+        for key, value in spec.items():
+            if isinstance(value, dict):
+                shape[key] = self._shape(value)
+            elif isinstance(value, Computed):
+                shape[key] = ('call', value.func, [self._column(path) for path in value.requires])
+            elif isinstance(value, Batch):
+                slot = (value.loader, value.key)
+                if slot not in self.loaders:
+                    self.loaders.append(slot)
+                shape[key] = ('batch', self.loaders.index(slot), self._column(value.key), value.default, value.item)
+            else:
+                shape[key] = ('column', self._column(value))
+        return shape
+
+    def includes(self, key):
+        return key in self.spec
+
+    def query(self, queryset, extra=()):
+        """
+        values_list of the selected columns plus `extra` ones the caller
+        needs itself (e.g. pagination keys). Rows are named tuples.
+        """
+        columns = self.columns + [c for c in extra if c not in self.columns]
+        return queryset.select_related(None).prefetch_related(None).values_list(*columns, named=True)
+
+    def serialize(self, rows):
+        batches = []
+        for loader, key in self.loaders:
+            index = self.columns.index(key)
+            batches.append(loader({row[index] for row in rows}) if rows else {})
+        return self.template.render_all(rows, batches)
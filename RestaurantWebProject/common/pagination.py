@@ -0,0 +1,197 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework import exceptions
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class InvalidPage(exceptions.APIException):
+    status_code = 400
+    default_detail = {'error': 'Буруу хуудаслалтын параметр'}
+
+
+class KeysetPaginator:
+    """Cursor (keyset) pagination over a fixed sort key.
+
+    `ordering` is a tuple of model fields in the same notation as
+    `order_by()` (e.g. ``('-date', '-orderID')``). The last field must be
+    unique so the ordering is total. Fields listed in `nullable` are sorted
+    with NULLs last in the forward direction.
+
+    Clients pass `?limit=` and an opaque `?cursor=` taken from the `next` /
+    `prev` values of a previous page. Each page costs one indexed range
+    query instead of loading the whole table, plus a COUNT for the
+    response's `count` (the total number of matching rows, as before
+    pagination). Cursor values are parsed back through the field of their
+    key, so a tampered cursor is a 400, never a query error.
+    """
+
+    def __init__(self, ordering, nullable=(), default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+        self.keys = [(f.lstrip('-'), f.startswith('-')) for f in ordering]
+        self.nullable = set(nullable)
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+
+    # ---- request parsing ----
+
+    def get_limit(self, request):
+        raw = request.query_params.get('limit')
+        if raw in (None, ''):
+            return self.default_limit
+        try:
+            limit = int(raw)
+        except (TypeError, ValueError):
+            raise InvalidPage({'error': 'limit бүхэл тоо байх ёстой'})
+        return max(1, min(limit, self.max_limit))
+
+    def decode_cursor(self, raw, queryset=None):
+        """(direction, key values) of a cursor; the values are parsed by the fields of `queryset`."""
+        try:
+            padded = raw + '=' * (-len(raw) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            direction, values = data['d'], data['v']
+            if direction not in ('n', 'p') or not isinstance(values, list) or len(values) != len(self.keys):
+                raise ValueError(raw)
+            if queryset is not None:
+                values = [
+                    self._parse(queryset, name, value) for (name, _), value in zip(self.keys, values)
+                ]
+        except (ValueError, KeyError, TypeError, AttributeError, ValidationError):
+            raise InvalidPage({'error': 'Буруу cursor'})
+        return direction, values
+
+    def _field(self, queryset, name):
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError(name)
+
+    def _parse(self, queryset, name, value):
+        if value is None:
+            if name not in self.nullable:
+                raise ValueError(name)
+            return None
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise TypeError(name)
+        return self._field(queryset, name).to_python(value)
+
+    def encode_cursor(self, direction, values):
+        raw = json.dumps({'d': direction, 'v': values}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    # ---- query building ----
+
+    def _order_by(self, reverse=False):
+        exprs = []
+        for name, desc in self.keys:
+            desc = desc != reverse
+            nulls = {}
+            if name in self.nullable:
+                # NULLs sort last going forward, first going backward
+                nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+            exprs.append(F(name).desc(**nulls) if desc else F(name).asc(**nulls))
+        return exprs
+
+    def _beyond(self, name, desc, value, forward):
+        """Rows strictly past `value` on a single key."""
+        nullable = name in self.nullable
+        if value is None:
+            # NULLs are at the very end going forward
+            return Q(pk__in=[]) if forward else Q(**{f'{name}__isnull': False})
+        lookup = 'lt' if desc == forward else 'gt'
+        cond = Q(**{f'{name}__{lookup}': value})
+        if nullable and forward:
+            cond |= Q(**{f'{name}__isnull': True})
+        return cond
+
+    def _seek(self, values, forward):
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, desc), value in zip(self.keys, values):
+            condition |= equal & self._beyond(name, desc, value, forward)
+            if value is None:
+                equal &= Q(**{f'{name}__isnull': True})
+            else:
+                equal &= Q(**{name: value})
+        return condition
+
+    def order(self, queryset):
+        """The queryset in page order, for consumers that read every row."""
+        return queryset.order_by(*self._order_by())
+
+    def chunks(self, queryset, size):
+        """Yield every row of `queryset` in page order, `size` rows per query.
+
+        Each chunk is an ordinary range query past the last row of the
+        previous one, so no database cursor stays open between chunks:
+        server-side cursors (`.iterator()` on PostgreSQL) do not survive a
+        transaction-mode pooler such as PgBouncer or Neon's.
+        """
+        qs = self.order(queryset)
+        chunk = list(qs[:size])
+        while chunk:
+            yield chunk
+            if len(chunk) < size:
+                return
+            chunk = list(qs.filter(self._seek(self.row_key(chunk[-1]), True))[:size])
+
+    def row_key(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self.keys]
+        return [getattr(row, name) for name, _ in self.keys]
+
+    # ---- public API ----
+
+    def paginate(self, queryset, request):
+        """Return a `Page` with the rows of the requested window."""
+        limit = self.get_limit(request)
+        raw = request.query_params.get('cursor')
+        direction, values = self.decode_cursor(raw, queryset) if raw else ('n', None)
+        forward = direction == 'n'
+
+        qs = queryset.order_by(*self._order_by(reverse=not forward))
+        if values is not None:
+            qs = qs.filter(self._seek(values, forward))
+
+        rows = list(qs[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if has_more or not forward:
+                next_cursor = self.encode_cursor('n', self.row_key(rows[-1]))
+            if values is not None and (forward or has_more):
+                prev_cursor = self.encode_cursor('p', self.row_key(rows[0]))
+        return Page(rows, next_cursor, prev_cursor, queryset.count())
+
+
+class Page:
+
+    def __init__(self, rows, next_cursor, prev_cursor, count):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        # every matching row, not only this page's
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def envelope(self, results, **extra):
+        """Standard list response body: total count, cursors and results."""
+        body = {'count': self.count, 'next': self.next_cursor, 'prev': self.prev_cursor}
+        body.update(extra)
+        body['results'] = results
+        return body
@@ -0,0 +1,61 @@
+"""
+Model-free row serialization.
+
+List endpoints fetch plain `values_list` rows and turn them into the
+nested response dicts with a `RowTemplate`: the template is compiled once
+per response shape into a small Python function, so rendering a row is a
+single dict literal instead of building a model instance and copying its
+attributes one by one.
+"""
+import itertools
+
+
+class RowTemplate:
+    """Compiled mapping from value rows to response dicts.
+
+    `shape` is a nested dict whose leaves are ``('column', index)``,
+    ``('call', func, indexes)`` or ``('batch', slot, index, default, item)``
+    entries, as produced by `common.fieldsets.Selection`:
+
+    * column - the row value at `index`
+    * call   - `func(*row values at indexes)`
+    * batch  - ``batches[slot].get(row[index], default)``, optionally
+      indexed with `item` (for loaders returning several values per key)
+    """
+
+    _names = itertools.count()
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.namespace = {}
+        source = f'def render(row, batches):\n    return {self._literal(shape)}\n'
+        code = compile(source, f'<row template {next(self._names)}>', 'exec')
+        exec(code, self.namespace)
+        self.render = self.namespace['render']
+
+    def _bind(self, value):
+        name = f'_v{len(self.namespace)}'
+        self.namespace[name] = value
+        return name
+
+    def _literal(self, shape):
+        items = []
+        for key, leaf in shape.items():
+            if isinstance(leaf, dict):
+                expr = self._literal(leaf)
+            elif leaf[0] == 'column':
+                expr = f'row[{leaf[1]}]'
+            elif leaf[0] == 'call':
+                args = ', '.join(f'row[{i}]' for i in leaf[2])
+                expr = f'{self._bind(leaf[1])}({args})'
+            else:
+                _, slot, index, default, item = leaf
+                expr = f'batches[{slot}].get(row[{index}], {self._bind(default)})'
+                if item is not None:
+                    expr = f'{expr}[{item}]'
+            items.append(f'{key!r}: {expr}')
+        return '{' + ', '.join(items) + '}'
+
+    def render_all(self, rows, batches=()):
+        render = self.render
+        return [render(row, batches) for row in rows]
@@ -131,6 +131,9 @@ DATABASES = {
         conn_max_age=600,
     )
 }
+# The Neon host is a transaction-mode pooler: a server-side cursor (.iterator()
+# on PostgreSQL) can land on another backend between fetches, so fetch client side.
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 
 # DATABASES = {
 #     'default': {
@@ -148,6 +151,35 @@ DATABASES = {
 #     'common.db_router.AppDatabaseRouter',
 # ]
 
+# Cache (menu snapshots). Every worker must share it for the version
+# counters to be consistent, so production should set REDIS_URL.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Live order feed (SSE). With several worker processes the events have to
+# travel through Redis (the `redis` client from requirements.txt); without
+# it each process only sees its own writes.
+ORDER_EVENTS_REDIS_URL = os.environ.get('REDIS_URL')
+
+# Columnar analytics export (restaurant_web.columnar), refreshed by
+# `manage.py refresh_analytics`; every worker needs to see the directory.
+ANALYTICS_DIR = os.environ.get('ANALYTICS_DIR', os.path.join(BASE_DIR, 'var', 'analytics'))
+
+# Report jobs (restaurant_web.report_jobs): threads per process running
+# submitted jobs; 0 leaves them all to `manage.py run_report_jobs`.
+REPORT_JOB_THREADS = int(os.environ.get('REPORT_JOB_THREADS', 2))
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
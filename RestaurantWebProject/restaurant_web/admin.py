@@ -1,5 +1,5 @@
 from django.contrib import admin
-from restaurant_web.models import Menu, OrderStatus, OperatingHours, Inventory
+from restaurant_web.models import Menu, OrderEvent, OperatingHours, Inventory
 
 
 @admin.register(Menu)
@@ -10,10 +10,10 @@ class MenuAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 
-@admin.register(OrderStatus)
-class OrderStatusAdmin(admin.ModelAdmin):
-    list_display = ('statusID', 'order', 'status', 'created_at', 'updated_by')
-    list_filter = ('status', 'created_at')
+@admin.register(OrderEvent)
+class OrderEventAdmin(admin.ModelAdmin):
+    list_display = ('eventID', 'order', 'seq', 'code', 'created_at', 'updated_by')
+    list_filter = ('code', 'created_at')
     search_fields = ('order__orderID', 'notes')
 
 
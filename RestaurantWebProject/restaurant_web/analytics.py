@@ -0,0 +1,317 @@
+"""
+Vectorized analyses over the columnar export (restaurant_web.columnar).
+
+The primitives group a value column by an integer key column (a dictionary
+code, an order row, a day number) with `np.bincount` or one sort, so an
+analysis over the whole order history is a few passes over memory-mapped
+arrays instead of millions of ORM rows. Results are as fresh as the last
+`manage.py refresh_analytics`.
+
+Orders are selected like in the revenue report: everything not cancelled,
+optionally within a date range and restricted to orders with lines from a
+restaurant.
+"""
+import numpy as np
+from django.utils import dateparse
+
+from restaurant_web.columnar import to_days
+
+
+PERCENTILES = (50, 90, 99)
+HISTOGRAM_MAX = 10
+ELASTICITY_LIMIT = 20
+
+
+# ---- primitives ----
+
+def _size(keys, size):
+    if size is not None:
+        return size
+    return int(keys.max()) + 1 if keys.size else 0
+
+
+def group_count(keys, size=None):
+    """Number of rows per key 0..size-1."""
+    return np.bincount(keys, minlength=_size(keys, size))
+
+
+def group_sum(keys, values, size=None):
+    """Sum of `values` per key 0..size-1 (integers stay integers)."""
+    sums = np.bincount(keys, weights=values, minlength=_size(keys, size))
+    if np.issubdtype(np.asarray(values).dtype, np.integer):
+        return np.rint(sums).astype(np.int64)
+    return sums
+
+
+def group_percentile(keys, values, q=PERCENTILES, size=None):
+    """
+    Percentiles `q` of `values` per key, interpolated like `np.percentile`:
+    an array of shape (size, len(q)), NaN for keys without rows.
+    """
+    size = _size(keys, size)
+    q = np.asarray(q, dtype=float) / 100
+    counts = np.bincount(keys, minlength=size)
+    ordered = np.asarray(values, dtype=float)[np.lexsort((values, keys))]
+    if not ordered.size:
+        return np.full((size, q.size), np.nan)
+
+    starts = (np.cumsum(counts) - counts)[:, None]
+    last = starts + np.maximum(counts[:, None] - 1, 0)
+    position = starts + q[None, :] * np.maximum(counts[:, None] - 1, 0)
+    low = np.minimum(np.floor(position).astype(np.int64), ordered.size - 1)
+    high = np.minimum(np.minimum(low + 1, last), ordered.size - 1)
+    result = ordered[low] + (ordered[high] - ordered[low]) * (position - np.floor(position))
+    result[counts == 0] = np.nan
+    return result
+
+
+def factorize(values):
+    """(codes, uniques): `values` renumbered 0..n-1 in the order of their sorted uniques."""
+    uniques, codes = np.unique(values, return_inverse=True)
+    return codes, uniques
+
+
+def combine(major, minor, minor_size):
+    """One int64 key per (major, minor) pair, ordered by major then minor."""
+    return np.asarray(major, dtype=np.int64) * minor_size + minor
+
+
+def _summary(values):
+    values = np.asarray(values)
+    if not values.size:
+        return {'mean': 0, **{f'p{p}': 0 for p in PERCENTILES}}
+    return {
+        'mean': round(float(values.mean()), 2),
+        **{f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+    }
+
+
+# ---- selection ----
+
+def parse_range(date_from=None, date_to=None):
+    """Parse 'YYYY-MM-DD' bounds; raises ValueError for malformed ones."""
+    bounds = []
+    for value in (date_from, date_to):
+        if value and isinstance(value, str):
+            parsed = dateparse.parse_date(value)
+            if parsed is None:
+                raise ValueError(value)
+            value = parsed
+        bounds.append(value or None)
+    return bounds
+
+
+def select_orders(store, date_from=None, date_to=None, restaurant_id=None):
+    """Boolean mask over the order rows of a store."""
+    date_from, date_to = parse_range(date_from, date_to)
+    mask = np.ones(store.order_id.size, dtype=bool)
+    cancelled = store.status_code('cancelled')
+    if cancelled is not None:
+        mask &= store.order_status != cancelled
+    if date_from:
+        mask &= store.order_date >= to_days(date_from)
+    if date_to:
+        mask &= store.order_date <= to_days(date_to)
+    if restaurant_id:
+        has_lines = np.zeros_like(mask)
+        code = store.code_of('restaurant_ids', restaurant_id)
+        if code is not None:
+            has_lines[store.line_order[store.line_restaurant == code]] = True
+        mask &= has_lines
+    return mask
+
+
+def _order_restaurants(store, lines):
+    """(order row, restaurant code) of every distinct pair among the selected lines."""
+    size = store.restaurant_ids.size
+    pairs = np.unique(combine(store.line_order[lines], store.line_restaurant[lines], size))
+    return pairs // size, pairs % size
+
+
+# ---- analyses ----
+
+def revenue_report(store, date_from=None, date_to=None, restaurant_id=None, group_by='day'):
+    """The revenue report (restaurant_web.reports) computed from the export."""
+    orders = select_orders(store, date_from, date_to, restaurant_id)
+    totals = store.order_total[orders]
+
+    if group_by == 'restaurant':
+        rows, restaurants = _order_restaurants(store, orders[store.line_order])
+        revenue = group_sum(restaurants, store.order_total[rows], store.restaurant_ids.size)
+        counts = group_count(restaurants, store.restaurant_ids.size)
+        present = np.flatnonzero(counts)
+        labels = [f'restaurant_{restaurant_id}' for restaurant_id in store.restaurant_ids[present]]
+    else:
+        days = store.order_date[orders].astype('datetime64[D]')
+        if group_by == 'month':
+            periods, uniques = factorize(days.astype('datetime64[M]'))
+        else:
+            periods, uniques = factorize(days)
+        revenue = group_sum(periods, totals, uniques.size)
+        counts = group_count(periods, uniques.size)
+        present = np.arange(uniques.size)
+        labels = list(np.datetime_as_string(uniques))
+
+    total_revenue, total_orders = int(totals.sum()), int(orders.sum())
+    groups = sorted(zip(labels, revenue[present].tolist(), counts[present].tolist()))
+    return {
+        'total_revenue': total_revenue,
+        'total_orders': total_orders,
+        'avg_order': round(total_revenue / total_orders, 2) if total_orders else 0,
+        'groups': [
+            {
+                'group': label,
+                'revenue': group_revenue,
+                'orders': group_orders,
+                'avg_order': round(group_revenue / group_orders, 2) if group_orders else 0,
+            }
+            for label, group_revenue, group_orders in groups
+        ],
+    }
+
+
+def basket_size(store, date_from=None, date_to=None, restaurant_id=None):
+    """
+    Distribution of lines, quantity and value per order, a quantity
+    histogram, and the quantity each restaurant contributes to a basket.
+    """
+    orders = select_orders(store, date_from, date_to, restaurant_id)
+    lines = orders[store.line_order]
+    line_counts = group_count(store.line_order[lines], store.order_id.size)
+    quantities = group_sum(store.line_order[lines], store.line_quantity[lines], store.order_id.size)
+    orders &= line_counts > 0
+
+    histogram = np.bincount(np.clip(quantities[orders], 0, HISTOGRAM_MAX), minlength=HISTOGRAM_MAX + 1)
+
+    # quantity per (order, restaurant), then its distribution per restaurant
+    size = store.restaurant_ids.size
+    pairs, pair_keys = factorize(combine(store.line_order[lines], store.line_restaurant[lines], size))
+    per_pair = group_sum(pairs, store.line_quantity[lines], pair_keys.size)
+    restaurants = pair_keys % size
+    baskets = group_count(restaurants, size)
+    means = group_sum(restaurants, per_pair, size) / np.maximum(baskets, 1)
+    percentiles = group_percentile(restaurants, per_pair, PERCENTILES, size)
+
+    return {
+        'orders': int(orders.sum()),
+        'lines': _summary(line_counts[orders]),
+        'quantity': _summary(quantities[orders]),
+        'value': _summary(store.order_total[orders]),
+        'histogram': [
+            {'quantity': f'{n}+' if n == HISTOGRAM_MAX else n, 'orders': int(histogram[n])}
+            for n in range(1, HISTOGRAM_MAX + 1)
+        ],
+        'by_restaurant': [
+            {
+                'restaurantID': int(store.restaurant_ids[code]),
+                'orders': int(baskets[code]),
+                'quantity': {
+                    'mean': round(float(means[code]), 2),
+                    **{f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, percentiles[code])},
+                },
+            }
+            for code in np.flatnonzero(baskets)
+        ],
+    }
+
+
+def price_elasticity(store, date_from=None, date_to=None, restaurant_id=None,
+                     min_prices=2, limit=ELASTICITY_LIMIT):
+    """
+    Per food, the slope of log(average daily quantity) over log(unit price)
+    across the prices it was sold at (-1: 1% dearer sells 1% less). Foods
+    sold at fewer than `min_prices` prices have none; the most sold foods
+    come first.
+    """
+    orders = select_orders(store, date_from, date_to)
+    lines = orders[store.line_order] & (store.line_price > 0) & (store.line_quantity > 0)
+    if restaurant_id:
+        code = store.code_of('restaurant_ids', restaurant_id)
+        lines &= store.line_restaurant == (code if code is not None else -1)
+    foods = store.line_food[lines]
+    prices = store.line_price[lines]
+    quantities = store.line_quantity[lines]
+    days = store.order_date[store.line_order[lines]]
+
+    # (food, price) points: total quantity over the number of days sold at that price
+    price_size = int(prices.max()) + 1 if prices.size else 1
+    points, point_keys = factorize(combine(foods, prices, price_size))
+    day_size = int(days.max()) + 1 if days.size else 1
+    sold_days = group_count(np.unique(combine(points, days, day_size)) // day_size, point_keys.size)
+    daily = group_sum(points, quantities, point_keys.size) / np.maximum(sold_days, 1)
+    point_foods = point_keys // price_size
+    x = np.log(point_keys % price_size)
+    y = np.log(daily)
+
+    n = group_count(point_foods, store.food_ids.size)
+    sx, sy = group_sum(point_foods, x, n.size), group_sum(point_foods, y, n.size)
+    sxy, sxx = group_sum(point_foods, x * y, n.size), group_sum(point_foods, x * x, n.size)
+    spread = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * sxy - sx * sy) / spread
+
+    sold = group_sum(foods, quantities, store.food_ids.size)
+    low = np.full(n.size, np.iinfo(np.int64).max)
+    high = np.zeros(n.size, dtype=np.int64)
+    np.minimum.at(low, foods, prices)
+    np.maximum.at(high, foods, prices)
+
+    eligible = np.flatnonzero((n >= max(min_prices, 2)) & (spread > 1e-12))
+    eligible = eligible[np.argsort(-sold[eligible], kind='stable')][:limit]
+    return [
+        {
+            'foodID': int(store.food_ids[code]),
+            'restaurantID': int(store.restaurant_ids[store.food_restaurant[code]]),
+            'prices': int(n[code]),
+            'min_price': int(low[code]),
+            'max_price': int(high[code]),
+            'quantity': int(sold[code]),
+            'elasticity': round(float(slope[code]), 3),
+        }
+        for code in eligible
+    ]
+
+
+def restaurant_mix(store, date_from=None, date_to=None, restaurant_id=None):
+    """
+    Each restaurant's share of line revenue and of orders, and how many
+    orders mix restaurants. With `restaurant_id`, over the orders that
+    include that restaurant.
+    """
+    orders = select_orders(store, date_from, date_to, restaurant_id)
+    lines = orders[store.line_order]
+    size = store.restaurant_ids.size
+    restaurants = store.line_restaurant[lines]
+    revenue = group_sum(restaurants, store.line_price[lines] * store.line_quantity[lines], size)
+
+    rows, pair_restaurants = _order_restaurants(store, lines)
+    order_counts = group_count(pair_restaurants, size)
+    per_order = group_count(rows, store.order_id.size)[orders]
+    per_order = per_order[per_order > 0]
+
+    total = int(revenue.sum())
+    present = np.flatnonzero(order_counts)
+    present = present[np.argsort(-revenue[present], kind='stable')]
+    return {
+        'orders': int(per_order.size),
+        'revenue': total,
+        'multi_restaurant_orders': int((per_order > 1).sum()),
+        'avg_restaurants_per_order': round(float(per_order.mean()), 2) if per_order.size else 0,
+        'restaurants': [
+            {
+                'restaurantID': int(store.restaurant_ids[code]),
+                'revenue': int(revenue[code]),
+                'revenue_share': round(float(revenue[code]) / total, 4) if total else 0,
+                'orders': int(order_counts[code]),
+                'order_share': round(float(order_counts[code]) / per_order.size, 4) if per_order.size else 0,
+            }
+            for code in present
+        ],
+    }
+
+
+ANALYSES = {
+    'basket-size': basket_size,
+    'price-elasticity': price_elasticity,
+    'restaurant-mix': restaurant_mix,
+}
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class RestaurantWebConfig(AppConfig):
     name = 'restaurant_web'
+
+    def ready(self):
+        from restaurant_web import signals  # noqa: F401
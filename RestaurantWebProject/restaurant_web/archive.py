@@ -0,0 +1,214 @@
+"""
+Hot / cold order storage.
+
+Closed orders (delivered or cancelled) older than ORDER_ARCHIVE_AFTER_DAYS
+are moved out of `tbl_order`, `tbl_orderFood` and `tbl_order_event` into
+the archive tables (`ArchivedOrder`, `ArchivedOrderFood`,
+`ArchivedOrderEvent`), indexed by date. Lines keep a copy of the food
+they were ordered as; payments and deliveries are kept as JSON on the
+archived order.
+
+`archive_orders` works in batches of the oldest candidates, each batch
+copied and deleted in its own transaction, so an interrupted run simply
+continues where it stopped the next time. `manage.py archive_orders` runs
+it.
+
+Readers check `needs_archive(date_from)` and only touch the archive when
+the requested range reaches back past the newest archived date.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.models import Delivery, Order, OrderFood, Payment, User
+from restaurant_web import counters, dashboard, order_events, rollups, signals
+from restaurant_web.models import ArchivedOrder, ArchivedOrderEvent, ArchivedOrderFood, OrderEvent, RestaurantOrder
+
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 365)
+CLOSED_STATUSES = ('delivered', 'cancelled')
+BATCH_SIZE = 500
+
+
+def default_cutoff():
+    return timezone.localdate() - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+
+def candidates(cutoff):
+    """Hot orders that may be archived, oldest first."""
+    return Order.objects.filter(date__lt=cutoff, status__in=CLOSED_STATUSES).order_by('date', 'orderID')
+
+
+def _grouped(queryset, key, fields):
+    grouped = {}
+    for row in queryset.values(key, *fields):
+        grouped.setdefault(row.pop(key), []).append(row)
+    return grouped
+
+
+def archive_batch(order_ids):
+    """Copy the given orders to the archive and delete them from the hot tables."""
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update().filter(orderID__in=order_ids).values_list(
+                'orderID', 'userID_id', 'date', 'location', 'status', 'total_price', 'items_count'
+            )
+        )
+        order_ids = [row[0] for row in orders]
+        if not order_ids:
+            return 0
+
+        payments = _grouped(Payment.objects.filter(orderID__in=order_ids), 'orderID_id',
+                            ('payID', 'price', 'turul', 'status'))
+        deliveries = _grouped(Delivery.objects.filter(orderID__in=order_ids), 'orderID_id',
+                              ('payID', 'workerID_id', 'status', 'startdate', 'enddate'))
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                orderID=order_id, user_id=user_id, date=day, location=location, status=order_status,
+                total_price=total_price, items_count=items_count,
+                payments=payments.get(order_id, []),
+                deliveries=deliveries.get(order_id, []),
+            )
+            for order_id, user_id, day, location, order_status, total_price, items_count in orders
+        ], ignore_conflicts=True)
+
+        ArchivedOrderFood.objects.bulk_create([
+            ArchivedOrderFood(
+                ID=line_id, order_id=order_id, food_id=food_id, restaurant_id=restaurant_id,
+                food_name=food_name, food_price=food_price, food_image=food_image,
+                stock=stock, price=price,
+            )
+            for line_id, order_id, food_id, restaurant_id, food_name, food_price, food_image, stock, price
+            in OrderFood.objects.filter(orderID__in=order_ids).values_list(
+                'ID', 'orderID_id', 'foodID_id', 'foodID__resID_id',
+                'foodID__foodName', 'foodID__price', 'foodID__image', 'stock', 'price',
+            )
+        ], ignore_conflicts=True)
+
+        ArchivedOrderEvent.objects.bulk_create([
+            ArchivedOrderEvent(
+                eventID=event_id, order_id=order_id, seq=seq, code=code,
+                notes=notes, created_at=created_at, updated_by=updated_by,
+            )
+            for event_id, order_id, seq, code, notes, created_at, updated_by
+            in OrderEvent.objects.filter(order_id__in=order_ids).values_list(
+                'eventID', 'order_id', 'seq', 'code', 'notes', 'created_at', 'updated_by'
+            )
+        ], ignore_conflicts=True)
+
+        # the whole order goes, so there are no totals or links left to update,
+        # but it leaves the live counters
+        changes = counters.deltas()
+        restaurants = {}
+        for order_id, restaurant_id, link_status in RestaurantOrder.objects.filter(
+            order_id__in=order_ids
+        ).values_list('order_id', 'restaurant_id', 'status'):
+            restaurants.setdefault(order_id, []).append(restaurant_id)
+            counters.count_orders(changes, restaurant_id, link_status, -1)
+        for order_id, _, _, _, order_status, _, _ in orders:
+            counters.count_orders(changes, None, order_status, -1)
+            active = sum(d['status'] == counters.ACTIVE_DELIVERY for d in deliveries.get(order_id, []))
+            counters.count_deliveries(changes, restaurants.get(order_id, ()), -active)
+        counters.add(changes)
+        dashboard.changed({rid for ids in restaurants.values() for rid in ids})
+        # the per food rollups only count hot orders
+        rollups.days_changed({day for _, _, day, _, _, _, _ in orders})
+
+        with signals.order_line_signals_suspended():
+            Order.objects.filter(orderID__in=order_ids).delete()
+    return len(order_ids)
+
+
+def archive_orders(cutoff=None, batch_size=BATCH_SIZE, max_batches=None):
+    """
+    Archive closed orders dated before `cutoff` in batches.
+    Yields the number of orders moved by each batch.
+    """
+    cutoff = cutoff or default_cutoff()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        order_ids = list(candidates(cutoff).values_list('orderID', flat=True)[:batch_size])
+        if not order_ids:
+            return
+        yield archive_batch(order_ids)
+        batches += 1
+
+
+def newest_archived_date():
+    return ArchivedOrder.objects.aggregate(newest=Max('date'))['newest']
+
+
+def needs_archive(date_from=None):
+    """Whether a range starting at `date_from` (None = open) reaches archived orders."""
+    newest = newest_archived_date()
+    if newest is None:
+        return False
+    start = parse_date(date_from) if isinstance(date_from, str) else date_from
+    return start is None or start <= newest
+
+
+def for_restaurant(queryset, restaurant_id):
+    """Restrict an ArchivedOrder queryset to orders containing the restaurant's food."""
+    return queryset.filter(
+        orderID__in=ArchivedOrderFood.objects.filter(restaurant_id=restaurant_id).values('order_id')
+    )
+
+
+def restaurant_lines(queryset):
+    """One ArchivedOrderFood line per (order, restaurant) of an ArchivedOrder queryset."""
+    first_line = ArchivedOrderFood.objects.filter(
+        order_id=OuterRef('order_id'), restaurant_id=OuterRef('restaurant_id')
+    ).order_by('ID').values('ID')[:1]
+    return ArchivedOrderFood.objects.filter(order__in=queryset.values('orderID'), ID=Subquery(first_line))
+
+
+def order_restaurants(queryset):
+    """order id -> set of restaurant ids for an ArchivedOrder queryset."""
+    restaurants = {}
+    for order_id, restaurant_id in ArchivedOrderFood.objects.filter(
+        order__in=queryset.values('orderID')
+    ).values_list('order_id', 'restaurant_id').distinct():
+        restaurants.setdefault(order_id, set()).add(restaurant_id)
+    return restaurants
+
+
+def order_detail(order_id, events_since=0):
+    """An archived order in the shape of the order detail response, or None."""
+    order = ArchivedOrder.objects.filter(orderID=order_id).first()
+    if order is None:
+        return None
+    user = User.objects.filter(userID=order.user_id).first()
+    return {
+        'orderID': order.orderID,
+        'user': {
+            'userID': user.userID,
+            'userName': user.userName,
+            'email': user.email,
+            'phone': user.phone,
+        } if user else None,
+        'date': order.date,
+        'location': order.location,
+        'status': order.status or 'pending',
+        'items': [{
+            'ID': line.ID,
+            'food': {
+                'foodID': line.food_id,
+                'foodName': line.food_name,
+                'price': line.food_price,
+                'image': line.food_image,
+            },
+            'quantity': line.stock,
+            'unit_price': line.price,
+            'total': line.price * line.stock,
+        } for line in order.lines.order_by('ID')],
+        'total_price': order.total_price,
+        'status_history': [
+            order_events.as_dict(e) for e in order.events.filter(seq__gt=events_since).order_by('-seq')
+        ],
+        'archived': True,
+    }
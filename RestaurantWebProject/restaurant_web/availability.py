@@ -0,0 +1,239 @@
+"""
+Menu availability engine.
+
+A food is available when
+
+* its Menu entry is not switched off (no Menu entry counts as available),
+* it is not out of stock (an Inventory row with stock_quantity <= 0), and
+* its restaurant is open at the given moment (OperatingHours; a weekday
+  without a row counts as open).
+
+For every restaurant the engine keeps a small precomputed state in the
+cache: the ids of disabled / out-of-stock / low-stock foods plus the weekly
+opening hours, so availability checks and single-restaurant listings
+never need a subquery. The state is built lazily with three queries and
+stored under a per-restaurant version (like restaurant_web.snapshots);
+the Menu / Inventory / OperatingHours signal handlers bump the version
+after commit and the next read rebuilds it. A state built from data read
+before a write commits lands under the old version and is never read.
+
+Listings over all restaurants filter with EXISTS conditions instead of the
+states, which would mean loading every state and excluding their id lists
+literally.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import dateparse, timezone
+
+from api.models import Food
+from restaurant_web.models import Inventory, Menu, OperatingHours
+
+
+STATE_TTL = 24 * 60 * 60
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def _version_key(restaurant_id):
+    return f'availability:version:{restaurant_id}'
+
+
+def _key(restaurant_id, version):
+    return f'availability:{restaurant_id}:{version}'
+
+
+def _new_version():
+    # time based so a version evicted from the cache never comes back
+    return time.time_ns() // 1000
+
+
+def _versions(restaurant_ids):
+    keys = {rid: _version_key(rid) for rid in restaurant_ids}
+    cached = cache.get_many(keys.values())
+    versions = {}
+    for rid, key in keys.items():
+        version = cached.get(key)
+        if version is None:
+            version = _new_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[rid] = version
+    return versions
+
+
+def _time_str(value):
+    if isinstance(value, str):
+        # instances saved straight from request data still hold strings
+        value = dateparse.parse_time(value)
+    return value.replace(microsecond=0).isoformat()
+
+
+def _hours_entry(hours):
+    # None = closed all day, otherwise (open, close) as 'HH:MM:SS' strings
+    if hours.is_closed or not hours.open_time or not hours.close_time:
+        return None
+    return (_time_str(hours.open_time), _time_str(hours.close_time))
+
+
+def _empty_state():
+    return {'disabled': set(), 'out_of_stock': set(), 'low_stock': set(), 'hours': {}}
+
+
+def _build_states(restaurant_ids, versions):
+    states = {rid: _empty_state() for rid in restaurant_ids}
+
+    for rid, food_id in Menu.objects.filter(
+        restaurant_id__in=restaurant_ids, is_available=False
+    ).values_list('restaurant_id', 'food_id'):
+        states[rid]['disabled'].add(food_id)
+
+    for rid, food_id, stock, minimum in Inventory.objects.filter(
+        restaurant_id__in=restaurant_ids
+    ).values_list('restaurant_id', 'food_id', 'stock_quantity', 'min_stock_level'):
+        _apply_stock(states[rid], food_id, stock, minimum)
+
+    for hours in OperatingHours.objects.filter(restaurant_id__in=restaurant_ids):
+        states[hours.restaurant_id]['hours'][hours.day_of_week] = _hours_entry(hours)
+
+    cache.set_many({_key(rid, versions[rid]): state for rid, state in states.items()}, STATE_TTL)
+    return states
+
+
+def _apply_stock(state, food_id, stock, minimum):
+    state['out_of_stock'].discard(food_id)
+    state['low_stock'].discard(food_id)
+    if stock is None:
+        return
+    stock, minimum = int(stock), int(minimum)
+    if stock <= 0:
+        state['out_of_stock'].add(food_id)
+    elif stock <= minimum:
+        state['low_stock'].add(food_id)
+
+
+def get_states(restaurant_ids):
+    """Availability state per restaurant id, building missing ones in bulk."""
+    versions = _versions({int(rid) for rid in restaurant_ids})
+    keys = {rid: _key(rid, version) for rid, version in versions.items()}
+    cached = cache.get_many(keys.values())
+    states = {rid: cached[key] for rid, key in keys.items() if key in cached}
+    missing = [rid for rid in versions if rid not in states]
+    if missing:
+        states.update(_build_states(missing, versions))
+    return states
+
+
+def get_state(restaurant_id):
+    return get_states([restaurant_id])[int(restaurant_id)]
+
+
+def is_open(state, at=None):
+    at = timezone.localtime(at) if at is not None else timezone.localtime()
+    day = WEEKDAYS[at.weekday()]
+    if day not in state['hours']:
+        return True
+    hours = state['hours'][day]
+    if hours is None:
+        return False
+    opens, closes = hours
+    now = at.time().replace(microsecond=0).isoformat()
+    if opens <= closes:
+        return opens <= now < closes
+    # open past midnight
+    return now >= opens or now < closes
+
+
+def blocked(state):
+    """Food ids that are unavailable regardless of opening hours."""
+    return state['disabled'] | state['out_of_stock']
+
+
+def is_available(food_id, at=None, restaurant_id=None):
+    """Whether a food can be ordered at `at` (default: now)."""
+    if restaurant_id is None:
+        restaurant_id = Food.objects.filter(foodID=food_id).values_list('resID_id', flat=True).first()
+        if restaurant_id is None:
+            return False
+    state = get_state(restaurant_id)
+    return food_id not in blocked(state) and is_open(state, at)
+
+
+def _unavailable(restaurant_id, at=None):
+    """(whether the restaurant is closed, blocked food ids) from its precomputed state."""
+    state = get_state(restaurant_id)
+    return not is_open(state, at), blocked(state)
+
+
+def _open_q(at=None):
+    """A Q over OperatingHours rows: open at `at` (the SQL form of is_open)."""
+    now = (timezone.localtime(at) if at is not None else timezone.localtime()).time().replace(microsecond=0)
+    same_day = Q(open_time__lte=F('close_time')) & Q(open_time__lte=now, close_time__gt=now)
+    past_midnight = Q(open_time__gt=F('close_time')) & (Q(open_time__lte=now) | Q(close_time__gt=now))
+    return Q(is_closed=False) & (same_day | past_midnight)
+
+
+def _unavailable_q(at=None):
+    """A Q over Food rows matching unavailable foods of any restaurant, as EXISTS conditions."""
+    at = timezone.localtime(at) if at is not None else timezone.localtime()
+    closed = OperatingHours.objects.filter(
+        restaurant=OuterRef('resID'), day_of_week=WEEKDAYS[at.weekday()]
+    ).exclude(_open_q(at))
+    disabled = Menu.objects.filter(food=OuterRef('pk'), is_available=False)
+    out_of_stock = Inventory.objects.filter(food=OuterRef('pk'), stock_quantity__lte=0)
+    return Exists(closed) | Exists(disabled) | Exists(out_of_stock)
+
+
+def available_q(restaurant_id=None, at=None):
+    """A Q matching available foods, for filters and conditional aggregates."""
+    if not restaurant_id:
+        return ~_unavailable_q(at)
+    closed, food_ids = _unavailable(restaurant_id, at)
+    if closed:
+        return ~Q(resID_id=restaurant_id)
+    return ~Q(foodID__in=food_ids)
+
+
+def filter_available(queryset, available=True, restaurant_id=None, at=None):
+    """
+    Restrict a Food queryset to available (or unavailable) foods. For one
+    restaurant this uses the literal id lists of its precomputed state.
+    """
+    if available:
+        return queryset.filter(available_q(restaurant_id, at))
+    if not restaurant_id:
+        return queryset.filter(_unavailable_q(at))
+    closed, food_ids = _unavailable(restaurant_id, at)
+    if closed:
+        return queryset
+    return queryset.filter(foodID__in=food_ids)
+
+
+# ---- invalidation (called from restaurant_web.signals) ----
+
+def menu_changed(menu, deleted=False):
+    invalidate([menu.restaurant_id])
+
+
+def inventory_changed(inventory, deleted=False):
+    invalidate([inventory.restaurant_id])
+
+
+def hours_changed(hours, deleted=False):
+    invalidate([hours.restaurant_id])
+
+
+def invalidate(restaurant_ids):
+    """Make the cached states stale after commit; the next read rebuilds them."""
+    keys = [_version_key(rid) for rid in set(restaurant_ids) if rid is not None]
+
+    def apply():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                # not cached: there is no state to go stale
+                pass
+
+    transaction.on_commit(apply)
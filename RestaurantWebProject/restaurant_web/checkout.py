@@ -0,0 +1,219 @@
+"""
+Cart -> order checkout.
+
+`checkout` turns a user's cart into an `Order` with its `OrderFood` lines,
+an initial `pending` event and a `Payment`, all in one transaction:
+
+* prices come from `Food` in the same query that reads the cart
+* an optional `Coupon` takes its percent off the line total, an optional
+  `DeliveryPrice` zone adds its fee; the payment is for the result
+* tracked `Inventory` rows are decremented by a single conditional
+  UPDATE; if any of them has too little stock nothing is written
+* the cart is emptied
+
+Lines are written with `bulk_create`, so the order totals / link rows the
+OrderFood signals would maintain are refreshed explicitly.
+
+With an idempotency key the first successful checkout stores its response
+under (user, key); retries get that response back instead of a second
+order. Reusing a key for a different request is a conflict.
+"""
+import hashlib
+import json
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from rest_framework import exceptions
+
+from api.models import Cart, CartFood, Coupon, DeliveryPrice, Order, OrderFood, Payment
+from restaurant_web import availability, counters, dashboard, order_events, order_links, order_totals
+from restaurant_web.models import CheckoutKey, Inventory, OrderEvent
+
+
+MAX_KEY_LENGTH = 255
+PAYMENT_METHODS = ('cash', 'card', 'qpay')
+
+Result = namedtuple('Result', ['data', 'replayed'])
+
+
+class CheckoutError(exceptions.APIException):
+    status_code = 400
+    default_detail = {'error': 'Захиалга үүсгэж чадсангүй'}
+
+    def __init__(self, message, status_code=None):
+        super().__init__({'error': message})
+        if status_code is not None:
+            self.status_code = status_code
+
+
+def _request_hash(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _claim_key(user_id, key, request_hash):
+    """Store the key, or return the earlier checkout's stored response."""
+    try:
+        with transaction.atomic():
+            CheckoutKey.objects.create(user_id=user_id, key=key, request_hash=request_hash)
+        return None
+    except IntegrityError:
+        # a concurrent request with the same key waited on the unique index
+        # and only gets here after the other transaction committed
+        existing = CheckoutKey.objects.get(user_id=user_id, key=key)
+    if existing.request_hash != request_hash:
+        raise CheckoutError('Idempotency-Key өөр хүсэлтэд ашиглагдсан байна', status_code=409)
+    return existing.response
+
+
+def _discount_percent(coupon_code):
+    coupon = Coupon.objects.filter(code=coupon_code, active=True).first()
+    if coupon is None:
+        raise CheckoutError('Купон олдсонгүй эсвэл идэвхгүй байна')
+    try:
+        percent = int(str(coupon.percent).strip().rstrip('%'))
+    except ValueError:
+        raise CheckoutError('Купоны хувь буруу байна')
+    return min(max(percent, 0), 100)
+
+
+def _delivery_fee(zone_id):
+    fee = DeliveryPrice.objects.filter(ID=zone_id).values_list('price', flat=True).first()
+    if fee is None:
+        raise CheckoutError('Хүргэлтийн бүс олдсонгүй')
+    return fee
+
+
+def _check_available(lines):
+    states = availability.get_states({restaurant_id for _, _, _, restaurant_id in lines})
+    unavailable = [
+        food_id for food_id, _, _, restaurant_id in lines
+        if food_id in states[restaurant_id]['disabled'] or not availability.is_open(states[restaurant_id])
+    ]
+    if unavailable:
+        raise CheckoutError(f'Захиалах боломжгүй хоол: {", ".join(map(str, unavailable))}', status_code=409)
+
+
+def _take_stock(lines):
+    """Decrement tracked inventory for all lines in one UPDATE, all or nothing."""
+    # several cart lines (or carts) may hold the same food
+    wanted = {}
+    for food_id, quantity, _, restaurant_id in lines:
+        wanted[(food_id, restaurant_id)] = wanted.get((food_id, restaurant_id), 0) + quantity
+    rows = Q(pk__in=[])
+    enough = Q(pk__in=[])
+    for (food_id, restaurant_id), quantity in wanted.items():
+        rows |= Q(food_id=food_id, restaurant_id=restaurant_id)
+        enough |= Q(food_id=food_id, restaurant_id=restaurant_id, stock_quantity__gte=quantity)
+
+    # foods without an Inventory row are not tracked
+    tracked = Inventory.objects.filter(rows).count()
+    if not tracked:
+        return
+    updated = Inventory.objects.filter(enough).update(
+        stock_quantity=F('stock_quantity') - Case(
+            *[When(food_id=food_id, restaurant_id=restaurant_id, then=Value(quantity))
+              for (food_id, restaurant_id), quantity in wanted.items()],
+            output_field=IntegerField(),
+        ),
+        last_updated=timezone.now(),
+    )
+    if updated != tracked:
+        raise CheckoutError('Нөөц хүрэлцэхгүй байна', status_code=409)
+
+    # .update() sends no signals; invalidate the availability states and count like they would
+    changes = counters.deltas()
+    for inventory in Inventory.objects.filter(rows).only(
+        'food_id', 'restaurant_id', 'stock_quantity', 'min_stock_level'
+    ):
+        availability.inventory_changed(inventory)
+        taken = wanted[(inventory.food_id, inventory.restaurant_id)]
+        counters.count_inventory(
+            changes, inventory.restaurant_id,
+            counters.is_low(inventory.stock_quantity + taken, inventory.min_stock_level), -1,
+        )
+        counters.count_inventory(
+            changes, inventory.restaurant_id, counters.is_low(inventory.stock_quantity, inventory.min_stock_level), 1,
+        )
+    counters.add(changes)
+
+
+def checkout(user_id, location, payment_method='cash', coupon_code=None, zone_id=None, idempotency_key=None):
+    """
+    Turn the user's cart into an order. Returns a `Result` whose `data` is
+    the response body; `replayed` is True when an earlier checkout with the
+    same idempotency key is returned. Raises `CheckoutError`.
+    """
+    if payment_method not in PAYMENT_METHODS:
+        raise CheckoutError(f'Буруу төлбөрийн хэлбэр. Зөв: {", ".join(PAYMENT_METHODS)}')
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        raise CheckoutError('Idempotency-Key буруу байна')
+
+    with transaction.atomic():
+        if idempotency_key is not None:
+            request_hash = _request_hash({
+                'location': location, 'payment_method': payment_method,
+                'coupon_code': coupon_code, 'zone_id': zone_id,
+            })
+            stored = _claim_key(user_id, idempotency_key, request_hash)
+            if stored is not None:
+                return Result(stored, True)
+
+        # locks the cart so two checkouts of it run one after the other
+        cart_ids = list(Cart.objects.select_for_update().filter(userID_id=user_id).values_list('cartID', flat=True))
+        lines = list(
+            CartFood.objects.filter(cartID__in=cart_ids, stock__gt=0).order_by('pk')
+            .values_list('foodID_id', 'stock', 'foodID__price', 'foodID__resID_id')
+        )
+        if not lines:
+            raise CheckoutError('Сагс хоосон байна')
+
+        _check_available(lines)
+        percent = _discount_percent(coupon_code) if coupon_code else 0
+        delivery_fee = _delivery_fee(zone_id) if zone_id else 0
+        _take_stock(lines)
+
+        order = Order.objects.create(
+            userID_id=user_id, date=timezone.localdate(), location=location, status='pending',
+        )
+        OrderFood.objects.bulk_create([
+            OrderFood(orderID=order, foodID_id=food_id, stock=quantity, price=price)
+            for food_id, quantity, price, _ in lines
+        ])
+        # bulk_create skips the OrderFood signals
+        order_totals.refresh_orders([order.orderID])
+        order_links.sync_order_links([order.orderID])
+        dashboard.orders_changed([order.orderID])
+        order_events.append([order.orderID], OrderEvent.PENDING, 'checkout', updated_by=f'user:{user_id}')
+
+        subtotal = sum(price * quantity for _, quantity, price, _ in lines)
+        discount = subtotal * percent // 100
+        total = subtotal - discount + delivery_fee
+        payment = Payment.objects.create(orderID=order, price=total, turul=payment_method, status='pending')
+        CartFood.objects.filter(cartID__in=cart_ids).delete()
+
+        data = {
+            'orderID': order.orderID,
+            'date': order.date,
+            'location': order.location,
+            'status': order.status,
+            'items': [
+                {'foodID': food_id, 'quantity': quantity, 'unit_price': price, 'total': price * quantity}
+                for food_id, quantity, price, _ in lines
+            ],
+            'items_count': len(lines),
+            'subtotal': subtotal,
+            'discount_percent': percent,
+            'discount': discount,
+            'delivery_fee': delivery_fee,
+            'total': total,
+            'payment': {
+                'payID': payment.payID, 'price': payment.price, 'turul': payment.turul, 'status': payment.status,
+            },
+        }
+        if idempotency_key is not None:
+            CheckoutKey.objects.filter(user_id=user_id, key=idempotency_key).update(
+                order=order, response=data,
+            )
+    return Result(data, False)
@@ -0,0 +1,374 @@
+"""
+Columnar export of the order history for analytics.
+
+`Order`, `OrderFood` and `Food` (hot and archived orders alike) are copied
+into flat NumPy arrays, one `.npy` file per column, under ANALYTICS_DIR.
+Readers open them with `mmap_mode='r'`, so every process shares the same
+pages and only touches the columns an analysis needs.
+
+Ids are dictionary-encoded: users, foods and restaurants are numbered
+0..n-1 in the order they were first seen (`*_ids` hold the real id of each
+code), and line columns point at their order by row number. Codes never
+change once given out, so refreshes only append.
+
+`refresh` continues from the watermarks of the last export:
+
+* orders and lines with an id above the last exported one are appended
+* orders with new events (status changes) or new lines get their status,
+  total and item count re-read
+* the small food table is re-read as a whole
+
+Line edits / deletions on already exported orders and orders committed
+after a higher id was exported are not seen this way; `refresh(full=True)`
+(`manage.py refresh_analytics --full`) rebuilds everything.
+
+Each export is written into a new generation directory and published by
+replacing the CURRENT file, so readers never see half of one.
+"""
+import json
+import os
+import shutil
+import time
+from datetime import date, timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Max
+from django.utils import timezone
+
+from api.models import Food, Order, OrderFood
+from restaurant_web.models import ArchivedOrder, ArchivedOrderFood, OrderEvent
+
+
+ANALYTICS_DIR = getattr(settings, 'ANALYTICS_DIR', os.path.join(settings.BASE_DIR, 'var', 'analytics'))
+FORMAT_VERSION = 1
+FETCH_SIZE = 50000
+EPOCH = date(1970, 1, 1)
+
+ORDER_COLUMNS = {
+    'order_id': np.int64,
+    'order_date': np.int32,     # days since EPOCH
+    'order_status': np.uint16,  # code into meta['statuses']
+    'order_user': np.int32,     # code into user_ids
+    'order_total': np.int64,
+    'order_items': np.int32,
+}
+LINE_COLUMNS = {
+    'line_id': np.int64,
+    'line_order': np.int32,       # row in the order columns
+    'line_food': np.int32,        # code into food_ids
+    'line_restaurant': np.int32,  # code into restaurant_ids
+    'line_quantity': np.int32,
+    'line_price': np.int64,
+}
+FOOD_COLUMNS = {
+    'food_restaurant': np.int32,  # code into restaurant_ids
+    'food_category': np.int64,
+    'food_price': np.int64,
+}
+DICTIONARIES = ('user_ids', 'food_ids', 'restaurant_ids')
+
+# as read from the database, before the ids are encoded
+RAW_ORDER_COLUMNS = {**ORDER_COLUMNS, 'order_user': np.int64}
+RAW_LINE_COLUMNS = {
+    'line_id': np.int64,
+    'order_id': np.int64,
+    'food_id': np.int64,
+    'restaurant_id': np.int64,
+    'line_quantity': np.int32,
+    'line_price': np.int64,
+}
+HOT_LINE_FIELDS = ('ID', 'orderID_id', 'foodID_id', 'foodID__resID_id', 'stock', 'price')
+ARCHIVED_LINE_FIELDS = ('ID', 'order_id', 'food_id', 'restaurant_id', 'stock', 'price')
+
+_loaded = None
+
+
+class Store:
+    """One published export: its columns as attributes, plus `meta`."""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        for name in (*ORDER_COLUMNS, *LINE_COLUMNS, *FOOD_COLUMNS, *DICTIONARIES):
+            setattr(self, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+    @property
+    def generation(self):
+        return self.meta['generation']
+
+    @property
+    def statuses(self):
+        return self.meta['statuses']
+
+    def status_code(self, status):
+        """The code of a status, or None if no exported order has it."""
+        try:
+            return self.statuses.index(status)
+        except ValueError:
+            return None
+
+    def code_of(self, dictionary, value):
+        """The code of a user / food / restaurant id, or None if unknown."""
+        ids = getattr(self, dictionary)
+        found = np.flatnonzero(ids == int(value))
+        return int(found[0]) if found.size else None
+
+
+def to_days(day):
+    return (day - EPOCH).days
+
+
+def from_days(days):
+    return EPOCH + timedelta(days=int(days))
+
+
+def _current_path():
+    return os.path.join(ANALYTICS_DIR, 'CURRENT')
+
+
+def load():
+    """The current export, or None before the first refresh."""
+    global _loaded
+    try:
+        with open(_current_path()) as current:
+            generation = current.read().strip()
+    except FileNotFoundError:
+        return None
+    if _loaded is None or _loaded.generation != generation:
+        path = os.path.join(ANALYTICS_DIR, generation)
+        with open(os.path.join(path, 'meta.json')) as meta:
+            _loaded = Store(path, json.load(meta))
+    return _loaded
+
+
+# ---- encoding ----
+
+def _encode(ids, new_ids):
+    """
+    Codes of `new_ids` in the dictionary `ids`; ids not in it yet are
+    appended. Returns (codes, extended dictionary).
+    """
+    new_ids = np.asarray(new_ids, dtype=np.int64)
+    if ids.size:
+        order = np.argsort(ids, kind='stable')
+        at = np.minimum(np.searchsorted(ids, new_ids, sorter=order), ids.size - 1)
+        known = ids[order[at]] == new_ids
+    else:
+        known = np.zeros(new_ids.size, dtype=bool)
+    unknown = np.unique(new_ids[~known])
+    extended = np.concatenate([ids, unknown]).astype(np.int64)
+    codes = np.empty(new_ids.size, dtype=np.int32)
+    if ids.size:
+        codes[known] = order[at[known]]
+    codes[~known] = ids.size + np.searchsorted(unknown, new_ids[~known])
+    return codes, extended
+
+
+def _fetch(rows, dtypes):
+    """Read (already converted) value tuples into one array per dtype, a chunk at a time."""
+    rows = iter(rows)
+    chunks = [[] for _ in dtypes]
+    while batch := list(islice(rows, FETCH_SIZE)):
+        for chunk, column, dtype in zip(chunks, zip(*batch), dtypes):
+            chunk.append(np.array(column, dtype=dtype))
+    return [np.concatenate(chunk) if chunk else np.empty(0, dtype) for chunk, dtype in zip(chunks, dtypes)]
+
+
+def _order_rows(queryset, statuses):
+    for order_id, user_id, day, order_status, total, items in queryset.values_list(
+        'pk', 'user_key', 'date', 'status', 'total_price', 'items_count'
+    ).iterator(chunk_size=FETCH_SIZE):
+        if order_status not in statuses:
+            statuses.append(order_status)
+        # in ORDER_COLUMNS order
+        yield order_id, to_days(day), statuses.index(order_status), user_id, total, items
+
+
+def _orders(queryset, statuses):
+    """Order columns (user still as raw id) of a queryset annotated with `user_key`."""
+    return dict(zip(RAW_ORDER_COLUMNS, _fetch(_order_rows(queryset, statuses), RAW_ORDER_COLUMNS.values())))
+
+
+def _concat(parts, columns):
+    return {
+        name: np.concatenate([part[name] for part in parts]).astype(dtype)
+        for name, dtype in columns.items()
+    }
+
+
+# ---- export ----
+
+def _hot_orders(queryset):
+    return queryset.annotate(user_key=F('userID_id'))
+
+
+def _archived_orders(queryset):
+    return queryset.annotate(user_key=F('user_id'))
+
+
+def _lines(queryset, fields):
+    """Line columns, with order / food / restaurant still as raw ids."""
+    return dict(zip(RAW_LINE_COLUMNS, _fetch(
+        queryset.values_list(*fields).iterator(chunk_size=FETCH_SIZE), RAW_LINE_COLUMNS.values(),
+    )))
+
+
+def _empty(columns):
+    return {name: np.empty(0, dtype) for name, dtype in columns.items()}
+
+
+def _read_store(store):
+    """Copies of all columns of a store, to be extended by a refresh."""
+    return {
+        name: np.array(getattr(store, name))
+        for name in (*ORDER_COLUMNS, *LINE_COLUMNS, *FOOD_COLUMNS, *DICTIONARIES)
+    }
+
+
+def _append_orders(columns, new):
+    user_codes, columns['user_ids'] = _encode(columns['user_ids'], new['order_user'])
+    new['order_user'] = user_codes
+    for name, dtype in ORDER_COLUMNS.items():
+        columns[name] = np.concatenate([columns[name], new[name]]).astype(dtype)
+
+
+def _sort_orders(columns):
+    order = np.argsort(columns['order_id'], kind='stable')
+    for name in ORDER_COLUMNS:
+        columns[name] = columns[name][order]
+
+
+def _append_lines(columns, new):
+    """Add lines of orders that are in the order columns (others are dropped)."""
+    order_ids = columns['order_id']
+    if order_ids.size:
+        at = np.minimum(np.searchsorted(order_ids, new['order_id']), order_ids.size - 1)
+        exists = order_ids[at] == new['order_id']
+    else:
+        at = exists = np.zeros(new['order_id'].size, dtype=bool)
+    new = {name: values[exists] for name, values in new.items()}
+    food_codes, columns['food_ids'] = _encode(columns['food_ids'], new['food_id'])
+    restaurant_codes, columns['restaurant_ids'] = _encode(columns['restaurant_ids'], new['restaurant_id'])
+    appended = {
+        'line_id': new['line_id'],
+        'line_order': at[exists],
+        'line_food': food_codes,
+        'line_restaurant': restaurant_codes,
+        'line_quantity': new['line_quantity'],
+        'line_price': new['line_price'],
+    }
+    for name, dtype in LINE_COLUMNS.items():
+        columns[name] = np.concatenate([columns[name], appended[name]]).astype(dtype)
+
+
+def _update_orders(columns, order_ids, statuses):
+    """Re-read status / total / item count of exported hot orders."""
+    known = columns['order_id']
+    for start in range(0, len(order_ids), FETCH_SIZE):
+        rows = _orders(_hot_orders(Order.objects.filter(pk__in=order_ids[start:start + FETCH_SIZE])), statuses)
+        at = np.searchsorted(known, rows['order_id'])
+        for name in ('order_status', 'order_total', 'order_items'):
+            columns[name][at] = rows[name]
+
+
+def _foods(columns):
+    """Re-read the food table; foods deleted since keep their last values."""
+    food_ids, restaurant_ids, categories, prices = _fetch(
+        Food.objects.values_list('foodID', 'resID_id', 'catID_id', 'price').iterator(chunk_size=FETCH_SIZE),
+        (np.int64, np.int64, np.int64, np.int64),
+    )
+    codes, columns['food_ids'] = _encode(columns['food_ids'], food_ids)
+    restaurant_codes, columns['restaurant_ids'] = _encode(columns['restaurant_ids'], restaurant_ids)
+    size = columns['food_ids'].size
+    for name, dtype in FOOD_COLUMNS.items():
+        previous = columns[name]
+        columns[name] = np.zeros(size, dtype=dtype)
+        columns[name][:previous.size] = previous
+    columns['food_restaurant'][codes] = restaurant_codes
+    columns['food_category'][codes] = categories
+    columns['food_price'][codes] = prices
+
+
+def _publish(columns, meta):
+    os.makedirs(ANALYTICS_DIR, exist_ok=True)
+    generation = f'gen-{time.time_ns()}-{os.getpid()}'
+    path = os.path.join(ANALYTICS_DIR, generation)
+    os.makedirs(path)
+    for name, values in columns.items():
+        np.save(os.path.join(path, f'{name}.npy'), values)
+    meta = {**meta, 'generation': generation}
+    with open(os.path.join(path, 'meta.json'), 'w') as out:
+        json.dump(meta, out)
+
+    previous = load()
+    pointer = f'{_current_path()}.{generation}'
+    with open(pointer, 'w') as out:
+        out.write(generation)
+    os.replace(pointer, _current_path())
+
+    # keep the previous generation for readers that still have it open
+    keep = {generation, previous.generation if previous else None}
+    for name in os.listdir(ANALYTICS_DIR):
+        if name.startswith('gen-') and name not in keep:
+            shutil.rmtree(os.path.join(ANALYTICS_DIR, name), ignore_errors=True)
+    return load()
+
+
+def refresh(full=False):
+    """Bring the export up to date (or rebuild it with `full`); returns the new Store."""
+    store = None if full else load()
+    if store is not None and store.meta.get('version') != FORMAT_VERSION:
+        store = None
+
+    # read before the rows, so anything written meanwhile is seen next time
+    event_mark = OrderEvent.objects.aggregate(last=Max('eventID'))['last'] or 0
+
+    if store is None:
+        statuses = []
+        columns = {**_empty(ORDER_COLUMNS), **_empty(LINE_COLUMNS), **_empty(FOOD_COLUMNS)}
+        columns.update({name: np.empty(0, np.int64) for name in DICTIONARIES})
+        # lines first: every order a line read here points at is read below
+        lines = _concat([
+            _lines(ArchivedOrderFood.objects.order_by('ID'), ARCHIVED_LINE_FIELDS),
+            _lines(OrderFood.objects.order_by('ID'), HOT_LINE_FIELDS),
+        ], RAW_LINE_COLUMNS)
+        _append_orders(columns, _concat([
+            _orders(_archived_orders(ArchivedOrder.objects.all()), statuses),
+            _orders(_hot_orders(Order.objects.all()), statuses),
+        ], RAW_ORDER_COLUMNS))
+        _sort_orders(columns)
+        order = np.argsort(lines['line_id'], kind='stable')
+        _append_lines(columns, {name: values[order] for name, values in lines.items()})
+    else:
+        statuses = list(store.statuses)
+        columns = _read_store(store)
+        order_mark = store.meta['watermarks']['order']
+        line_mark = store.meta['watermarks']['line']
+
+        new_lines = _lines(OrderFood.objects.filter(ID__gt=line_mark).order_by('ID'), HOT_LINE_FIELDS)
+        changed = set(OrderEvent.objects.filter(
+            eventID__gt=store.meta['watermarks']['event'], order_id__lte=order_mark,
+        ).values_list('order_id', flat=True).distinct())
+        changed.update(int(order_id) for order_id in np.unique(new_lines['order_id']) if order_id <= order_mark)
+
+        _append_orders(columns, _orders(
+            _hot_orders(Order.objects.filter(pk__gt=order_mark).order_by('pk')), statuses,
+        ))
+        if changed:
+            _update_orders(columns, sorted(changed), statuses)
+        _append_lines(columns, new_lines)
+
+    _foods(columns)
+    return _publish(columns, {
+        'version': FORMAT_VERSION,
+        'statuses': statuses,
+        'watermarks': {
+            'order': int(columns['order_id'][-1]) if columns['order_id'].size else 0,
+            'line': int(columns['line_id'].max()) if columns['line_id'].size else 0,
+            'event': event_mark,
+        },
+        'rows': {'orders': int(columns['order_id'].size), 'lines': int(columns['line_id'].size)},
+        'refreshed_at': timezone.now().isoformat(),
+    })
@@ -0,0 +1,205 @@
+"""
+Live per-restaurant counters.
+
+`RestaurantCounter` keeps one row per (restaurant, metric), and one per
+metric with restaurant NULL for all restaurants:
+
+* orders.total, orders.<status> - hot orders (per restaurant: orders with
+  lines from it, i.e. its link rows); no status counts as pending
+* inventory.total, inventory.low - inventory rows, and those at or below
+  their minimum stock level
+* deliveries.active - deliveries on the way (per restaurant: of orders
+  with lines from it)
+
+Writers add deltas with one ``UPDATE ... SET value = value + n`` per
+counter inside their own transaction, so a rollback takes the change back
+with it. Model signals cover single-row saves and deletes
+(restaurant_web.signals); the link table (order_links), status
+transitions (order_workflow), checkout stock and archiving pass their
+deltas explicitly.
+
+Writes that bypass all of these (raw SQL, other `QuerySet.update()`
+calls) leave the counters off; `reconcile` recounts everything from the
+source tables and `manage.py reconcile_counters` is meant to run
+periodically.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from api.models import Delivery, Order
+from restaurant_web.models import Inventory, RestaurantCounter, RestaurantOrder
+
+
+ORDER_STATUSES = ('pending', 'approved', 'preparing', 'ready', 'delivered', 'cancelled')
+ACTIVE_DELIVERY = 'on_the_way'
+METRICS = (
+    'orders.total',
+    *(f'orders.{name}' for name in ORDER_STATUSES),
+    'inventory.total',
+    'inventory.low',
+    'deliveries.active',
+)
+
+
+def deltas():
+    """A fresh (restaurant id or None, metric) -> change mapping."""
+    return Counter()
+
+
+def count_orders(changes, restaurant_id, status, n):
+    """Add `n` orders with `status` to a restaurant's (None: the overall) order counts."""
+    changes[(restaurant_id, 'orders.total')] += n
+    status = status or 'pending'
+    if status in ORDER_STATUSES:
+        changes[(restaurant_id, f'orders.{status}')] += n
+
+
+def move_orders(changes, restaurant_id, old, new, n=1):
+    if (old or 'pending') != (new or 'pending'):
+        count_orders(changes, restaurant_id, old, -n)
+        count_orders(changes, restaurant_id, new, n)
+
+
+def count_inventory(changes, restaurant_id, low, n):
+    for scope in (restaurant_id, None):
+        changes[(scope, 'inventory.total')] += n
+        if low:
+            changes[(scope, 'inventory.low')] += n
+
+
+def is_low(stock_quantity, min_stock_level):
+    # instances saved straight from request data may still hold strings
+    return int(stock_quantity) <= int(min_stock_level)
+
+
+def count_deliveries(changes, restaurant_ids, n):
+    """Add `n` active deliveries of an order with lines from `restaurant_ids`."""
+    changes[(None, 'deliveries.active')] += n
+    for restaurant_id in restaurant_ids:
+        changes[(restaurant_id, 'deliveries.active')] += n
+
+
+def active_deliveries(order_ids):
+    """order id -> number of its deliveries on the way."""
+    return dict(
+        Delivery.objects.filter(orderID__in=order_ids, status=ACTIVE_DELIVERY).values('orderID')
+        .annotate(active=Count('pk')).values_list('orderID', 'active').order_by()
+    )
+
+
+def order_restaurants(order_ids):
+    """order id -> restaurant ids it has lines from (its link rows)."""
+    restaurants = {}
+    for order_id, restaurant_id in RestaurantOrder.objects.filter(order_id__in=order_ids).values_list(
+        'order_id', 'restaurant_id'
+    ):
+        restaurants.setdefault(order_id, []).append(restaurant_id)
+    return restaurants
+
+
+def _scope(restaurant_id):
+    if restaurant_id is None:
+        return RestaurantCounter.objects.filter(restaurant__isnull=True)
+    return RestaurantCounter.objects.filter(restaurant_id=restaurant_id)
+
+
+def add(changes):
+    """Apply deltas; each counter is one atomic UPDATE (or the INSERT of its first value)."""
+    now = timezone.now()
+    # a fixed order, so two writers never wait on each other's rows crosswise
+    for (restaurant_id, metric), n in sorted(
+        changes.items(), key=lambda item: (item[0][0] is not None, item[0][0] or 0, item[0][1])
+    ):
+        if not n:
+            continue
+        rows = _scope(restaurant_id).filter(metric=metric)
+        if rows.update(value=F('value') + n, updated_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                RestaurantCounter.objects.create(restaurant_id=restaurant_id, metric=metric, value=n)
+        except IntegrityError:
+            rows.update(value=F('value') + n, updated_at=now)
+
+
+def read(restaurant_id=None):
+    """metric -> value for a restaurant (None: all restaurants), in one query."""
+    values = dict.fromkeys(METRICS, 0)
+    values.update(_scope(restaurant_id or None).values_list('metric', 'value'))
+    return values
+
+
+# ---- recounting ----
+
+def _alias(metric):
+    # dots are not allowed in SQL column aliases
+    return metric.replace('.', '_')
+
+
+def _order_counts():
+    pending = Q(status='pending') | Q(status__isnull=True)
+    return {
+        _alias('orders.total'): Count('pk'),
+        **{
+            _alias(f'orders.{name}'): Count('pk', filter=pending if name == 'pending' else Q(status=name))
+            for name in ORDER_STATUSES
+        },
+    }
+
+
+def _inventory_counts():
+    return {
+        _alias('inventory.total'): Count('pk'),
+        _alias('inventory.low'): Count('pk', filter=Q(stock_quantity__lte=F('min_stock_level'))),
+    }
+
+
+def actual():
+    """(restaurant id or None, metric) -> value counted from the source tables."""
+    values = {}
+
+    def put(restaurant_id, row):
+        for metric in METRICS:
+            if _alias(metric) in row:
+                values[(restaurant_id, metric)] = row[_alias(metric)]
+
+    put(None, Order.objects.aggregate(**_order_counts()))
+    for row in RestaurantOrder.objects.values('restaurant_id').annotate(**_order_counts()).order_by():
+        put(row['restaurant_id'], row)
+
+    put(None, Inventory.objects.aggregate(**_inventory_counts()))
+    for row in Inventory.objects.values('restaurant_id').annotate(**_inventory_counts()).order_by():
+        put(row['restaurant_id'], row)
+
+    values[(None, 'deliveries.active')] = Delivery.objects.filter(status=ACTIVE_DELIVERY).count()
+    for row in RestaurantOrder.objects.filter(order__delivery__status=ACTIVE_DELIVERY).values(
+        'restaurant_id'
+    ).annotate(active=Count('order__delivery')).order_by():
+        values[(row['restaurant_id'], 'deliveries.active')] = row['active']
+    return values
+
+
+def reconcile(dry_run=False):
+    """
+    Recount every counter and repair the ones that drifted. Returns a list
+    of (restaurant id or None, metric, stored, actual).
+    """
+    with transaction.atomic():
+        # writers updating a locked counter wait until the recount is stored
+        stored = {
+            (restaurant_id, metric): value
+            for restaurant_id, metric, value in RestaurantCounter.objects.select_for_update()
+            .values_list('restaurant_id', 'metric', 'value')
+        }
+        counted = actual()
+        drifted = [
+            (restaurant_id, metric, stored.get((restaurant_id, metric), 0), value)
+            for (restaurant_id, metric), value in {**dict.fromkeys(stored, 0), **counted}.items()
+            if stored.get((restaurant_id, metric), 0) != value
+        ]
+        if not dry_run:
+            add(Counter({(restaurant_id, metric): value - was for restaurant_id, metric, was, value in drifted}))
+    return drifted
@@ -0,0 +1,138 @@
+"""
+Dashboard statistics.
+
+Order status, inventory and active delivery counts are read from the
+live counters (restaurant_web.counters) in one query, and reviews from
+the rating aggregates (restaurant_web.ratings). The rest is one
+conditional-aggregation query per table: today's / this week's orders
+and revenue are COUNT / SUM ... FILTER (WHERE ...) over `tbl_order`, and
+likewise for foods.
+
+Results are cached for DASHBOARD_CACHE_TTL seconds per scope (a restaurant
+id or 'all'). The worker / delivery counts are not restaurant specific and
+are cached once, as their own scope. Writes drop the scopes they touch
+after commit (see restaurant_web.signals; bulk paths call `changed` /
+`orders_changed` themselves); the TTL bounds how stale the time dependent
+parts (today, opening hours) and a read racing a write can get.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import Food, Order, Worker
+from restaurant_web import availability, counters, order_links, ratings
+from restaurant_web.models import RestaurantOrder
+
+
+DASHBOARD_TTL = getattr(settings, 'DASHBOARD_CACHE_TTL', 30)
+ALL = 'all'
+SHARED = 'shared'
+
+
+def _key(scope):
+    return f'dashboard:{scope}'
+
+
+def _revenue(restaurant_id):
+    orders = Order.objects.all()
+    if restaurant_id:
+        orders = order_links.for_restaurant(orders, restaurant_id)
+    today = timezone.now().date()
+    today_q = Q(date=today)
+    week_q = Q(date__gte=today - timedelta(days=today.weekday()))
+    return orders.aggregate(
+        today_orders=Count('pk', filter=today_q),
+        today_revenue=Coalesce(Sum('total_price', filter=today_q), Value(0)),
+        week_orders=Count('pk', filter=week_q),
+        week_revenue=Coalesce(Sum('total_price', filter=week_q), Value(0)),
+    )
+
+
+def _scoped(restaurant_id):
+    live = counters.read(restaurant_id)
+    revenue = _revenue(restaurant_id)
+
+    foods = Food.objects.all()
+    if restaurant_id:
+        foods = foods.filter(resID_id=restaurant_id)
+    menu = foods.aggregate(
+        total=Count('pk'),
+        available=Count('pk', filter=availability.available_q(restaurant_id=restaurant_id)),
+    )
+    rating = ratings.restaurant(restaurant_id)
+
+    return {
+        'orders': {
+            'total': live['orders.total'],
+            **{name: live[f'orders.{name}'] for name in counters.ORDER_STATUSES},
+        },
+        'today': {
+            'orders': revenue['today_orders'],
+            'revenue': revenue['today_revenue'],
+        },
+        'this_week': {
+            'orders': revenue['week_orders'],
+            'revenue': revenue['week_revenue'],
+        },
+        'menu': {
+            'total_foods': menu['total'],
+            'available_foods': menu['available'],
+        },
+        'inventory': {
+            'total_items': live['inventory.total'],
+            'low_stock_items': live['inventory.low'],
+        },
+        'reviews': {
+            'total': rating['count'],
+            'average_rating': rating['average'],
+        },
+    }
+
+
+def _shared():
+    return {
+        'workers': {
+            'total': Worker.objects.count(),
+            'active_deliveries': counters.read()['deliveries.active'],
+        },
+    }
+
+
+def stats(restaurant_id=None):
+    """The dashboard body for a restaurant id (None: all restaurants)."""
+    # an int, so '01' and '1' share the scope `changed` drops
+    restaurant_id = int(restaurant_id) if restaurant_id else None
+    scope = str(restaurant_id) if restaurant_id else ALL
+    cached = cache.get_many([_key(scope), _key(SHARED)])
+    scoped = cached.get(_key(scope))
+    if scoped is None:
+        scoped = _scoped(restaurant_id)
+        cache.set(_key(scope), scoped, DASHBOARD_TTL)
+    shared = cached.get(_key(SHARED))
+    if shared is None:
+        shared = _shared()
+        cache.set(_key(SHARED), shared, DASHBOARD_TTL)
+    return {**scoped, **shared}
+
+
+def _drop(scopes):
+    keys = [_key(scope) for scope in scopes]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def changed(restaurant_ids):
+    """Drop the cached statistics of the given restaurants (and 'all') after commit."""
+    _drop({str(int(rid)) for rid in restaurant_ids if rid is not None} | {ALL})
+
+
+def orders_changed(order_ids):
+    changed(RestaurantOrder.objects.filter(order_id__in=set(order_ids)).values_list('restaurant_id', flat=True))
+
+
+def shared_changed():
+    _drop([SHARED])
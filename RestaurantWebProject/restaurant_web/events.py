@@ -0,0 +1,188 @@
+"""
+Live order events for restaurant screens (served as Server-Sent Events).
+
+Signal handlers publish an event per restaurant when an order first gets
+lines of that restaurant (`order.created`) and when an `OrderEvent` is
+appended to the order's log (`order.status`). Publishing happens after commit.
+
+The `EventHub` fans events out to the streams open in this process. How
+events get to the hub is up to the backend:
+
+* LocalBackend - in-process only, for a single worker and development
+* RedisBackend - PUBLISH to a channel every worker listens on, with a
+  capped per-restaurant list as resume backlog (needs `redis`)
+
+Every event has an increasing integer id; a reconnecting client sends the
+last one it saw (Last-Event-ID) and gets the backlog after it first.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+
+BACKLOG_SIZE = 500
+QUEUE_SIZE = 1000
+CHANNEL = 'order-events'
+
+
+class Subscription:
+    """One open stream: a bounded queue fed from any thread."""
+
+    def __init__(self, restaurant_id, loop):
+        self.restaurant_id = restaurant_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # a stalled client; it reconnects and resumes from its last id
+            self.overflowed = True
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventHub:
+    """In-process fan-out of events to the subscriptions of a restaurant."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, restaurant_id):
+        subscription = Subscription(restaurant_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[restaurant_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.restaurant_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.restaurant_id]
+
+    def dispatch(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event['restaurant_id'], ()))
+        for subscription in subscriptions:
+            # safe from request threads and from the Redis listener thread
+            subscription.loop.call_soon_threadsafe(subscription.push, event)
+
+
+class LocalBackend:
+    name = 'local'
+
+    def __init__(self, hub, backlog_size=BACKLOG_SIZE):
+        self.hub = hub
+        # time based so ids keep increasing across restarts
+        self._ids = itertools.count(time.time_ns() // 1000)
+        self._backlog = defaultdict(lambda: deque(maxlen=backlog_size))
+        self._lock = threading.Lock()
+
+    def start(self):
+        pass
+
+    def publish(self, restaurant_id, type, data):
+        with self._lock:
+            event = {'id': next(self._ids), 'restaurant_id': restaurant_id, 'type': type, 'data': data}
+            self._backlog[restaurant_id].append(event)
+        self.hub.dispatch(event)
+
+    def since(self, restaurant_id, last_id):
+        with self._lock:
+            return [event for event in self._backlog.get(restaurant_id, ()) if event['id'] > last_id]
+
+
+class RedisBackend:
+    name = 'redis'
+
+    def __init__(self, hub, url, backlog_size=BACKLOG_SIZE):
+        import redis
+
+        self.hub = hub
+        self.client = redis.Redis.from_url(url)
+        self.backlog_size = backlog_size
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def _key(self, restaurant_id):
+        return f'{CHANNEL}:{restaurant_id}'
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='order-events', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                for message in pubsub.listen():
+                    self.hub.dispatch(json.loads(message['data']))
+            except Exception:
+                # connection lost: resubscribe; clients resume from the backlog
+                time.sleep(1)
+
+    def publish(self, restaurant_id, type, data):
+        event_id = self.client.incr(f'{CHANNEL}:seq')
+        payload = json.dumps(
+            {'id': event_id, 'restaurant_id': restaurant_id, 'type': type, 'data': data}, cls=DjangoJSONEncoder,
+        )
+        pipe = self.client.pipeline()
+        pipe.lpush(self._key(restaurant_id), payload)
+        pipe.ltrim(self._key(restaurant_id), 0, self.backlog_size - 1)
+        pipe.publish(CHANNEL, payload)
+        pipe.execute()
+
+    def since(self, restaurant_id, last_id):
+        events = [json.loads(raw) for raw in self.client.lrange(self._key(restaurant_id), 0, -1)]
+        return [event for event in reversed(events) if event['id'] > last_id]
+
+
+hub = EventHub()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The process-wide backend; Redis when ORDER_EVENTS_REDIS_URL is set."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            url = getattr(settings, 'ORDER_EVENTS_REDIS_URL', None)
+            _backend = RedisBackend(hub, url) if url else LocalBackend(hub)
+            _backend.start()
+        return _backend
+
+
+def publish(restaurant_ids, type, data):
+    """Publish an event to each restaurant once the transaction commits."""
+    restaurant_ids = sorted({rid for rid in restaurant_ids if rid is not None})
+    if not restaurant_ids:
+        return
+
+    def send():
+        backend = get_backend()
+        for restaurant_id in restaurant_ids:
+            backend.publish(restaurant_id, type, data)
+
+    transaction.on_commit(send)
+
+
+def format_event(event):
+    data = json.dumps({'type': event['type'], **event['data']}, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
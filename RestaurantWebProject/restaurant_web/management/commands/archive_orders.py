@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from restaurant_web import archive
+
+
+class Command(BaseCommand):
+    help = 'Move closed orders older than the configured age into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=archive.ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would move')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.localdate() - timedelta(days=options['older_than_days'])
+
+        if options['dry_run']:
+            count = archive.candidates(cutoff).count()
+            self.stdout.write(self.style.SUCCESS(f'{count} orders before {cutoff} would be archived'))
+            return
+
+        moved = 0
+        for count in archive.archive_orders(cutoff, options['batch_size'], options['max_batches']):
+            moved += count
+            self.stdout.write(f'archived {moved} orders')
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} orders dated before {cutoff}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from restaurant_web import order_links
+from restaurant_web.models import RestaurantOrder
+
+
+class Command(BaseCommand):
+    help = 'Build the restaurant -> order link table from existing order lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=order_links.CHUNK_SIZE)
+        parser.add_argument('--start-after', type=int, default=0, help='Resume after this order id')
+
+    def handle(self, *args, **options):
+        for last_id in order_links.backfill(options['chunk_size'], options['start_after']):
+            self.stdout.write(f'synced up to order {last_id}')
+
+        self.stdout.write(self.style.SUCCESS(f'{RestaurantOrder.objects.count()} restaurant order links'))
@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from restaurant_web import menu_io
+
+
+class Command(BaseCommand):
+    help = 'Stream foods and menu entries out as CSV or JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=menu_io.FORMATS, default='csv')
+        parser.add_argument('--restaurant', type=int, help='Only export this restaurant')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        out = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for part in menu_io.export_menu(options['format'], restaurant_id=options['restaurant']):
+                out.write(part)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from restaurant_web import menu_io
+
+
+class Command(BaseCommand):
+    help = 'Bulk import foods and menu entries from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV, JSON array or JSON Lines file')
+        parser.add_argument('--format', choices=menu_io.FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=menu_io.CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, write nothing')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if fmt in ('jsonl', 'ndjson'):
+            fmt = 'json'
+        if fmt not in menu_io.FORMATS:
+            raise CommandError(f'Unknown format "{fmt}", use --format')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                result = menu_io.import_menu(
+                    menu_io.read_rows(stream, fmt),
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, menu_io.ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        for error in result['errors']:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['created']} dishes, {result['failed']} rows failed"
+        ))
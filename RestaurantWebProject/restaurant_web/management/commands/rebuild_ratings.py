@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Restaurant
+from restaurant_web import dashboard, ratings
+
+
+class Command(BaseCommand):
+    help = 'Recount the restaurant and food rating aggregates from the reviews'
+
+    def handle(self, *args, **options):
+        restaurants, foods = ratings.rebuild()
+        dashboard.changed(Restaurant.objects.values_list('resID', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'Rated {restaurants} restaurants and {foods} foods'))
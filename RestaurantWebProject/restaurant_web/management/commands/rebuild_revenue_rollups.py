@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import dateparse
+
+from restaurant_web import rollups
+from restaurant_web.models import DailyRevenue
+
+
+class Command(BaseCommand):
+    help = 'Build (or rebuild) the daily revenue rollups from orders, a chunk of days at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First day (default: the first order)')
+        parser.add_argument('--to', dest='end', help='Last day (default: yesterday)')
+        parser.add_argument('--chunk-days', type=int, default=rollups.CHUNK_DAYS)
+        parser.add_argument(
+            '--catch-up', action='store_true',
+            help='Only roll up the days completed since the last run (run daily)',
+        )
+
+    def handle(self, *args, **options):
+        if options['catch_up']:
+            if options['start'] or options['end']:
+                raise CommandError('--catch-up takes no --from / --to')
+            for last_day in rollups.catch_up(options['chunk_days']):
+                self.stdout.write(f'rolled up through {last_day}')
+            self.stdout.write(self.style.SUCCESS(f'rolled up through {rollups.rolled_through()}'))
+            return
+
+        start = end = None
+        if options['start'] and not (start := dateparse.parse_date(options['start'])):
+            raise CommandError('--from must be YYYY-MM-DD')
+        if options['end'] and not (end := dateparse.parse_date(options['end'])):
+            raise CommandError('--to must be YYYY-MM-DD')
+
+        for last_day in rollups.rebuild(start, end, options['chunk_days']):
+            self.stdout.write(f'rolled up through {last_day}')
+
+        self.stdout.write(self.style.SUCCESS(f'{DailyRevenue.objects.count()} daily revenue rows'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Food
+from restaurant_web import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the menu full-text search index for every food'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurant', type=int, help='Only reindex foods of this restaurant')
+
+    def handle(self, *args, **options):
+        foods = Food.objects.all()
+        if options['restaurant']:
+            foods = foods.filter(resID_id=options['restaurant'])
+        food_ids = list(foods.order_by('foodID').values_list('foodID', flat=True))
+
+        if not options['restaurant']:
+            search.clear_index()
+
+        for start in range(0, len(food_ids), search.CHUNK_SIZE):
+            search.reindex_foods(food_ids[start:start + search.CHUNK_SIZE])
+            self.stdout.write(f'{min(start + search.CHUNK_SIZE, len(food_ids))}/{len(food_ids)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(food_ids)} foods using the {search.get_backend().name} backend'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from restaurant_web import counters, dashboard
+
+
+class Command(BaseCommand):
+    help = 'Recount the live per-restaurant counters from the source tables and repair drifted ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted counters')
+
+    def handle(self, *args, **options):
+        drifted = counters.reconcile(dry_run=options['dry_run'])
+        for restaurant_id, metric, stored, actual in drifted:
+            scope = f'restaurant {restaurant_id}' if restaurant_id is not None else 'all'
+            self.stdout.write(f'{scope} {metric}: {stored} -> {actual}')
+        if drifted and not options['dry_run']:
+            dashboard.changed({restaurant_id for restaurant_id, _, _, _ in drifted})
+            dashboard.shared_changed()
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted counters.'))
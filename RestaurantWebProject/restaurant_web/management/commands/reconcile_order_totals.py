@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from restaurant_web import order_totals
+
+
+class Command(BaseCommand):
+    help = 'Find orders whose stored total_price / items_count drifted from their lines and repair them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=order_totals.CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted orders')
+
+    def handle(self, *args, **options):
+        checked, repaired = order_totals.reconcile(
+            chunk_size=options['chunk_size'], dry_run=options['dry_run']
+        )
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} orders. {verb} {repaired} drifted.'))
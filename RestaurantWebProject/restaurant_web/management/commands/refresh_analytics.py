@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from restaurant_web import columnar
+
+
+class Command(BaseCommand):
+    help = 'Append new orders / lines to the columnar analytics export (or rebuild it with --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild from scratch instead of continuing')
+
+    def handle(self, *args, **options):
+        store = columnar.refresh(full=options['full'])
+        meta = store.meta
+        self.stdout.write(self.style.SUCCESS(
+            f"{meta['rows']['orders']} orders, {meta['rows']['lines']} lines in {store.path}"
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from restaurant_web import report_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued report jobs (restaurant_web.report_jobs) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait while the queue is empty')
+
+    def handle(self, *args, **options):
+        requeued = report_jobs.requeue_stale()
+        purged = report_jobs.purge()
+        self.stdout.write(f'requeued {requeued} stale jobs, purged {purged} old jobs')
+
+        ran = 0
+        while True:
+            job_id = report_jobs.next_queued()
+            if job_id is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+            if report_jobs.run(job_id):
+                ran += 1
+                self.stdout.write(f'ran job {job_id}')
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {ran} report jobs'))
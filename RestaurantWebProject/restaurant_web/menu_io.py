@@ -0,0 +1,332 @@
+"""
+Bulk menu import / export (Food + Menu rows).
+
+Import reads CSV or JSON (an array or JSON Lines) row by row, validates
+each chunk, resolves restaurant/category ids with one query per chunk and
+writes foods and menu entries with `bulk_create`, all inside a single
+transaction. Invalid rows are skipped and reported with their row number.
+
+Export streams the same columns back out, so an export can be re-imported
+into another branch.
+"""
+import csv
+import io
+import itertools
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from api.models import Category, Food, Restaurant
+from restaurant_web import availability, dashboard, search, snapshots
+from restaurant_web.models import Menu
+
+
+CHUNK_SIZE = 1000
+READ_SIZE = 64 * 1024
+MAX_ROW_SIZE = 1024 * 1024
+FIELDS = ['foodName', 'resID', 'catID', 'price', 'description', 'image', 'is_available']
+EXPORT_FIELDS = ['foodID'] + FIELDS
+FORMATS = ('csv', 'json')
+
+_TRUE = {'1', 'true', 'yes', 'y', 'on'}
+_FALSE = {'0', 'false', 'no', 'n', 'off'}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+# ---- reading ----
+
+def read_rows(stream, fmt):
+    """Yield dict rows from a text stream in `fmt` ('csv' or 'json')."""
+    try:
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+        elif fmt == 'json':
+            head = stream.read(1)
+            while head and head.isspace():
+                head = stream.read(1)
+            if head == '[':
+                yield from _json_array(stream)
+            else:
+                # JSON Lines: one object per line, read lazily
+                for line in itertools.chain([head + stream.readline()], stream):
+                    if line.strip():
+                        yield _json_line(line)
+        else:
+            raise ImportFormatError(f'Дэмжигдээгүй формат: {fmt}')
+    except UnicodeDecodeError:
+        raise ImportFormatError('Файл UTF-8 кодчилолтой байх ёстой')
+
+
+def _json_array(stream, block=READ_SIZE):
+    """
+    Yield the items of a JSON array whose '[' was already read, one at a
+    time: only the item being decoded (and at most one block after it) is
+    held in memory, not the whole upload.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    state = 'first'  # 'first' after '[', 'item' after ',', 'next' after an item
+
+    def fill():
+        nonlocal buffer, position, eof
+        data = stream.read(block)
+        buffer = buffer[position:] + data
+        position = 0
+        eof = not data
+
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ImportFormatError('JSON буруу байна: массив дуусаагүй')
+            fill()
+            continue
+
+        char = buffer[position]
+        if state != 'item' and char == ']':
+            return
+        if state == 'next':
+            if char != ',':
+                raise ImportFormatError(f'JSON буруу байна: "," эсвэл "]" хүлээсэн, "{char}" ирсэн')
+            position += 1
+            state = 'item'
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError as exc:
+            if eof or len(buffer) - position > MAX_ROW_SIZE:
+                raise ImportFormatError(f'JSON буруу байна: {exc}')
+            # the item runs past the buffer: read more and decode it again
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # a number or literal may go on in the next block
+            fill()
+            continue
+        position = end
+        state = 'next'
+        yield item
+
+
+def _json_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        raise ImportFormatError(f'JSON буруу байна: {exc}')
+
+
+def chunked(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---- validation ----
+
+def _as_int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, int):
+        return value
+    return int(str(value).strip())
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in (None, ''):
+        return True
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError
+
+
+def _clean(row):
+    """Return (cleaned row, None) or (None, error message)."""
+    if not isinstance(row, dict):
+        return None, 'Мөр объект байх ёстой'
+    for field in ('foodName', 'resID', 'catID', 'price'):
+        if row.get(field) in (None, ''):
+            return None, f'{field} шаардлагатай'
+
+    cleaned = {
+        'foodName': str(row['foodName']).strip()[:255],
+        'description': str(row.get('description') or '')[:500],
+        'image': str(row.get('image') or '')[:255],
+    }
+    for field in ('resID', 'catID', 'price'):
+        try:
+            cleaned[field] = _as_int(row[field])
+        except (TypeError, ValueError):
+            return None, f'{field} бүхэл тоо байх ёстой'
+    try:
+        cleaned['is_available'] = _as_bool(row.get('is_available'))
+    except ValueError:
+        return None, 'is_available буруу утгатай'
+    return cleaned, None
+
+
+# ---- import ----
+
+class _Resolver:
+    """Caches which restaurant/category ids exist, one query per chunk."""
+
+    def __init__(self):
+        self.restaurants = set()
+        self.categories = set()
+        self.seen_restaurants = set()
+        self.seen_categories = set()
+
+    def load(self, rows):
+        res_ids = {r['resID'] for r in rows} - self.seen_restaurants
+        cat_ids = {r['catID'] for r in rows} - self.seen_categories
+        if res_ids:
+            self.restaurants.update(Restaurant.objects.filter(resID__in=res_ids).values_list('resID', flat=True))
+            self.seen_restaurants.update(res_ids)
+        if cat_ids:
+            self.categories.update(Category.objects.filter(catID__in=cat_ids).values_list('catID', flat=True))
+            self.seen_categories.update(cat_ids)
+
+
+def import_menu(rows, chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Import menu rows. Returns {'created', 'failed', 'errors'} where each
+    error is {'row': <1-based row number>, 'error': <message>}.
+    """
+    resolver = _Resolver()
+    created_ids = []
+    restaurant_ids = set()
+    errors = []
+    row_number = 0
+
+    with transaction.atomic():
+        for chunk in chunked(rows, chunk_size):
+            valid = []
+            for row in chunk:
+                row_number += 1
+                cleaned, error = _clean(row)
+                if error:
+                    errors.append({'row': row_number, 'error': error})
+                else:
+                    valid.append((row_number, cleaned))
+
+            resolver.load([cleaned for _, cleaned in valid])
+            foods, available = [], []
+            for number, cleaned in valid:
+                if cleaned['resID'] not in resolver.restaurants:
+                    errors.append({'row': number, 'error': 'Ресторан олдсонгүй'})
+                    continue
+                if cleaned['catID'] not in resolver.categories:
+                    errors.append({'row': number, 'error': 'Ангилал олдсонгүй'})
+                    continue
+                foods.append(Food(
+                    foodName=cleaned['foodName'],
+                    resID_id=cleaned['resID'],
+                    catID_id=cleaned['catID'],
+                    price=cleaned['price'],
+                    description=cleaned['description'],
+                    image=cleaned['image'],
+                ))
+                available.append(cleaned['is_available'])
+
+            if dry_run or not foods:
+                created_ids.extend([None] * len(foods))
+                continue
+
+            Food.objects.bulk_create(foods, batch_size=chunk_size)
+            Menu.objects.bulk_create([
+                Menu(food=food, restaurant_id=food.resID_id, category_id=food.catID_id, is_available=flag)
+                for food, flag in zip(foods, available)
+            ], batch_size=chunk_size)
+            created_ids.extend(food.foodID for food in foods)
+            restaurant_ids.update(food.resID_id for food in foods)
+
+        if not dry_run and created_ids:
+            # bulk_create sends no signals: refresh derived data explicitly
+            search.reindex_foods(created_ids)
+            snapshots.bump(restaurant_ids)
+            availability.invalidate(restaurant_ids)
+            dashboard.changed(restaurant_ids)
+
+    errors.sort(key=lambda e: e['row'])
+    return {'created': len(created_ids), 'failed': len(errors), 'errors': errors}
+
+
+# ---- availability flag ----
+
+# A food with several Menu entries takes the flag of the first one in
+# Menu.Meta ordering (category first), as Menu.objects.filter(...).first()
+# did; the export and the menu detail API both go through this ordering.
+FLAG_ORDER = ('category', 'menuID')
+
+
+def menu_flags(food_ids):
+    """Map each food id that has a Menu entry to its is_available flag."""
+    flags = {}
+    rows = Menu.objects.filter(food_id__in=food_ids).order_by(*FLAG_ORDER).values_list('food_id', 'is_available')
+    for food_id, is_available in rows:
+        flags.setdefault(food_id, is_available)
+    return flags
+
+
+def menu_flag():
+    """The same flag as a subquery over the outer Food row."""
+    return Subquery(Menu.objects.filter(food=OuterRef('pk')).order_by(*FLAG_ORDER).values('is_available')[:1])
+
+
+# ---- export ----
+
+def export_queryset(restaurant_id=None):
+    qs = Food.objects.annotate(is_available=menu_flag()).order_by('foodID')
+    if restaurant_id:
+        qs = qs.filter(resID_id=restaurant_id)
+    return qs.values_list(
+        'foodID', 'foodName', 'resID_id', 'catID_id', 'price', 'description', 'image', 'is_available',
+    )
+
+
+def export_menu(fmt, restaurant_id=None, chunk_size=CHUNK_SIZE):
+    """Yield the exported menu as text chunks in `fmt`."""
+    rows = export_queryset(restaurant_id).iterator(chunk_size=chunk_size)
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        for chunk in chunked(rows, chunk_size):
+            for row in chunk:
+                writer.writerow(row[:-1] + (row[-1] is not False,))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'json':
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        yield '['
+        first = True
+        for chunk in chunked(rows, chunk_size):
+            parts = []
+            for row in chunk:
+                item = dict(zip(EXPORT_FIELDS, row))
+                item['is_available'] = row[-1] is not False
+                parts.append(encoder.encode(item))
+            yield ('' if first else ',') + ','.join(parts)
+            first = False
+        yield ']'
+    else:
+        raise ImportFormatError(f'Дэмжигдээгүй формат: {fmt}')
@@ -0,0 +1,85 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:32
+
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', title), 'A') || "
+    "setweight(to_tsvector('simple', body), 'B')"
+)
+
+
+def create_native_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX food_search_fts_idx ON tbl_food_search USING GIN (({SEARCH_VECTOR}))"
+        )
+        # Trigram matching is optional: managed databases may refuse the extension
+        try:
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                schema_editor.execute(
+                    "CREATE INDEX food_search_trgm_idx ON tbl_food_search USING GIN (title gin_trgm_ops)"
+                )
+        except DatabaseError:
+            pass
+    elif connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE tbl_food_search_fts USING fts5("
+                "title, body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except DatabaseError:
+            # SQLite built without FTS5: the term index is used instead
+            pass
+
+
+def drop_native_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS food_search_trgm_idx")
+        schema_editor.execute("DROP INDEX IF EXISTS food_search_fts_idx")
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS tbl_food_search_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_keyset_indexes'),
+        ('restaurant_web', '0002_inventory_operatinghours'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodSearchEntry',
+            fields=[
+                ('food', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to='api.food')),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='api.restaurant')),
+            ],
+            options={
+                'db_table': 'tbl_food_search',
+            },
+        ),
+        migrations.CreateModel(
+            name='FoodSearchTerm',
+            fields=[
+                ('ID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('term', models.CharField(db_index=True, max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='api.food')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='api.restaurant')),
+            ],
+            options={
+                'db_table': 'tbl_food_search_term',
+                'indexes': [models.Index(fields=['restaurant', 'term'], name='search_term_res_idx')],
+                'unique_together': {('term', 'food')},
+            },
+        ),
+        migrations.RunPython(create_native_index, drop_native_index),
+    ]
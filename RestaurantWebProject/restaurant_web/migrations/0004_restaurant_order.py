@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_orders(apps, schema_editor):
+    # the existing orders; restaurant_web.order_links keeps the table current from here on
+    OrderFood = apps.get_model('api', 'OrderFood')
+    RestaurantOrder = apps.get_model('restaurant_web', 'RestaurantOrder')
+    RestaurantOrder.objects.bulk_create([
+        RestaurantOrder(order_id=order_id, restaurant_id=restaurant_id, date=day, status=status)
+        for order_id, restaurant_id, day, status in OrderFood.objects
+        .values_list('orderID_id', 'foodID__resID_id', 'orderID__date', 'orderID__status').distinct().order_by()
+        .iterator(chunk_size=5000)
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_order_totals'),
+        ('restaurant_web', '0003_food_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantOrder',
+            fields=[
+                ('ID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('status', models.CharField(blank=True, max_length=255, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_links', to='api.order')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_links', to='api.restaurant')),
+            ],
+            options={
+                'db_table': 'tbl_restaurant_order',
+                'indexes': [models.Index(fields=['restaurant', '-date', '-order'], name='res_order_date_idx'), models.Index(fields=['restaurant', 'status', '-date'], name='res_order_status_idx')],
+                'unique_together': {('restaurant', 'order')},
+            },
+        ),
+        migrations.RunPython(link_orders, migrations.RunPython.noop),
+    ]
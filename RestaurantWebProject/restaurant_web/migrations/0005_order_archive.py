@@ -0,0 +1,75 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:49
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_order_totals'),
+        ('restaurant_web', '0004_restaurant_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('orderID', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('location', models.CharField(max_length=255)),
+                ('status', models.CharField(blank=True, max_length=255, null=True)),
+                ('total_price', models.IntegerField(default=0)),
+                ('items_count', models.IntegerField(default=0)),
+                ('payments', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('deliveries', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('history', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.user')),
+            ],
+            options={
+                'db_table': 'tbl_order_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderFood',
+            fields=[
+                ('ID', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('food_id', models.BigIntegerField()),
+                ('restaurant_id', models.BigIntegerField()),
+                ('food_name', models.CharField(max_length=255)),
+                ('food_price', models.IntegerField()),
+                ('food_image', models.CharField(blank=True, max_length=255)),
+                ('stock', models.IntegerField()),
+                ('price', models.IntegerField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='restaurant_web.archivedorder')),
+            ],
+            options={
+                'db_table': 'tbl_order_food_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderStatus',
+            fields=[
+                ('statusID', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(max_length=50)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_by', models.CharField(blank=True, max_length=255, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_history', to='restaurant_web.archivedorder')),
+            ],
+            options={
+                'db_table': 'tbl_order_status_archive',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['-date', '-orderID'], name='order_archive_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorderfood',
+            index=models.Index(fields=['restaurant_id', 'order'], name='order_food_archive_res_idx'),
+        ),
+    ]
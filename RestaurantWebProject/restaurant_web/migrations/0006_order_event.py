@@ -0,0 +1,141 @@
+# Generated by Django 6.0.1 on 2026-10-18 00:52
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+STATUS_CODES = {'pending': 1, 'approved': 2, 'preparing': 3, 'ready': 4, 'delivered': 5, 'cancelled': 6}
+NOTE = 0
+BATCH_SIZE = 1000
+
+
+def _code(status):
+    return STATUS_CODES.get((status or '').strip().lower(), NOTE)
+
+
+def _history_time(day):
+    # legacy history rows only carry a date
+    return django.utils.timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _status_row(order_id, pk, status, notes, created_at, updated_by):
+    code = _code(status)
+    if code == NOTE:
+        # unknown free-text status: keep the text
+        notes = f'{status}: {notes}' if notes else status
+    return {'order_id': order_id, 'created_at': created_at, 'kind': 1, 'id': pk,
+            'code': code, 'notes': notes, 'updated_by': updated_by}
+
+
+def _history_row(order_id, pk, status, day):
+    code = _code(status)
+    return {'order_id': order_id, 'created_at': _history_time(day), 'kind': 0, 'id': pk,
+            'code': code, 'notes': status if code == NOTE else None, 'updated_by': 'history'}
+
+
+def _write(model, rows, archived=False):
+    """Sort each order's rows by time, number them from 1 and insert them."""
+    by_order = {}
+    for row in rows:
+        by_order.setdefault(row['order_id'], []).append(row)
+    events = []
+    for order_id in sorted(by_order):
+        order_rows = sorted(by_order[order_id], key=lambda row: (row['created_at'], row['kind'], row['id']))
+        for seq, row in enumerate(order_rows, start=1):
+            event = model(
+                order_id=order_id, seq=seq, code=row['code'], notes=row['notes'],
+                created_at=row['created_at'], updated_by=row['updated_by'],
+            )
+            if archived:
+                # archive ids mirror tbl_order_event ids; merged rows never had one
+                event.eventID = -len(events) - 1
+            events.append(event)
+    model.objects.bulk_create(events, batch_size=BATCH_SIZE)
+
+
+def merge_history(apps, schema_editor):
+    """Fold OrderStatus and api.History (hot and archived) into the event logs."""
+    OrderStatus = apps.get_model('restaurant_web', 'OrderStatus')
+    History = apps.get_model('api', 'History')
+    OrderEvent = apps.get_model('restaurant_web', 'OrderEvent')
+    ArchivedOrder = apps.get_model('restaurant_web', 'ArchivedOrder')
+    ArchivedOrderStatus = apps.get_model('restaurant_web', 'ArchivedOrderStatus')
+    ArchivedOrderEvent = apps.get_model('restaurant_web', 'ArchivedOrderEvent')
+    status_fields = ('order_id', 'statusID', 'status', 'notes', 'created_at', 'updated_by')
+
+    rows = [_status_row(*row) for row in OrderStatus.objects.values_list(*status_fields).iterator()]
+    rows += [
+        _history_row(*row) for row in History.objects.values_list('orderID_id', 'ID', 'status', 'date').iterator()
+    ]
+    _write(OrderEvent, rows)
+
+    rows = [_status_row(*row) for row in ArchivedOrderStatus.objects.values_list(*status_fields).iterator()]
+    for order_id, history in ArchivedOrder.objects.values_list('orderID', 'history').iterator():
+        rows += [
+            _history_row(order_id, entry['ID'], entry['status'], datetime.date.fromisoformat(entry['date']))
+            for entry in history
+        ]
+    _write(ArchivedOrderEvent, rows, archived=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_order_totals'),
+        ('restaurant_web', '0005_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrderEvent',
+            fields=[
+                ('eventID', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('seq', models.PositiveIntegerField()),
+                ('code', models.PositiveSmallIntegerField(choices=[(0, 'Тэмдэглэл'), (1, 'Хүлээгдэж буй'), (2, 'Батлагдсан'), (3, 'Бэлтгэж байна'), (4, 'Бэлэн'), (5, 'Хүргэгдсэн'), (6, 'Цуцлагдсан')])),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_by', models.CharField(blank=True, max_length=255, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='restaurant_web.archivedorder')),
+            ],
+            options={
+                'db_table': 'tbl_order_event_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('eventID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('seq', models.PositiveIntegerField()),
+                ('code', models.PositiveSmallIntegerField(choices=[(0, 'Тэмдэглэл'), (1, 'Хүлээгдэж буй'), (2, 'Батлагдсан'), (3, 'Бэлтгэж байна'), (4, 'Бэлэн'), (5, 'Хүргэгдсэн'), (6, 'Цуцлагдсан')])),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_by', models.CharField(blank=True, max_length=255, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api.order')),
+            ],
+            options={
+                'db_table': 'tbl_order_event',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='archivedorderevent',
+            constraint=models.UniqueConstraint(fields=('order', 'seq'), name='order_event_archive_seq_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderevent',
+            constraint=models.UniqueConstraint(fields=('order', 'seq'), name='order_event_seq_uniq'),
+        ),
+        migrations.RunPython(merge_history, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='archivedorder',
+            name='history',
+        ),
+        migrations.DeleteModel(
+            name='ArchivedOrderStatus',
+        ),
+        migrations.DeleteModel(
+            name='OrderStatus',
+        ),
+    ]
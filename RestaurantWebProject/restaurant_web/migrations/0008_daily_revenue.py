@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 01:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delete_history'),
+        ('restaurant_web', '0007_checkout_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('ID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('orders', models.IntegerField(default=0)),
+                ('items', models.IntegerField(default=0)),
+                ('cancelled_orders', models.IntegerField(default=0)),
+                ('cancelled_revenue', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='api.restaurant')),
+            ],
+            options={
+                'db_table': 'tbl_daily_revenue',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('restaurant__isnull', False)), fields=('restaurant', 'day'), name='daily_revenue_res_day_uniq'), models.UniqueConstraint(condition=models.Q(('restaurant__isnull', True)), fields=('day',), name='daily_revenue_day_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 6.0.1 on 2026-10-18 01:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+
+
+STATUSES = ('pending', 'approved', 'preparing', 'ready', 'delivered', 'cancelled')
+
+
+def _order_counts():
+    pending = Q(status='pending') | Q(status__isnull=True)
+    return {
+        'orders_total': Count('pk'),
+        **{f'orders_{name}': Count('pk', filter=pending if name == 'pending' else Q(status=name)) for name in STATUSES},
+    }
+
+
+def _inventory_counts():
+    return {
+        'inventory_total': Count('pk'),
+        'inventory_low': Count('pk', filter=Q(stock_quantity__lte=F('min_stock_level'))),
+    }
+
+
+def count_all(apps, schema_editor):
+    # the initial values; restaurant_web.counters keeps them current from here on
+    Order = apps.get_model('api', 'Order')
+    Delivery = apps.get_model('api', 'Delivery')
+    Inventory = apps.get_model('restaurant_web', 'Inventory')
+    RestaurantOrder = apps.get_model('restaurant_web', 'RestaurantOrder')
+    RestaurantCounter = apps.get_model('restaurant_web', 'RestaurantCounter')
+
+    rows = []
+
+    def put(restaurant_id, values):
+        rows.extend(
+            RestaurantCounter(restaurant_id=restaurant_id, metric=name.replace('_', '.', 1), value=value)
+            for name, value in values.items() if name != 'restaurant_id' and value
+        )
+
+    put(None, Order.objects.aggregate(**_order_counts()))
+    for values in RestaurantOrder.objects.values('restaurant_id').annotate(**_order_counts()).order_by():
+        put(values['restaurant_id'], values)
+    put(None, Inventory.objects.aggregate(**_inventory_counts()))
+    for values in Inventory.objects.values('restaurant_id').annotate(**_inventory_counts()).order_by():
+        put(values['restaurant_id'], values)
+    put(None, {'deliveries_active': Delivery.objects.filter(status='on_the_way').count()})
+    for values in RestaurantOrder.objects.filter(order__delivery__status='on_the_way').values(
+        'restaurant_id'
+    ).annotate(deliveries_active=Count('order__delivery')).order_by():
+        put(values['restaurant_id'], values)
+    RestaurantCounter.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delete_history'),
+        ('restaurant_web', '0008_daily_revenue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantCounter',
+            fields=[
+                ('ID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('metric', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='api.restaurant')),
+            ],
+            options={
+                'db_table': 'tbl_restaurant_counter',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('restaurant__isnull', False)), fields=('restaurant', 'metric'), name='restaurant_counter_res_metric_uniq'), models.UniqueConstraint(condition=models.Q(('restaurant__isnull', True)), fields=('metric',), name='restaurant_counter_metric_uniq')],
+            },
+        ),
+        migrations.RunPython(count_all, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 01:20
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant_web', '0009_restaurant_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('ID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('report', models.CharField(max_length=50)),
+                ('params', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('key', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('parts_total', models.PositiveIntegerField(default=0)),
+                ('parts_done', models.PositiveIntegerField(default=0)),
+                ('result', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'tbl_report_job',
+                'indexes': [models.Index(fields=['key', '-created_at'], name='report_job_key_idx'), models.Index(fields=['status', 'created_at'], name='report_job_status_idx')],
+            },
+        ),
+    ]
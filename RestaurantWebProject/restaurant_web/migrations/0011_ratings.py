@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-18 01:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+
+def count_reviews(apps, schema_editor):
+    # the initial values; restaurant_web.ratings keeps them current from here on
+    Comment = apps.get_model('api', 'Comment')
+    counts = {
+        'count': Count('pk'),
+        'total': Coalesce(Sum('review'), Value(0)),
+        **{f'stars_{star}': Count('pk', filter=Q(review=star)) for star in range(1, 6)},
+    }
+    for model_name, key, field in (('RestaurantRating', 'resID', 'restaurant_id'), ('FoodRating', 'foodID', 'food_id')):
+        model = apps.get_model('restaurant_web', model_name)
+        model.objects.bulk_create([
+            model(**{field: row.pop(key)}, **row)
+            for row in Comment.objects.values(key).annotate(**counts).order_by()
+        ], batch_size=1000)
+        model.objects.update(average=Coalesce(Cast(F('total'), FloatField()) / NullIf(F('count'), 0), Value(0.0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delete_history'),
+        ('restaurant_web', '0010_report_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodRating',
+            fields=[
+                ('count', models.IntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+                ('average', models.FloatField(default=0)),
+                ('food', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='api.food')),
+            ],
+            options={
+                'db_table': 'tbl_food_rating',
+                'indexes': [models.Index(fields=['-average', 'food'], name='food_rating_avg_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RestaurantRating',
+            fields=[
+                ('count', models.IntegerField(default=0)),
+                ('total', models.BigIntegerField(default=0)),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+                ('average', models.FloatField(default=0)),
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='api.restaurant')),
+            ],
+            options={
+                'db_table': 'tbl_restaurant_rating',
+                'indexes': [models.Index(fields=['-average', 'restaurant'], name='restaurant_rating_avg_idx')],
+            },
+        ),
+        migrations.RunPython(count_reviews, migrations.RunPython.noop),
+    ]
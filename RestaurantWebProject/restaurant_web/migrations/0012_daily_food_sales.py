@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-18 01:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Max, Sum
+
+
+def roll_up_sold_days(apps, schema_editor):
+    # the days DailyRevenue already covers; restaurant_web.rollups keeps both current from here on
+    DailyRevenue = apps.get_model('restaurant_web', 'DailyRevenue')
+    last = DailyRevenue.objects.filter(restaurant__isnull=True).aggregate(last=Max('day'))['last']
+    if last is None:
+        return
+    OrderFood = apps.get_model('api', 'OrderFood')
+    DailyFoodSales = apps.get_model('restaurant_web', 'DailyFoodSales')
+    DailyFoodSales.objects.bulk_create([
+        DailyFoodSales(food_id=row['foodID'], day=row['orderID__date'], quantity=row['quantity'], revenue=row['revenue'])
+        for row in OrderFood.objects.filter(orderID__date__lte=last).exclude(orderID__status='cancelled')
+        .values('foodID', 'orderID__date')
+        .annotate(quantity=Sum('stock'), revenue=Sum(F('price') * F('stock'))).order_by()
+        .iterator(chunk_size=5000)
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delete_history'),
+        ('restaurant_web', '0011_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFoodSales',
+            fields=[
+                ('ID', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='api.food')),
+            ],
+            options={
+                'db_table': 'tbl_daily_food_sales',
+                'constraints': [models.UniqueConstraint(fields=('day', 'food'), name='daily_food_sales_day_food_uniq')],
+            },
+        ),
+        migrations.RunPython(roll_up_sold_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 01:53
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_duplicates(apps, schema_editor):
+    # only the oldest queued / running job of a key survives the new constraint
+    ReportJob = apps.get_model('restaurant_web', 'ReportJob')
+    seen = set()
+    duplicates = []
+    for job_id, key in ReportJob.objects.filter(status__in=['queued', 'running']).order_by(
+        'created_at', 'ID'
+    ).values_list('ID', 'key'):
+        if key in seen:
+            duplicates.append(job_id)
+        seen.add(key)
+    ReportJob.objects.filter(ID__in=duplicates).update(
+        status='failed', error='duplicate of an earlier job', finished_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant_web', '0012_daily_food_sales'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('key',), name='report_job_active_key_uniq'),
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from api.models import Food, Order, OrderFood, Category, Restaurant, Worker
+from django.utils import timezone
+from api.models import Food, Order, OrderFood, Category, Restaurant, Worker, User
 
 
 class Menu(models.Model):
@@ -23,32 +25,59 @@ class Menu(models.Model):
         return f"{self.food.foodName} - {self.restaurant.resName}"
 
 
-class OrderStatus(models.Model):
+class OrderEvent(models.Model):
     """
-    Order status history tracking
+    Захиалгын үйл явдлын бүртгэл (зөвхөн нэмэгдэнэ)
+    Append-only, numbered per order by `seq`; read through restaurant_web.order_events.
     """
-    STATUS_CHOICES = [
-        ('pending', 'Хүлээгдэж буй'),
-        ('approved', 'Батлагдсан'),
-        ('preparing', 'Бэлтгэж байна'),
-        ('ready', 'Бэлэн'),
-        ('delivered', 'Хүргэгдсэн'),
-        ('cancelled', 'Цуцлагдсан'),
+    NOTE = 0
+    PENDING = 1
+    APPROVED = 2
+    PREPARING = 3
+    READY = 4
+    DELIVERED = 5
+    CANCELLED = 6
+
+    CODE_CHOICES = [
+        (NOTE, 'Тэмдэглэл'),
+        (PENDING, 'Хүлээгдэж буй'),
+        (APPROVED, 'Батлагдсан'),
+        (PREPARING, 'Бэлтгэж байна'),
+        (READY, 'Бэлэн'),
+        (DELIVERED, 'Хүргэгдсэн'),
+        (CANCELLED, 'Цуцлагдсан'),
     ]
+    # order status <-> event code; NOTE events do not change the status
+    STATUS_CODES = {
+        'pending': PENDING,
+        'approved': APPROVED,
+        'preparing': PREPARING,
+        'ready': READY,
+        'delivered': DELIVERED,
+        'cancelled': CANCELLED,
+    }
+    STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
 
-    statusID = models.BigAutoField(primary_key=True)
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_history')
-    status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='pending')
+    eventID = models.BigAutoField(primary_key=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    seq = models.PositiveIntegerField()
+    code = models.PositiveSmallIntegerField(choices=CODE_CHOICES)
     notes = models.TextField(blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
     updated_by = models.CharField(max_length=255, blank=True, null=True)
 
     class Meta:
-        db_table = 'tbl_order_status'
-        ordering = ['-created_at']
+        db_table = 'tbl_order_event'
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'seq'], name='order_event_seq_uniq'),
+        ]
+
+    @property
+    def status(self):
+        return self.STATUS_NAMES.get(self.code)
 
     def __str__(self):
-        return f"Order {self.order.orderID} - {self.status}"
+        return f"Order {self.order_id} #{self.seq} - {self.get_code_display()}"
 
 
 class OperatingHours(models.Model):
@@ -104,3 +133,348 @@ class Inventory(models.Model):
     def is_low_stock(self):
         """Нөөц дуусаж байгаа эсэхийг шалгах"""
         return self.stock_quantity <= self.min_stock_level
+
+
+class FoodSearchEntry(models.Model):
+    """
+    Хайлтын индексийн баримт (нэг хоолонд нэг мөр)
+    title = хоолны нэр, body = ангилал + ресторан + тайлбар
+    """
+    food = models.OneToOneField(Food, on_delete=models.CASCADE, primary_key=True, related_name='search_entry')
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='search_entries')
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'tbl_food_search'
+
+    def __str__(self):
+        return self.title
+
+
+class FoodSearchTerm(models.Model):
+    """
+    Inverted index posting: normalized term -> food with field weight
+    """
+    ID = models.BigAutoField(primary_key=True)
+    term = models.CharField(max_length=64, db_index=True)
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name='search_terms')
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        db_table = 'tbl_food_search_term'
+        unique_together = ('term', 'food')
+        indexes = [
+            models.Index(fields=['restaurant', 'term'], name='search_term_res_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.food_id}"
+
+
+class RestaurantOrder(models.Model):
+    """
+    Ресторан - захиалгын холбоос (захиалгын мөрүүдээс тооцоолно)
+    Restaurant-scoped order queries filter on this table instead of
+    joining OrderFood -> Food and de-duplicating with DISTINCT.
+    """
+    ID = models.BigAutoField(primary_key=True)
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='order_links')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='restaurant_links')
+    # copied from the order so restaurant listings can filter and sort here
+    date = models.DateField()
+    status = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        db_table = 'tbl_restaurant_order'
+        unique_together = ('restaurant', 'order')
+        indexes = [
+            models.Index(fields=['restaurant', '-date', '-order'], name='res_order_date_idx'),
+            models.Index(fields=['restaurant', 'status', '-date'], name='res_order_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} -> {self.order_id}"
+
+
+class DailyRevenue(models.Model):
+    """
+    Өдрийн орлогын нэгтгэл (ресторан бүрээр болон нийтээр)
+    One row per (restaurant, day) plus one row per day with restaurant NULL
+    for all orders; maintained by restaurant_web.rollups.
+    """
+    ID = models.BigAutoField(primary_key=True)
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_revenue'
+    )
+    day = models.DateField()
+    # orders that are not cancelled
+    revenue = models.BigIntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    items = models.IntegerField(default=0)
+    cancelled_orders = models.IntegerField(default=0)
+    cancelled_revenue = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'tbl_daily_revenue'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['restaurant', 'day'], condition=models.Q(restaurant__isnull=False),
+                name='daily_revenue_res_day_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['day'], condition=models.Q(restaurant__isnull=True),
+                name='daily_revenue_day_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id or 'all'} {self.day}: {self.revenue}"
+
+
+class DailyFoodSales(models.Model):
+    """
+    Хоол бүрийн өдрийн борлуулалт
+    One row per (day, food) sold that day in orders that are not cancelled;
+    maintained by restaurant_web.rollups together with DailyRevenue.
+    """
+    ID = models.BigAutoField(primary_key=True)
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    quantity = models.BigIntegerField(default=0)
+    # price * stock at the price ordered
+    revenue = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'tbl_daily_food_sales'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'food'], name='daily_food_sales_day_food_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.food_id} {self.day}: {self.quantity}"
+
+
+class RestaurantCounter(models.Model):
+    """
+    Рестораны шууд тоолуур (захиалга, нөөц, хүргэлт)
+    One live count per (restaurant, metric) plus one per metric with
+    restaurant NULL for all restaurants; maintained by restaurant_web.counters.
+    """
+    ID = models.BigAutoField(primary_key=True)
+    restaurant = models.ForeignKey(
+        Restaurant, on_delete=models.CASCADE, null=True, blank=True, related_name='counters'
+    )
+    metric = models.CharField(max_length=50)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'tbl_restaurant_counter'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['restaurant', 'metric'], condition=models.Q(restaurant__isnull=False),
+                name='restaurant_counter_res_metric_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['metric'], condition=models.Q(restaurant__isnull=True),
+                name='restaurant_counter_metric_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id or 'all'} {self.metric}: {self.value}"
+
+
+class Rating(models.Model):
+    """
+    Running totals of the reviews (Comment.review) of a restaurant or food,
+    maintained by restaurant_web.ratings: count, sum, one count per star
+    and the average (sum / count) stored for sorting.
+    """
+    count = models.IntegerField(default=0)
+    total = models.BigIntegerField(default=0)
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+    average = models.FloatField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class RestaurantRating(Rating):
+    """
+    Рестораны үнэлгээ (нийт тоо, нийлбэр, одны тархалт)
+    """
+    restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE, primary_key=True, related_name='rating')
+
+    class Meta:
+        db_table = 'tbl_restaurant_rating'
+        indexes = [
+            models.Index(fields=['-average', 'restaurant'], name='restaurant_rating_avg_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id}: {self.average} ({self.count})"
+
+
+class FoodRating(Rating):
+    """
+    Хоолны үнэлгээ (нийт тоо, нийлбэр, одны тархалт)
+    """
+    food = models.OneToOneField(Food, on_delete=models.CASCADE, primary_key=True, related_name='rating')
+
+    class Meta:
+        db_table = 'tbl_food_rating'
+        indexes = [
+            models.Index(fields=['-average', 'food'], name='food_rating_avg_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.food_id}: {self.average} ({self.count})"
+
+
+class ReportJob(models.Model):
+    """
+    Тайлангийн ажил (background report job)
+    Queued and computed by restaurant_web.report_jobs; `key` is the hash of
+    the report name and its normalized parameters.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    ID = models.BigAutoField(primary_key=True)
+    report = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    key = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    parts_total = models.PositiveIntegerField(default=0)
+    parts_done = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'tbl_report_job'
+        indexes = [
+            models.Index(fields=['key', '-created_at'], name='report_job_key_idx'),
+            models.Index(fields=['status', 'created_at'], name='report_job_status_idx'),
+        ]
+        constraints = [
+            # one queued or running job per report; see report_jobs.submit
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(status__in=['queued', 'running']),
+                name='report_job_active_key_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.report} #{self.ID}: {self.status}"
+
+
+class CheckoutKey(models.Model):
+    """
+    Checkout-ын давхардлаас сэргийлэх түлхүүр (Idempotency-Key)
+    A retried checkout with the same key gets the stored response back.
+    """
+    ID = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, related_name='+')
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'tbl_checkout_key'
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Архивласан захиалга (хаагдсан, хуучин захиалгууд)
+    Moved out of tbl_order by restaurant_web.archive; ids are kept.
+    Payments and deliveries are kept as JSON.
+    """
+    orderID = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    date = models.DateField()
+    location = models.CharField(max_length=255)
+    status = models.CharField(max_length=255, null=True, blank=True)
+    total_price = models.IntegerField(default=0)
+    items_count = models.IntegerField(default=0)
+    payments = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    deliveries = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'tbl_order_archive'
+        indexes = [
+            models.Index(fields=['-date', '-orderID'], name='order_archive_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.orderID}"
+
+
+class ArchivedOrderFood(models.Model):
+    """
+    Архивласан захиалгын мөр (хоолны мэдээллийн хуулбартай)
+    """
+    ID = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='lines')
+    food_id = models.BigIntegerField()
+    restaurant_id = models.BigIntegerField()
+    food_name = models.CharField(max_length=255)
+    food_price = models.IntegerField()
+    food_image = models.CharField(max_length=255, blank=True)
+    stock = models.IntegerField()
+    price = models.IntegerField()
+
+    class Meta:
+        db_table = 'tbl_order_food_archive'
+        indexes = [
+            models.Index(fields=['restaurant_id', 'order'], name='order_food_archive_res_idx'),
+        ]
+
+
+class ArchivedOrderEvent(models.Model):
+    """
+    Архивласан захиалгын үйл явдлууд (OrderEvent-ийн хуулбар)
+    """
+    eventID = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='events')
+    seq = models.PositiveIntegerField()
+    code = models.PositiveSmallIntegerField(choices=OrderEvent.CODE_CHOICES)
+    notes = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_by = models.CharField(max_length=255, blank=True, null=True)
+
+    class Meta:
+        db_table = 'tbl_order_event_archive'
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'seq'], name='order_event_archive_seq_uniq'),
+        ]
+
+    @property
+    def status(self):
+        return OrderEvent.STATUS_NAMES.get(self.code)
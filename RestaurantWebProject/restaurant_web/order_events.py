@@ -0,0 +1,85 @@
+"""
+Order event log.
+
+Every status change (and free-form note) of an order is one `OrderEvent`
+row, numbered per order by `seq` starting at 1. Rows are only ever
+appended. The unique (order, seq) index answers both per-order queries:
+
+* latest state - the highest seq of an order (`latest`)
+* events since X - seq greater than the last one a client saw (`since`)
+
+`tail` reads the log across all orders by event id, for consumers that
+poll for anything new.
+"""
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+
+from api.models import Order
+from restaurant_web.models import OrderEvent
+
+
+TAIL_LIMIT = 500
+
+
+def code_of(status):
+    return OrderEvent.STATUS_CODES[status]
+
+
+def append(order_ids, code, notes='', updated_by='system'):
+    """
+    Add one event with `code` to each order and return the new rows.
+
+    Sequence numbers continue from the current maximum of each order. The
+    order rows are locked (SELECT ... FOR UPDATE, in id order) before that
+    maximum is read, so writers appending to the same order queue up
+    instead of both taking the same seq. Callers that already changed the
+    order row in their transaction hold that lock anyway.
+    """
+    order_ids = sorted(set(order_ids))
+    if not order_ids:
+        return []
+    with transaction.atomic():
+        list(Order.objects.select_for_update().filter(orderID__in=order_ids).order_by('orderID').values_list('pk'))
+        last = dict(
+            OrderEvent.objects.filter(order_id__in=order_ids).order_by().values('order_id')
+            .annotate(last=Max('seq')).values_list('order_id', 'last')
+        )
+        now = timezone.now()
+        return OrderEvent.objects.bulk_create([
+            OrderEvent(
+                order_id=order_id, seq=last.get(order_id, 0) + 1, code=code,
+                notes=notes, created_at=now, updated_by=updated_by,
+            )
+            for order_id in order_ids
+        ])
+
+
+def latest(order_ids, status_only=True):
+    """order id -> its newest event (by default the newest status change)."""
+    events = OrderEvent.objects.filter(order_id__in=order_ids)
+    if status_only:
+        events = events.exclude(code=OrderEvent.NOTE)
+    newest = events.filter(order_id=OuterRef('order_id')).order_by('-seq').values('seq')[:1]
+    return {event.order_id: event for event in events.filter(seq=Subquery(newest))}
+
+
+def since(order_id, seq=0):
+    """Events of one order after `seq`, oldest first."""
+    return OrderEvent.objects.filter(order_id=order_id, seq__gt=seq).order_by('seq')
+
+
+def tail(after_id=0, limit=TAIL_LIMIT):
+    """Events of any order with an id above `after_id`, oldest first."""
+    return OrderEvent.objects.filter(eventID__gt=after_id).order_by('eventID')[:limit]
+
+
+def as_dict(event):
+    return {
+        'seq': event.seq,
+        'status': event.status,
+        'code': event.code,
+        'notes': event.notes,
+        'created_at': event.created_at,
+        'updated_by': event.updated_by,
+    }
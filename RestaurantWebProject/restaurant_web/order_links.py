@@ -0,0 +1,141 @@
+"""
+Restaurant -> order link index.
+
+`RestaurantOrder` holds one row per (restaurant, order) pair that has at
+least one line, with the order's date and status copied over. The
+OrderFood / Order / Food signal handlers keep it in sync inside the
+writing transaction; bulk writes and `QuerySet.update()` on orders have to
+call `sync_order_links` / `order_changed` themselves. `manage.py
+backfill_order_links` (re)builds it for existing orders.
+"""
+from django.db.models import F, OuterRef, Subquery
+
+from api.models import Order, OrderFood
+from restaurant_web import counters, events
+from restaurant_web.models import RestaurantOrder
+
+
+CHUNK_SIZE = 1000
+
+
+def for_restaurant(queryset, restaurant_id):
+    """Restrict an Order queryset to orders containing the restaurant's food."""
+    # (restaurant, order) is unique, so the join never duplicates orders
+    return queryset.filter(restaurant_links__restaurant_id=restaurant_id)
+
+
+def restaurant_orders(queryset, restaurant_id, status=None, date_from=None, date_to=None):
+    """
+    An Order queryset restricted to the restaurant and filtered on the link
+    row's copies of date and status, annotated as `link_date`,
+    `link_status` and `link_order` so callers can sort on them too. That
+    way the (restaurant, -date, -order) and (restaurant, status, -date)
+    indexes serve both the filters and the ordering.
+    """
+    # the annotations reuse the join of the restaurant filter
+    queryset = for_restaurant(queryset, restaurant_id).annotate(
+        link_date=F('restaurant_links__date'),
+        link_status=F('restaurant_links__status'),
+        link_order=F('restaurant_links__order'),
+    )
+    if status:
+        queryset = queryset.filter(link_status=status)
+    if date_from:
+        queryset = queryset.filter(link_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(link_date__lte=date_to)
+    return queryset
+
+
+def sync_order_links(order_ids):
+    """Rebuild the link rows of the given orders from their lines."""
+    order_ids = {oid for oid in order_ids if oid is not None}
+    if not order_ids:
+        return
+
+    wanted = set(
+        OrderFood.objects.filter(orderID__in=order_ids)
+        .values_list('orderID_id', 'foodID__resID_id').distinct()
+    )
+    existing = {
+        (order_id, restaurant_id): (pk, status)
+        for pk, order_id, restaurant_id, status in RestaurantOrder.objects.filter(order_id__in=order_ids)
+        .values_list('pk', 'order_id', 'restaurant_id', 'status')
+    }
+    orders = dict(
+        (order_id, (day, status)) for order_id, day, status in
+        Order.objects.filter(orderID__in=order_ids).values_list('orderID', 'date', 'status')
+    )
+    changes = counters.deltas()
+
+    stale = [pair for pair in existing if pair not in wanted]
+    if stale:
+        RestaurantOrder.objects.filter(pk__in=[existing[pair][0] for pair in stale]).delete()
+        for order_id, restaurant_id in stale:
+            counters.count_orders(changes, restaurant_id, existing[(order_id, restaurant_id)][1], -1)
+
+    missing = [pair for pair in wanted - existing.keys() if pair[0] in orders]
+    if missing:
+        RestaurantOrder.objects.bulk_create([
+            RestaurantOrder(
+                order_id=order_id, restaurant_id=restaurant_id,
+                date=orders[order_id][0], status=orders[order_id][1],
+            )
+            for order_id, restaurant_id in missing
+        ], batch_size=CHUNK_SIZE, ignore_conflicts=True)
+        # the order shows up on these restaurants' screens for the first time
+        for order_id, restaurant_id in sorted(missing):
+            day, status = orders[order_id]
+            counters.count_orders(changes, restaurant_id, status, 1)
+            events.publish([restaurant_id], 'order.created', {
+                'orderID': order_id, 'date': day, 'status': status or 'pending',
+            })
+
+    # active deliveries follow their order onto / off restaurants
+    if stale or missing:
+        active = counters.active_deliveries({order_id for order_id, _ in stale + missing})
+        for pairs, sign in ((stale, -1), (missing, 1)):
+            for order_id, restaurant_id in pairs:
+                if active.get(order_id):
+                    changes[(restaurant_id, 'deliveries.active')] += sign * active[order_id]
+
+    # existing rows may carry an outdated date / status
+    kept = [pair for pair in existing if pair in wanted]
+    if kept:
+        order = Order.objects.filter(orderID=OuterRef('order_id'))
+        RestaurantOrder.objects.filter(pk__in=[existing[pair][0] for pair in kept]).update(
+            date=Subquery(order.values('date')[:1]),
+            status=Subquery(order.values('status')[:1]),
+        )
+        for order_id, restaurant_id in kept:
+            if order_id in orders:
+                counters.move_orders(changes, restaurant_id, existing[(order_id, restaurant_id)][1], orders[order_id][1])
+    counters.add(changes)
+
+
+def order_changed(order):
+    """Copy an order's date and status onto its link rows."""
+    links = RestaurantOrder.objects.filter(order_id=order.pk).exclude(date=order.date, status=order.status)
+    changes = counters.deltas()
+    for restaurant_id, status in links.values_list('restaurant_id', 'status'):
+        counters.move_orders(changes, restaurant_id, status, order.status)
+    links.update(date=order.date, status=order.status)
+    counters.add(changes)
+
+
+def orders_with_food(food_id):
+    return OrderFood.objects.filter(foodID_id=food_id).values_list('orderID_id', flat=True).distinct()
+
+
+def backfill(chunk_size=CHUNK_SIZE, start_after=0):
+    """Sync every order in id chunks; yields the last order id of each chunk."""
+    last_id = start_after
+    while True:
+        chunk = list(
+            Order.objects.filter(orderID__gt=last_id).order_by('orderID').values_list('orderID', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return
+        sync_order_links(chunk)
+        last_id = chunk[-1]
+        yield last_id
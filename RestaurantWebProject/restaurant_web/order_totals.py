@@ -0,0 +1,64 @@
+"""
+Denormalized order totals.
+
+`Order.total_price` (sum of price * stock over its lines) and
+`Order.items_count` (number of lines) are stored on the order so listings
+and reports never have to load `OrderFood` rows. The OrderFood signal
+handlers call `refresh_orders` inside the writing transaction, which
+recomputes the affected orders with one correlated UPDATE; bulk writes
+have to call it themselves. `manage.py reconcile_order_totals` finds and
+repairs any drift.
+"""
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from api.models import Order, OrderFood
+
+
+CHUNK_SIZE = 1000
+
+
+def _line_totals():
+    lines = OrderFood.objects.filter(orderID=OuterRef('pk')).order_by().values('orderID')
+    total = Subquery(lines.annotate(v=Sum(F('price') * F('stock'))).values('v'))
+    count = Subquery(lines.annotate(v=Count('pk')).values('v'))
+    return Coalesce(total, Value(0)), Coalesce(count, Value(0))
+
+
+def refresh_orders(order_ids):
+    """Recompute the stored totals of the given orders from their lines."""
+    order_ids = {oid for oid in order_ids if oid is not None}
+    if not order_ids:
+        return 0
+    total, count = _line_totals()
+    return Order.objects.filter(orderID__in=order_ids).update(total_price=total, items_count=count)
+
+
+def drifted(queryset=None):
+    """Orders whose stored totals disagree with their lines."""
+    queryset = Order.objects.all() if queryset is None else queryset
+    total, count = _line_totals()
+    return queryset.annotate(line_total=total, line_count=count).exclude(
+        Q(total_price=F('line_total')) & Q(items_count=F('line_count'))
+    )
+
+
+def reconcile(chunk_size=CHUNK_SIZE, dry_run=False):
+    """
+    Walk all orders in id chunks and repair drifted totals.
+    Returns (checked, repaired) counts.
+    """
+    checked = repaired = 0
+    last_id = 0
+    while True:
+        chunk = list(
+            Order.objects.filter(orderID__gt=last_id).order_by('orderID').values_list('orderID', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return checked, repaired
+        last_id = chunk[-1]
+        checked += len(chunk)
+        bad = list(drifted(Order.objects.filter(orderID__in=chunk)).values_list('orderID', flat=True))
+        if bad and not dry_run:
+            refresh_orders(bad)
+        repaired += len(bad)
@@ -0,0 +1,188 @@
+"""
+Order status state machine.
+
+`TRANSITIONS` declares which status may follow which. Every change is a
+compare-and-set: a single ``UPDATE ... SET status = <target> WHERE status =
+<expected>`` that writes only the status column. When a concurrent request
+got there first the UPDATE matches nothing and the caller gets a conflict,
+no row locks are held and no event is written.
+
+`transition` changes one order, `bulk_transition` many orders with a
+fixed number of queries. Both append to the order event log with
+`bulk_create` and do the link-table / live-feed bookkeeping the skipped model signals
+would have done. `bulk_transition` takes the orders it moved from the
+UPDATE's RETURNING clause (PostgreSQL, SQLite 3.35+), so an order another
+writer moved in between is never logged or counted twice.
+"""
+from collections import namedtuple
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.sql import UpdateQuery
+
+from api.models import Order
+from restaurant_web import counters, dashboard, events, order_events, rollups
+from restaurant_web.models import OrderEvent, RestaurantOrder
+
+
+STATUSES = list(OrderEvent.STATUS_CODES)
+TRANSITIONS = {
+    'pending': {'approved', 'cancelled'},
+    'approved': {'preparing', 'cancelled'},
+    'preparing': {'ready', 'cancelled'},
+    'ready': {'delivered'},
+    'delivered': set(),
+    'cancelled': set(),
+}
+MAX_BULK = 500
+
+# per-order results
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+CONFLICT = 'conflict'
+
+Outcome = namedtuple('Outcome', ['result', 'old_status', 'new_status'])
+
+
+def _status_is(value):
+    # orders without a status count as pending
+    if value == 'pending':
+        return Q(status='pending') | Q(status__isnull=True)
+    return Q(status=value)
+
+
+def can_transition(current, target):
+    return target in TRANSITIONS.get(current, ())
+
+
+def _record(order_ids, target, notes, updated_by, previous):
+    """
+    Event log rows, link rows, counters, rollups and live events for orders
+    just moved; `previous` maps each order id to the status it left.
+    """
+    appended = order_events.append(order_ids, order_events.code_of(target), notes, updated_by)
+    links = list(
+        RestaurantOrder.objects.filter(order_id__in=order_ids).values_list('order_id', 'restaurant_id', 'status')
+    )
+    RestaurantOrder.objects.filter(order_id__in=order_ids).update(status=target)
+    # a late cancellation changes an already rolled-up day
+    rollups.orders_changed(order_ids)
+
+    changes = counters.deltas()
+    restaurants = {}
+    for order_id, restaurant_id, status in links:
+        restaurants.setdefault(order_id, []).append(restaurant_id)
+        counters.move_orders(changes, restaurant_id, status, target)
+    for order_id in order_ids:
+        counters.move_orders(changes, None, previous[order_id], target)
+    counters.add(changes)
+
+    dashboard.changed({rid for ids in restaurants.values() for rid in ids})
+    for event in appended:
+        events.publish(restaurants.get(event.order_id, ()), 'order.status', {
+            'orderID': event.order_id, **order_events.as_dict(event),
+        })
+
+
+def _current_status(order_id):
+    rows = list(Order.objects.filter(orderID=order_id).values_list('status', flat=True)[:1])
+    return (rows[0] or 'pending') if rows else None
+
+
+def transition(order_id, target, notes='', updated_by='system', expected=None):
+    """
+    Move one order to `target` and return an `Outcome`.
+
+    `expected` is the status the client saw; without it the current status
+    is read first. Either way the UPDATE only applies if the row still
+    holds that status, otherwise the outcome is a CONFLICT carrying the
+    status that won. `expected` only ever guards the UPDATE: before an
+    UNCHANGED or INVALID answer the real status is read, so a missing order
+    is NOT_FOUND and a stale `expected` a CONFLICT.
+    """
+    with transaction.atomic():
+        current = expected if expected is not None else _current_status(order_id)
+        if current is None:
+            return Outcome(NOT_FOUND, None, None)
+        if current == target or not can_transition(current, target):
+            if expected is not None:
+                actual = _current_status(order_id)
+                if actual != expected:
+                    return Outcome(NOT_FOUND if actual is None else CONFLICT, actual, None)
+            if current == target:
+                return Outcome(UNCHANGED, current, target)
+            return Outcome(INVALID, current, None)
+
+        updated = Order.objects.filter(Q(orderID=order_id) & _status_is(current)).update(status=target)
+        if not updated:
+            actual = _current_status(order_id)
+            return Outcome(NOT_FOUND if actual is None else CONFLICT, actual, None)
+        _record([order_id], target, notes, updated_by, {order_id: current})
+    return Outcome(UPDATED, current, target)
+
+
+def _set_status(queryset, target):
+    """UPDATE the rows of `queryset` to `target`; returns the ids of the rows it changed."""
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values({'status': target})
+    sql, params = query.get_compiler(queryset.db).as_sql()
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {connection.ops.quote_name(Order._meta.pk.column)}', params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def bulk_transition(order_ids, target, notes='', updated_by='system'):
+    """
+    Move the given orders to `target`.
+
+    Returns ``{'updated': <count>, 'results': [...]}`` with one
+    ``{'orderID', 'old_status', 'new_status', 'result'}`` entry per
+    requested id, in request order.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    with transaction.atomic():
+        current = {
+            order_id: order_status or 'pending'
+            for order_id, order_status in Order.objects.filter(orderID__in=order_ids).values_list('orderID', 'status')
+        }
+
+        results = {}
+        expected = {}
+        for order_id in order_ids:
+            if order_id not in current:
+                results[order_id] = NOT_FOUND
+            elif current[order_id] == target:
+                results[order_id] = UNCHANGED
+            elif not can_transition(current[order_id], target):
+                results[order_id] = INVALID
+            else:
+                expected.setdefault(current[order_id], []).append(order_id)
+
+        moved = []
+        if expected:
+            # compare-and-set: each row must still hold the status read above
+            condition = Q(pk__in=[])
+            for old_status, ids in expected.items():
+                condition |= Q(orderID__in=ids) & _status_is(old_status)
+            moved = _set_status(Order.objects.filter(condition), target)
+            for ids in expected.values():
+                for order_id in ids:
+                    results[order_id] = UPDATED if order_id in moved else CONFLICT
+            if moved:
+                _record(sorted(moved), target, notes, updated_by, current)
+
+    return {
+        'updated': len(moved),
+        'results': [
+            {
+                'orderID': order_id,
+                'old_status': current.get(order_id),
+                'new_status': target if results[order_id] in (UPDATED, UNCHANGED) else current.get(order_id),
+                'result': results[order_id],
+            }
+            for order_id in order_ids
+        ],
+    }
@@ -0,0 +1,127 @@
+"""
+Running rating aggregates of restaurants and foods.
+
+`RestaurantRating` / `FoodRating` keep the count, sum and per-star counts
+of the reviews (Comment.review) of a restaurant / food. Comment signals
+(restaurant_web.signals) apply every created, changed or deleted review
+as one ``UPDATE ... SET count = count + 1, ...`` per row, so an average
+and its distribution are a primary key lookup instead of an aggregate
+over the comments, and listings sort on the stored average.
+
+Reviews outside 1-5 count in `count` and the sum but under no star.
+Writes that bypass the signals (raw SQL, `QuerySet.update()`) leave the
+aggregates off until `rebuild` (`manage.py rebuild_ratings`) recounts
+them from `tbl_comment`.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from api.models import Comment
+from restaurant_web.models import FoodRating, RestaurantRating
+
+
+STARS = (1, 2, 3, 4, 5)
+FIELDS = ('count', 'total', *(f'stars_{star}' for star in STARS))
+AVERAGE = Coalesce(Cast(F('total'), FloatField()) / NullIf(F('count'), 0), Value(0.0))
+
+
+def _changes(review, n):
+    values = {'count': n, 'total': n * review}
+    if review in STARS:
+        values[f'stars_{review}'] = n
+    return values
+
+
+def _apply(model, pk, values):
+    rows = model.objects.filter(pk=pk)
+    increments = {name: F(name) + n for name, n in values.items()}
+    if not rows.update(**increments):
+        if values['count'] < 0:
+            # nothing counted yet (or the row went with its restaurant / food)
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(pk=pk, **values)
+        except IntegrityError:
+            rows.update(**increments)
+    rows.update(average=AVERAGE)
+
+
+def add(restaurant_id, food_id, review, n=1):
+    """Count `n` reviews (negative: remove them) of a restaurant's food."""
+    values = _changes(int(review), n)
+    if restaurant_id is not None:
+        _apply(RestaurantRating, restaurant_id, values)
+    if food_id is not None:
+        _apply(FoodRating, food_id, values)
+
+
+def comment_changed(previous, current):
+    """Move a review from `previous` to `current` (restaurant id, food id, review); None for none."""
+    if previous == current:
+        return
+    if previous is not None:
+        add(*previous, n=-1)
+    if current is not None:
+        add(*current)
+
+
+# ---- reading ----
+
+def _summary(values):
+    count = values['count'] or 0
+    return {
+        'count': count,
+        'average': round((values['total'] or 0) / count, 2) if count else 0,
+        'distribution': {star: values[f'stars_{star}'] or 0 for star in STARS},
+    }
+
+
+def _empty():
+    return _summary(dict.fromkeys(FIELDS, 0))
+
+
+def restaurant(restaurant_id=None):
+    """Rating summary of a restaurant (None: all restaurants), from the stored aggregates."""
+    if restaurant_id:
+        values = RestaurantRating.objects.filter(pk=restaurant_id).values(*FIELDS).first()
+        return _summary(values) if values else _empty()
+    # one row per restaurant
+    return _summary(RestaurantRating.objects.aggregate(**{name: Sum(name) for name in FIELDS}))
+
+
+def food(food_id):
+    """Rating summary of a food, from the stored aggregates."""
+    values = FoodRating.objects.filter(pk=food_id).values(*FIELDS).first()
+    return _summary(values) if values else _empty()
+
+
+def _counts():
+    return {
+        'count': Count('pk'),
+        'total': Coalesce(Sum('review'), Value(0)),
+        **{f'stars_{star}': Count('pk', filter=Q(review=star)) for star in STARS},
+    }
+
+
+def summarize(comments):
+    """Rating summary of any Comment queryset, aggregated from its rows."""
+    return _summary(comments.aggregate(**_counts()))
+
+
+# ---- rebuilding ----
+
+def rebuild():
+    """Recount every aggregate from tbl_comment. Returns (restaurants, foods) rated."""
+    rated = []
+    with transaction.atomic():
+        for model, key, field in ((RestaurantRating, 'resID', 'restaurant_id'), (FoodRating, 'foodID', 'food_id')):
+            model.objects.all().delete()
+            model.objects.bulk_create([
+                model(**{field: row.pop(key)}, **row)
+                for row in Comment.objects.values(key).annotate(**_counts()).order_by()
+            ], batch_size=1000)
+            model.objects.update(average=AVERAGE)
+            rated.append(model.objects.count())
+    return tuple(rated)
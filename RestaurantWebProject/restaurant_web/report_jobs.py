@@ -0,0 +1,269 @@
+"""
+Background report jobs.
+
+A long report (a year of the revenue report, say) is submitted as a
+`ReportJob` row and computed outside the request. Clients poll the job for
+its progress and fetch the result from it once it is done.
+
+Jobs are keyed by the hash of the report name and its normalized
+parameters. Submitting a report that is already queued or running returns
+that job, and one finished less than REPORT_JOB_CACHE_TTL seconds ago is
+served as it is, so identical reports are computed once. A unique
+constraint on the key of queued and running jobs settles concurrent
+submits: the loser gets the winner's job.
+
+Who runs the jobs:
+
+* REPORT_JOB_THREADS > 0 (default 2) - a bounded thread pool in the
+  process that submitted the job, started after commit
+* `manage.py run_report_jobs` - a worker that claims queued jobs from the
+  table; it also picks up jobs a restarted process left behind
+
+A job is claimed with a conditional UPDATE (queued -> running), so a job
+is only ever run once even with both in use.
+
+Revenue reports are split into calendar months that are computed on up to
+REPORT_JOB_PARALLEL threads and merged (restaurant_web.reports.merge).
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Min, Q
+from django.utils import dateparse, timezone
+
+from api.models import Order
+from restaurant_web import reports, top_sellers
+from restaurant_web.models import ArchivedOrder, ReportJob
+
+
+logger = logging.getLogger(__name__)
+
+THREADS = getattr(settings, 'REPORT_JOB_THREADS', 2)
+PARALLEL = getattr(settings, 'REPORT_JOB_PARALLEL', 4)
+RESULT_TTL = getattr(settings, 'REPORT_JOB_CACHE_TTL', 600)
+STALE_AFTER = timedelta(hours=1)
+KEEP_DAYS = 7
+GROUPINGS = ('day', 'month', 'restaurant')
+
+Report = namedtuple('Report', ['normalize', 'compute', 'split', 'merge'])
+
+
+# ---- parameters ----
+
+def _date(value):
+    if not value:
+        return None
+    parsed = dateparse.parse_date(value) if isinstance(value, str) else value
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+def _id(value):
+    if value in (None, ''):
+        return None
+    if not str(value).isdigit():
+        raise ValueError(value)
+    return int(value)
+
+
+def _revenue_params(params):
+    group_by = params.get('group_by') or 'day'
+    if group_by not in GROUPINGS:
+        raise ValueError(group_by)
+    return {
+        'date_from': _date(params.get('date_from')),
+        'date_to': _date(params.get('date_to')),
+        'restaurant_id': _id(params.get('restaurant_id')),
+        'group_by': group_by,
+    }
+
+
+def _top_sellers_params(params):
+    (date_from, date_to), _ = top_sellers.periods(params.get('date_from'), params.get('date_to'))
+    limit = _id(params.get('limit')) or top_sellers.DEFAULT_LIMIT
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'restaurant_id': _id(params.get('restaurant_id')),
+        'limit': max(1, min(limit, top_sellers.MAX_LIMIT)),
+    }
+
+
+def _first_order_date():
+    dates = [
+        Order.objects.aggregate(first=Min('date'))['first'],
+        ArchivedOrder.objects.aggregate(first=Min('date'))['first'],
+    ]
+    dates = [day for day in dates if day is not None]
+    return min(dates) if dates else None
+
+
+def months(params):
+    """The parameters split into one set per calendar month of their range."""
+    start = params['date_from'] or _first_order_date()
+    end = params['date_to'] or timezone.localdate()
+    if start is None or start > end:
+        return [params]
+    parts = []
+    while start <= end:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        parts.append({**params, 'date_from': start, 'date_to': min(end, next_month - timedelta(days=1))})
+        start = next_month
+    # open ends stay open, for orders outside the range seen here
+    parts[0]['date_from'] = params['date_from']
+    parts[-1]['date_to'] = params['date_to']
+    return parts
+
+
+REPORTS = {
+    'revenue': Report(_revenue_params, lambda params: reports.revenue_report(**params), months, reports.merge),
+    'top-sellers': Report(_top_sellers_params, lambda params: top_sellers.top_sellers(**params), None, None),
+}
+
+
+def _key(report, params):
+    return hashlib.sha256(
+        json.dumps([report, params], sort_keys=True, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+
+
+# ---- submitting ----
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='report-job')
+        return _executor
+
+
+def _run_pooled(job_id):
+    try:
+        run(job_id)
+    finally:
+        # pool threads outlive the job; do not leave a connection open per thread
+        connection.close()
+
+
+def submit(report, params):
+    """
+    The job computing `report` with `params`: an existing one when the same
+    report is queued, running or recently done, else a new queued job.
+    Raises KeyError for an unknown report and ValueError for bad parameters.
+    """
+    params = REPORTS[report].normalize(params)
+    key = _key(report, params)
+    fresh = Q(status__in=(ReportJob.QUEUED, ReportJob.RUNNING)) | Q(
+        status=ReportJob.DONE, finished_at__gte=timezone.now() - timedelta(seconds=RESULT_TTL)
+    )
+    job = ReportJob.objects.filter(fresh, key=key).order_by('-created_at').first()
+    if job is not None:
+        return job
+
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(report=report, params=params, key=key)
+            if THREADS > 0:
+                transaction.on_commit(lambda: _pool().submit(_run_pooled, job.pk))
+    except IntegrityError:
+        # a concurrent submit queued the same report first
+        return ReportJob.objects.filter(key=key).order_by('-created_at').first()
+    return job
+
+
+# ---- running ----
+
+def _part(job_id, compute, params):
+    try:
+        result = compute(params)
+        ReportJob.objects.filter(pk=job_id).update(parts_done=F('parts_done') + 1)
+        return result
+    finally:
+        connection.close()
+
+
+def _compute(job_id, spec, params):
+    parts = spec.split(params) if spec.split else [params]
+    ReportJob.objects.filter(pk=job_id).update(parts_total=len(parts))
+    if len(parts) == 1:
+        result = spec.compute(parts[0])
+        ReportJob.objects.filter(pk=job_id).update(parts_done=1)
+        return result
+    with ThreadPoolExecutor(max_workers=min(PARALLEL, len(parts))) as pool:
+        results = list(pool.map(lambda part: _part(job_id, spec.compute, part), parts))
+    return spec.merge(results)
+
+
+def run(job_id):
+    """Claim a queued job and compute it. Returns False if someone else has it."""
+    claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.QUEUED).update(
+        status=ReportJob.RUNNING, started_at=timezone.now(), parts_done=0,
+    )
+    if not claimed:
+        return False
+
+    job = ReportJob.objects.get(pk=job_id)
+    spec = REPORTS[job.report]
+    try:
+        # the stored parameters went through JSON; normalizing parses them back
+        result = _compute(job_id, spec, spec.normalize(job.params))
+    except Exception as exc:
+        logger.exception('report job %s failed', job_id)
+        ReportJob.objects.filter(pk=job_id).update(
+            status=ReportJob.FAILED, error=str(exc) or exc.__class__.__name__, finished_at=timezone.now(),
+        )
+        return True
+    ReportJob.objects.filter(pk=job_id).update(status=ReportJob.DONE, result=result, finished_at=timezone.now())
+    return True
+
+
+def next_queued():
+    return ReportJob.objects.filter(status=ReportJob.QUEUED).order_by('created_at').values_list(
+        'pk', flat=True
+    ).first()
+
+
+def requeue_stale():
+    """Put back jobs left running for longer than STALE_AFTER (their process died)."""
+    return ReportJob.objects.filter(
+        status=ReportJob.RUNNING, started_at__lt=timezone.now() - STALE_AFTER
+    ).update(status=ReportJob.QUEUED, started_at=None)
+
+
+def purge():
+    """Delete finished jobs older than KEEP_DAYS days."""
+    deleted, _ = ReportJob.objects.filter(
+        status__in=(ReportJob.DONE, ReportJob.FAILED), finished_at__lt=timezone.now() - timedelta(days=KEEP_DAYS)
+    ).delete()
+    return deleted
+
+
+def as_dict(job):
+    data = {
+        'jobID': job.ID,
+        'report': job.report,
+        'params': job.params,
+        'status': job.status,
+        'progress': {'done': job.parts_done, 'total': job.parts_total},
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == ReportJob.DONE:
+        data['result'] = job.result
+    elif job.status == ReportJob.FAILED:
+        data['error'] = job.error
+    return data
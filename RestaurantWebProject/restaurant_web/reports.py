@@ -0,0 +1,188 @@
+"""
+Revenue report aggregated in the database.
+
+An order's revenue is its stored `total_price` (the sum of price * stock
+over its lines, see restaurant_web.order_totals), so day and month groups
+are a GROUP BY over `tbl_order` alone. Restaurant groups count an order
+once for every restaurant it has lines from, with its full total, and are
+a GROUP BY over the restaurant -> order link table.
+
+Complete days are read from the daily rollups (restaurant_web.rollups)
+once they have been built; only the days after them (normally today) are
+aggregated from the raw tables. When a raw range reaches archived orders
+(restaurant_web.archive) the same aggregates are computed over the archive
+tables and added in.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import dateparse
+
+from api.models import Order
+from restaurant_web import archive, order_links, rollups
+from restaurant_web.models import ArchivedOrder, DailyRevenue, RestaurantOrder
+
+
+def _filtered(queryset, date_from, date_to):
+    # only finished / paid orders count (here: everything not cancelled)
+    queryset = queryset.exclude(status='cancelled')
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    return queryset
+
+
+def _totals(queryset):
+    return queryset.aggregate(revenue=Coalesce(Sum('total_price'), Value(0)), orders=Count('pk'))
+
+
+def _by_period(queryset, group_by):
+    if group_by == 'month':
+        period, fmt = TruncMonth('date'), '%Y-%m'
+    else:
+        # `date` is a DateField, so it is its own TruncDay
+        period, fmt = F('date'), '%Y-%m-%d'
+    rows = (
+        queryset.annotate(period=period).values('period')
+        .annotate(revenue=Sum('total_price'), orders=Count('pk'))
+        .order_by()
+    )
+    return [(row['period'].strftime(fmt), row['revenue'], row['orders']) for row in rows]
+
+
+def _by_restaurant(queryset):
+    rows = (
+        RestaurantOrder.objects.filter(order__in=queryset.values('orderID'))
+        .values('restaurant_id')
+        .annotate(revenue=Sum('order__total_price'), orders=Count('order_id'))
+        .order_by()
+    )
+    return [(f"restaurant_{row['restaurant_id']}", row['revenue'], row['orders']) for row in rows]
+
+
+def _archived_by_restaurant(queryset):
+    rows = (
+        archive.restaurant_lines(queryset)
+        .values('restaurant_id')
+        .annotate(revenue=Sum('order__total_price'), orders=Count('order_id'))
+        .order_by()
+    )
+    return [(f"restaurant_{row['restaurant_id']}", row['revenue'], row['orders']) for row in rows]
+
+
+def _raw_part(queryset, group_by, archived=False):
+    """(totals, groups) of an order queryset; totals None = the sum of the groups."""
+    if group_by == 'restaurant':
+        groups = _archived_by_restaurant(queryset) if archived else _by_restaurant(queryset)
+        # an order counts once per restaurant there, so totals need their own query
+        totals = _totals(queryset)
+        return (totals['revenue'], totals['orders']), groups
+    return None, _by_period(queryset, group_by)
+
+
+def _rollup_part(start, end, restaurant_id, group_by):
+    """(totals, groups) read from the daily rollups of [start, end]."""
+    rows = DailyRevenue.objects.filter(day__lte=end)
+    if start:
+        rows = rows.filter(day__gte=start)
+    if group_by == 'restaurant':
+        totals = rollups.read(rows.filter(restaurant__isnull=True))
+        groups = [
+            (f'restaurant_{rid}', values['revenue'], values['orders'])
+            for rid, values in rollups.read(rows, 'restaurant')
+        ]
+        return (totals['revenue'], totals['orders']), groups
+
+    rows = rows.filter(restaurant_id=restaurant_id) if restaurant_id else rows.filter(restaurant__isnull=True)
+    fmt = '%Y-%m' if group_by == 'month' else '%Y-%m-%d'
+    return None, [
+        (period.strftime(fmt), values['revenue'], values['orders'])
+        for period, values in rollups.read(rows, 'month' if group_by == 'month' else 'day')
+    ]
+
+
+def _parse(value):
+    return dateparse.parse_date(value) if isinstance(value, str) else value
+
+
+def revenue_report(date_from=None, date_to=None, restaurant_id=None, group_by='day'):
+    """The revenue report body: totals plus one entry per group, sorted by group."""
+    parts = []
+    raw_from, raw_needed = date_from, True
+
+    # complete days come from the rollups; restaurant groups of a single
+    # restaurant's orders include the other restaurants and need raw rows
+    start, end = _parse(date_from), _parse(date_to)
+    usable = (not date_from or start) and (not date_to or end) and not (restaurant_id and group_by == 'restaurant')
+    rolled = rollups.rolled_through() if usable else None
+    if rolled is not None:
+        if start is None or start <= rolled:
+            parts.append(_rollup_part(start, min(end, rolled) if end else rolled, restaurant_id, group_by))
+        raw_needed = end is None or end > rolled
+        raw_from = max(start, rolled + timedelta(days=1)) if start else rolled + timedelta(days=1)
+
+    if raw_needed:
+        orders = _filtered(Order.objects.all(), raw_from, date_to)
+        if restaurant_id:
+            orders = order_links.for_restaurant(orders, restaurant_id)
+        parts.append(_raw_part(orders, group_by))
+
+        # older orders live in the archive tables
+        if archive.needs_archive(raw_from):
+            archived = _filtered(ArchivedOrder.objects.all(), raw_from, date_to)
+            if restaurant_id:
+                archived = archive.for_restaurant(archived, restaurant_id)
+            parts.append(_raw_part(archived, group_by, archived=True))
+
+    total_revenue = 0
+    total_orders = 0
+    by_group = {}
+    for totals, groups in parts:
+        if totals is not None:
+            total_revenue += totals[0]
+            total_orders += totals[1]
+        for key, revenue, count in groups:
+            if totals is None:
+                total_revenue += revenue
+                total_orders += count
+            group = by_group.setdefault(key, {'revenue': 0, 'orders': 0})
+            group['revenue'] += revenue
+            group['orders'] += count
+    return _body(total_revenue, total_orders, by_group)
+
+
+def _body(total_revenue, total_orders, by_group):
+    return {
+        'total_revenue': total_revenue,
+        'total_orders': total_orders,
+        'avg_order': round(total_revenue / total_orders, 2) if total_orders else 0,
+        'groups': [
+            {
+                'group': key,
+                'revenue': val['revenue'],
+                'orders': val['orders'],
+                'avg_order': round(val['revenue'] / val['orders'], 2) if val['orders'] else 0,
+            }
+            for key, val in sorted(by_group.items())
+        ],
+    }
+
+
+def merge(bodies):
+    """
+    One report body out of the bodies of disjoint date ranges (with the same
+    restaurant and grouping); an order only ever falls into one of them.
+    """
+    total_revenue = 0
+    total_orders = 0
+    by_group = {}
+    for body in bodies:
+        total_revenue += body['total_revenue']
+        total_orders += body['total_orders']
+        for row in body['groups']:
+            group = by_group.setdefault(row['group'], {'revenue': 0, 'orders': 0})
+            group['revenue'] += row['revenue']
+            group['orders'] += row['orders']
+    return _body(total_revenue, total_orders, by_group)
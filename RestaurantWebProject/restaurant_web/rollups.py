@@ -0,0 +1,220 @@
+"""
+Daily revenue rollups.
+
+`DailyRevenue` holds per day the revenue, order and item counts of the
+orders that are not cancelled (and the count / revenue of the cancelled
+ones), once per restaurant and once for all orders (restaurant NULL). A
+restaurant row counts every order with lines from that restaurant with its
+full total, like the revenue report's restaurant grouping.
+
+`DailyFoodSales` holds per day and food the quantity and revenue (price *
+stock) sold in orders that are not cancelled, for the top sellers report
+(restaurant_web.top_sellers). Like that report it only counts hot orders;
+archiving recomputes the days it empties.
+
+Only complete days are rolled up. The all-orders row is written for every
+day, even without orders, so the newest such row marks how far the
+rollups reach (`rolled_through`); reports read rollups up to there and
+aggregate the raw tables after it (normally just today). Reads never
+build anything: `manage.py rebuild_revenue_rollups --catch-up`, run daily
+after midnight, rolls up the days completed since the last run. Until it
+runs, the days in between are simply read from the raw tables.
+
+Writes to orders of already rolled-up days (a late cancellation, a line
+edited on an old order) recompute those days after commit; writes to
+today's orders cost nothing here. `manage.py rebuild_revenue_rollups`
+builds the whole history in chunks of days.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import dateparse, timezone
+
+from api.models import Order, OrderFood
+from restaurant_web import archive
+from restaurant_web.models import ArchivedOrder, DailyFoodSales, DailyRevenue, RestaurantOrder
+
+
+CHUNK_DAYS = 31
+
+
+def _day_range(start, end):
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
+def _aggregates(prefix=''):
+    # `prefix` points from a link / line row to its order
+    cancelled = Q(**{f'{prefix}status': 'cancelled'})
+    return {
+        'revenue': Coalesce(Sum(f'{prefix}total_price', filter=~cancelled), Value(0)),
+        'orders': Count(f'{prefix}pk', filter=~cancelled),
+        'items': Coalesce(Sum(f'{prefix}items_count', filter=~cancelled), Value(0)),
+        'cancelled_orders': Count(f'{prefix}pk', filter=cancelled),
+        'cancelled_revenue': Coalesce(Sum(f'{prefix}total_price', filter=cancelled), Value(0)),
+    }
+
+
+def _add(rows, key, values):
+    row = rows.setdefault(key, dict.fromkeys(_aggregates(), 0))
+    for name in row:
+        row[name] += values[name]
+
+
+def _compute(days):
+    """(restaurant id or None, day) -> aggregates, from hot and archived orders."""
+    rows = {(None, day): dict.fromkeys(_aggregates(), 0) for day in days}
+
+    for values in Order.objects.filter(date__in=days).values('date').annotate(**_aggregates()).order_by():
+        _add(rows, (None, values['date']), values)
+    for values in (
+        RestaurantOrder.objects.filter(order__date__in=days)
+        .values('restaurant_id', 'order__date').annotate(**_aggregates('order__')).order_by()
+    ):
+        _add(rows, (values['restaurant_id'], values['order__date']), values)
+
+    archived = ArchivedOrder.objects.filter(date__in=days)
+    if archived.exists():
+        for values in archived.values('date').annotate(**_aggregates()).order_by():
+            _add(rows, (None, values['date']), values)
+        for values in (
+            archive.restaurant_lines(archived)
+            .values('restaurant_id', 'order__date').annotate(**_aggregates('order__')).order_by()
+        ):
+            _add(rows, (values['restaurant_id'], values['order__date']), values)
+    return rows
+
+
+def food_sales(lines):
+    """Quantity and revenue per (food, day) of an OrderFood queryset, cancelled orders left out."""
+    return (
+        lines.exclude(orderID__status='cancelled')
+        .values('foodID', day=F('orderID__date'))
+        .annotate(quantity=Sum('stock'), revenue=Sum(F('price') * F('stock')))
+        .order_by()
+    )
+
+
+def rebuild_days(days):
+    """Recompute the rollup rows of the given days."""
+    days = sorted(set(days))
+    if not days:
+        return
+    with transaction.atomic():
+        # The all-orders row of each day is the day's lock: created if
+        # missing, then locked in day order. Concurrent rebuilds of a day
+        # run one after the other, and each reads the orders only once it
+        # holds the lock, so the last one to write has read the latest data.
+        DailyRevenue.objects.bulk_create([DailyRevenue(day=day) for day in days], ignore_conflicts=True)
+        totals = {
+            row.day: row
+            for row in DailyRevenue.objects.select_for_update().filter(restaurant__isnull=True, day__in=days)
+            .order_by('day')
+        }
+        rows = _compute(days)
+        sales = list(food_sales(OrderFood.objects.filter(orderID__date__in=days)))
+
+        now = timezone.now()
+        for (restaurant_id, day), values in rows.items():
+            if restaurant_id is None:
+                for name, value in values.items():
+                    setattr(totals[day], name, value)
+                totals[day].updated_at = now
+        DailyRevenue.objects.bulk_update(list(totals.values()), [*_aggregates(), 'updated_at'])
+        DailyRevenue.objects.filter(day__in=days, restaurant__isnull=False).delete()
+        DailyRevenue.objects.bulk_create([
+            DailyRevenue(restaurant_id=restaurant_id, day=day, **values)
+            for (restaurant_id, day), values in rows.items() if restaurant_id is not None
+        ])
+        DailyFoodSales.objects.filter(day__in=days).delete()
+        DailyFoodSales.objects.bulk_create([
+            DailyFoodSales(food_id=row['foodID'], day=row['day'], quantity=row['quantity'], revenue=row['revenue'])
+            for row in sales
+        ], batch_size=5000)
+
+
+def first_order_date():
+    dates = [
+        Order.objects.aggregate(first=Min('date'))['first'],
+        ArchivedOrder.objects.aggregate(first=Min('date'))['first'],
+    ]
+    dates = [day for day in dates if day is not None]
+    return min(dates) if dates else None
+
+
+def rebuild(start=None, end=None, chunk_days=CHUNK_DAYS):
+    """
+    Rebuild the rollups from `start` (default: the first order) through
+    `end` (default: yesterday) in chunks; yields the last day of each chunk.
+    """
+    end = end or timezone.localdate() - timedelta(days=1)
+    start = start or first_order_date() or end
+    day = start
+    while day <= end:
+        chunk = _day_range(day, min(day + timedelta(days=chunk_days - 1), end))
+        rebuild_days(chunk)
+        yield chunk[-1]
+        day = chunk[-1] + timedelta(days=1)
+
+
+def rolled_through():
+    """The last day the rollups cover, or None before the first rebuild."""
+    return DailyRevenue.objects.filter(restaurant__isnull=True).aggregate(last=Max('day'))['last']
+
+
+def catch_up(chunk_days=CHUNK_DAYS):
+    """
+    Roll up the days completed since the rollups were last built (nothing
+    before the first rebuild); yields the last day of each chunk.
+    """
+    last = rolled_through()
+    if last is not None:
+        yield from rebuild(last + timedelta(days=1), chunk_days=chunk_days)
+
+
+def days_changed(days):
+    """Recompute rolled-up days among `days` once the transaction commits."""
+    today = timezone.localdate()
+    # instances saved straight from request data may still hold strings
+    days = {dateparse.parse_date(day) if isinstance(day, str) else day for day in days}
+    # today and later are always read from the raw tables
+    days = {day for day in days if day is not None and day < today}
+    if not days:
+        return
+
+    def recompute():
+        last = DailyRevenue.objects.filter(restaurant__isnull=True).aggregate(last=Max('day'))['last']
+        if last is not None:
+            rebuild_days([day for day in days if day <= last])
+
+    transaction.on_commit(recompute)
+
+
+def orders_changed(order_ids):
+    days_changed(Order.objects.filter(orderID__in=set(order_ids)).values_list('date', flat=True).distinct())
+
+
+def read(queryset, group_by=None):
+    """
+    Sum a DailyRevenue queryset: one dict of totals, or with `group_by`
+    ('day', 'month' or 'restaurant') a list of (group, totals) pairs. Rows
+    without counted orders are left out of the groups.
+    """
+    names = list(_aggregates())
+    fields = {f'sum_{name}': Coalesce(Sum(name), Value(0)) for name in names}
+    if group_by is None:
+        values = queryset.aggregate(**fields)
+        return {name: values[f'sum_{name}'] for name in names}
+    if group_by == 'restaurant':
+        queryset = queryset.filter(restaurant__isnull=False)
+        key = 'restaurant_id'
+    elif group_by == 'month':
+        queryset = queryset.annotate(month=TruncMonth('day'))
+        key = 'month'
+    else:
+        key = 'day'
+    return [
+        (values[key], {name: values[f'sum_{name}'] for name in names})
+        for values in queryset.filter(orders__gt=0).values(key).annotate(**fields).order_by()
+    ]
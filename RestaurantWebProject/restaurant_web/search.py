@@ -0,0 +1,287 @@
+"""
+Menu full-text search.
+
+Every food has one `FoodSearchEntry` (title = food name, body = category,
+restaurant name and description). On top of it the active backend keeps
+its own index:
+
+* postgres - GIN index over a weighted tsvector of the entry (plus an
+  optional pg_trgm index used as a fuzzy fallback)
+* fts5     - SQLite FTS5 virtual table `tbl_food_search_fts`
+* terms    - portable inverted index in `FoodSearchTerm`
+
+The backend is picked from the database vendor unless
+`settings.MENU_SEARCH_BACKEND` forces one.
+
+A search keeps only the MAX_RESULTS (settings.MENU_SEARCH_MAX_RESULTS,
+default 500) best matches: the menu list pages through them by rank, and
+its response says when a search matched more (`search.truncated`), so a
+client knows to narrow the query instead of paging past the end. The index is kept current by
+the signal handlers in `restaurant_web.signals`; `manage.py
+rebuild_search_index` rebuilds it from scratch.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from api.models import Food
+from restaurant_web.models import FoodSearchEntry, FoodSearchTerm
+
+
+MAX_RESULTS = getattr(settings, 'MENU_SEARCH_MAX_RESULTS', 500)
+CHUNK_SIZE = 1000
+
+# term weights per source field
+TITLE_WEIGHT = 4
+CATEGORY_WEIGHT = 2
+RESTAURANT_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lowercase word tokens; single letters are dropped, numbers kept."""
+    tokens = []
+    for token in _TOKEN_RE.findall((text or '').lower()):
+        if len(token) > 1 or token.isdigit():
+            tokens.append(token[:64])
+    return tokens
+
+
+class TermIndexBackend:
+    name = 'terms'
+
+    def index(self, rows):
+        food_ids = [row['foodID'] for row in rows]
+        FoodSearchTerm.objects.filter(food_id__in=food_ids).delete()
+
+        postings = []
+        for row in rows:
+            weights = defaultdict(int)
+            for field, weight in (
+                ('foodName', TITLE_WEIGHT),
+                ('catID__catName', CATEGORY_WEIGHT),
+                ('resID__resName', RESTAURANT_WEIGHT),
+                ('description', DESCRIPTION_WEIGHT),
+            ):
+                for token in tokenize(row[field]):
+                    weights[token] += weight
+            postings.extend(
+                FoodSearchTerm(term=term, food_id=row['foodID'], restaurant_id=row['resID_id'], weight=weight)
+                for term, weight in weights.items()
+            )
+        FoodSearchTerm.objects.bulk_create(postings, batch_size=CHUNK_SIZE)
+
+    def remove(self, food_ids):
+        FoodSearchTerm.objects.filter(food_id__in=food_ids).delete()
+
+    def clear(self):
+        FoodSearchTerm.objects.all().delete()
+
+    def search(self, query, restaurant_id=None, limit=MAX_RESULTS):
+        scores = None
+        for token in dict.fromkeys(tokenize(query)):
+            # a prefix as an index range; SQLite's LIKE (startswith) ignores the index
+            postings = FoodSearchTerm.objects.filter(term__gte=token, term__lt=token + '\U0010ffff')
+            if restaurant_id:
+                postings = postings.filter(restaurant_id=restaurant_id)
+
+            matched = defaultdict(int)
+            for food_id, weight in postings.values_list('food_id', 'weight'):
+                matched[food_id] += weight
+
+            # every query token has to match (AND semantics)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {fid: scores[fid] + w for fid, w in matched.items() if fid in scores}
+            if not scores:
+                return []
+
+        ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+        return [food_id for food_id, _ in ranked[:limit]]
+
+
+class SQLiteFTSBackend:
+    name = 'fts5'
+
+    def index(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "DELETE FROM tbl_food_search_fts WHERE rowid = %s",
+                [(row['foodID'],) for row in rows],
+            )
+            cursor.executemany(
+                "INSERT INTO tbl_food_search_fts (rowid, title, body) VALUES (%s, %s, %s)",
+                [(row['foodID'], row['title'], row['body']) for row in rows],
+            )
+
+    def remove(self, food_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "DELETE FROM tbl_food_search_fts WHERE rowid = %s",
+                [(food_id,) for food_id in food_ids],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM tbl_food_search_fts")
+
+    def search(self, query, restaurant_id=None, limit=MAX_RESULTS):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        match = ' AND '.join(f'"{token}"*' for token in tokens)
+        sql = (
+            "SELECT f.rowid FROM tbl_food_search_fts f "
+            "JOIN tbl_food_search e ON e.food_id = f.rowid "
+            "WHERE tbl_food_search_fts MATCH %s"
+        )
+        params = [match]
+        if restaurant_id:
+            sql += " AND e.restaurant_id = %s"
+            params.append(restaurant_id)
+        sql += f" ORDER BY bm25(tbl_food_search_fts, {TITLE_WEIGHT}.0, 1.0), f.rowid LIMIT %s"
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresBackend:
+    name = 'postgres'
+
+    # must match the expression of food_search_fts_idx (migration 0003)
+    vector = (
+        "setweight(to_tsvector('simple', title), 'A') || "
+        "setweight(to_tsvector('simple', body), 'B')"
+    )
+
+    def __init__(self):
+        self._trigram = None
+
+    def index(self, rows):
+        # the GIN index is maintained by Postgres itself
+        pass
+
+    def remove(self, food_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def has_trigram(self):
+        if self._trigram is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'food_search_trgm_idx'")
+                self._trigram = cursor.fetchone() is not None
+        return self._trigram
+
+    def search(self, query, restaurant_id=None, limit=MAX_RESULTS):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        where, params = '', []
+        if restaurant_id:
+            where = " AND restaurant_id = %s"
+            params.append(restaurant_id)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT food_id FROM tbl_food_search "
+                f"WHERE {self.vector} @@ to_tsquery('simple', %s){where} "
+                f"ORDER BY ts_rank({self.vector}, to_tsquery('simple', %s)) DESC, food_id LIMIT %s",
+                [tsquery, *params, tsquery, limit],
+            )
+            food_ids = [row[0] for row in cursor.fetchall()]
+
+            if not food_ids and self.has_trigram():
+                # nothing matched word prefixes: fall back to typo-tolerant title matching
+                text = ' '.join(tokens)
+                cursor.execute(
+                    f"SELECT food_id FROM tbl_food_search WHERE title %% %s{where} "
+                    f"ORDER BY similarity(title, %s) DESC, food_id LIMIT %s",
+                    [text, *params, text, limit],
+                )
+                food_ids = [row[0] for row in cursor.fetchall()]
+        return food_ids
+
+
+_backends = {}
+_fts_tables = {}
+
+
+def _sqlite_has_fts():
+    database = connection.settings_dict['NAME']
+    if database not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'tbl_food_search_fts'")
+            _fts_tables[database] = cursor.fetchone() is not None
+    return _fts_tables[database]
+
+
+def get_backend():
+    """Search backend for the default database (cached per vendor)."""
+    name = getattr(settings, 'MENU_SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        if connection.vendor == 'postgresql':
+            name = 'postgres'
+        elif connection.vendor == 'sqlite' and _sqlite_has_fts():
+            name = 'fts5'
+        else:
+            name = 'terms'
+    if name not in _backends:
+        _backends[name] = {
+            'postgres': PostgresBackend,
+            'fts5': SQLiteFTSBackend,
+            'terms': TermIndexBackend,
+        }[name]()
+    return _backends[name]
+
+
+def reindex_foods(food_ids):
+    """(Re)build the search entries of the given foods in bulk."""
+    food_ids = list(food_ids)
+    backend = get_backend()
+    for start in range(0, len(food_ids), CHUNK_SIZE):
+        chunk = food_ids[start:start + CHUNK_SIZE]
+        rows = list(Food.objects.filter(foodID__in=chunk).values(
+            'foodID', 'foodName', 'description', 'resID_id', 'resID__resName', 'catID__catName',
+        ))
+        for row in rows:
+            row['title'] = row['foodName']
+            row['body'] = ' '.join(filter(None, (row['catID__catName'], row['resID__resName'], row['description'])))
+
+        with transaction.atomic():
+            FoodSearchEntry.objects.filter(food_id__in=chunk).delete()
+            FoodSearchEntry.objects.bulk_create([
+                FoodSearchEntry(food_id=row['foodID'], restaurant_id=row['resID_id'], title=row['title'], body=row['body'])
+                for row in rows
+            ])
+            missing = set(chunk) - {row['foodID'] for row in rows}
+            if missing:
+                backend.remove(missing)
+            if rows:
+                backend.index(rows)
+
+
+def remove_foods(food_ids):
+    """Drop foods from the index (entries cascade with the food row)."""
+    food_ids = list(food_ids)
+    FoodSearchEntry.objects.filter(food_id__in=food_ids).delete()
+    get_backend().remove(food_ids)
+
+
+def clear_index():
+    """Empty the whole index; used before a full rebuild."""
+    FoodSearchEntry.objects.all().delete()
+    get_backend().clear()
+
+
+def search_foods(query, restaurant_id=None, limit=MAX_RESULTS):
+    """Ranked list of matching food ids, best match first."""
+    return get_backend().search(query, restaurant_id=restaurant_id, limit=limit)
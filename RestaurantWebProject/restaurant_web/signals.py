@@ -0,0 +1,389 @@
+"""
+Model signal handlers that keep derived restaurant_web data current.
+
+Bulk paths (`bulk_create`, `QuerySet.update`) do not send these signals
+and have to call the matching module functions themselves.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from api.models import Category, Comment, Delivery, Food, Order, OrderFood, Restaurant, Worker
+from restaurant_web import (
+    availability, counters, dashboard, events, order_events, order_links, order_totals, ratings, rollups, search,
+    snapshots,
+)
+from restaurant_web.models import Inventory, Menu, OperatingHours, OrderEvent, RestaurantOrder
+
+
+# ---- menu search index ----
+
+@receiver(post_save, sender=Food)
+def index_food(sender, instance, **kwargs):
+    search.reindex_foods([instance.foodID])
+
+
+@receiver(post_delete, sender=Food)
+def unindex_food(sender, instance, **kwargs):
+    search.remove_foods([instance.foodID])
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def index_menu_food(sender, instance, **kwargs):
+    if Food.objects.filter(foodID=instance.food_id).exists():
+        search.reindex_foods([instance.food_id])
+
+
+@receiver(post_save, sender=Restaurant)
+def index_restaurant_foods(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex_foods(Food.objects.filter(resID=instance).values_list('foodID', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def index_category_foods(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex_foods(Food.objects.filter(catID=instance).values_list('foodID', flat=True))
+
+
+# ---- menu snapshots ----
+
+@receiver(pre_save, sender=Food)
+def remember_food_restaurant(sender, instance, **kwargs):
+    # a food moved to another restaurant leaves the old restaurant's menu too
+    instance._previous_restaurant_id = None
+    if instance.foodID:
+        instance._previous_restaurant_id = (
+            Food.objects.filter(foodID=instance.foodID).values_list('resID_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+def bump_food_menu(sender, instance, **kwargs):
+    restaurant_ids = {instance.resID_id, getattr(instance, '_previous_restaurant_id', None)}
+    snapshots.bump(restaurant_ids, food_ids=[instance.foodID])
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def bump_menu(sender, instance, **kwargs):
+    snapshots.bump([instance.restaurant_id], food_ids=[instance.food_id])
+
+
+@receiver(post_save, sender=Restaurant)
+def bump_restaurant_menu(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.bump([instance.resID])
+
+
+@receiver(post_save, sender=Category)
+def bump_category_menu(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.bump(Food.objects.filter(catID=instance).values_list('resID_id', flat=True).distinct())
+
+
+# ---- availability engine ----
+
+@receiver(post_save, sender=Menu)
+def menu_availability_saved(sender, instance, **kwargs):
+    availability.menu_changed(instance)
+
+
+@receiver(post_delete, sender=Menu)
+def menu_availability_deleted(sender, instance, **kwargs):
+    availability.menu_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=Inventory)
+def inventory_availability_saved(sender, instance, **kwargs):
+    availability.inventory_changed(instance)
+
+
+@receiver(post_delete, sender=Inventory)
+def inventory_availability_deleted(sender, instance, **kwargs):
+    availability.inventory_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=OperatingHours)
+def hours_availability_saved(sender, instance, **kwargs):
+    availability.hours_changed(instance)
+
+
+@receiver(post_delete, sender=OperatingHours)
+def hours_availability_deleted(sender, instance, **kwargs):
+    availability.hours_changed(instance, deleted=True)
+
+
+# ---- order totals ----
+
+_lines = threading.local()
+
+
+@contextmanager
+def order_line_signals_suspended():
+    """Skip per-order bookkeeping while whole orders are deleted (archiving)."""
+    _lines.suspended = True
+    try:
+        yield
+    finally:
+        _lines.suspended = False
+
+
+@receiver(pre_save, sender=OrderFood)
+def remember_line_order(sender, instance, **kwargs):
+    # a line moved to another order changes the old order's totals too
+    instance._previous_order_id = None
+    if instance.pk:
+        instance._previous_order_id = (
+            OrderFood.objects.filter(pk=instance.pk).values_list('orderID_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=OrderFood)
+@receiver(post_delete, sender=OrderFood)
+def refresh_order_totals(sender, instance, **kwargs):
+    if getattr(_lines, 'suspended', False):
+        return
+    order_totals.refresh_orders({instance.orderID_id, getattr(instance, '_previous_order_id', None)})
+
+
+# ---- restaurant -> order links ----
+
+@receiver(post_save, sender=OrderFood)
+@receiver(post_delete, sender=OrderFood)
+def sync_line_order_links(sender, instance, **kwargs):
+    if getattr(_lines, 'suspended', False):
+        return
+    order_links.sync_order_links({instance.orderID_id, getattr(instance, '_previous_order_id', None)})
+
+
+@receiver(post_save, sender=Order)
+def sync_order_link_status(sender, instance, created, **kwargs):
+    if not created:
+        order_links.order_changed(instance)
+
+
+@receiver(post_save, sender=Food)
+def sync_food_order_links(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_restaurant_id', None)
+    if not created and previous is not None and previous != instance.resID_id:
+        order_links.sync_order_links(order_links.orders_with_food(instance.foodID))
+
+
+# ---- daily revenue rollups ----
+
+@receiver(post_save, sender=OrderFood)
+@receiver(post_delete, sender=OrderFood)
+def roll_up_line_change(sender, instance, **kwargs):
+    if getattr(_lines, 'suspended', False):
+        return
+    rollups.orders_changed({instance.orderID_id, getattr(instance, '_previous_order_id', None)})
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_date(sender, instance, **kwargs):
+    # an order moved to another day changes both days; the status is for the live counters
+    instance._previous_date = instance._previous_status = None
+    if instance.pk:
+        instance._previous_date, instance._previous_status = (
+            Order.objects.filter(pk=instance.pk).values_list('date', 'status').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Order)
+def roll_up_order_change(sender, instance, **kwargs):
+    rollups.days_changed({instance.date, getattr(instance, '_previous_date', None)})
+
+
+@receiver(post_delete, sender=Order)
+def roll_up_order_delete(sender, instance, **kwargs):
+    # archived orders still count, the rollups read the archive too
+    if not getattr(_lines, 'suspended', False):
+        rollups.days_changed({instance.date})
+
+
+# ---- dashboard statistics ----
+
+@receiver(post_save, sender=Order)
+def drop_order_dashboard(sender, instance, **kwargs):
+    dashboard.orders_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Order)
+def drop_deleted_order_dashboard(sender, instance, **kwargs):
+    # the link rows are gone already; the deleted lines name the restaurants
+    dashboard.changed([])
+
+
+@receiver(post_save, sender=OrderFood)
+@receiver(post_delete, sender=OrderFood)
+def drop_line_dashboard(sender, instance, **kwargs):
+    if getattr(_lines, 'suspended', False):
+        return
+    restaurant_ids = set(Food.objects.filter(pk=instance.foodID_id).values_list('resID_id', flat=True))
+    restaurant_ids.update(RestaurantOrder.objects.filter(
+        order_id__in={instance.orderID_id, getattr(instance, '_previous_order_id', None)}
+    ).values_list('restaurant_id', flat=True))
+    dashboard.changed(restaurant_ids)
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+def drop_food_dashboard(sender, instance, **kwargs):
+    dashboard.changed({instance.resID_id, getattr(instance, '_previous_restaurant_id', None)})
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=Inventory)
+@receiver(post_delete, sender=Inventory)
+@receiver(post_save, sender=OperatingHours)
+@receiver(post_delete, sender=OperatingHours)
+def drop_restaurant_dashboard(sender, instance, **kwargs):
+    dashboard.changed([instance.restaurant_id])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def drop_review_dashboard(sender, instance, **kwargs):
+    dashboard.changed([instance.resID_id])
+
+
+@receiver(post_save, sender=Worker)
+@receiver(post_delete, sender=Worker)
+@receiver(post_save, sender=Delivery)
+@receiver(post_delete, sender=Delivery)
+def drop_worker_dashboard(sender, instance, **kwargs):
+    dashboard.shared_changed()
+
+
+# ---- live counters ----
+
+@receiver(post_save, sender=Order)
+def count_order(sender, instance, created, **kwargs):
+    # per restaurant the link rows are counted (order_links)
+    changes = counters.deltas()
+    if created:
+        counters.count_orders(changes, None, instance.status, 1)
+    else:
+        counters.move_orders(changes, None, getattr(instance, '_previous_status', None), instance.status)
+    counters.add(changes)
+
+
+@receiver(pre_delete, sender=Order)
+def uncount_order(sender, instance, **kwargs):
+    # before the link rows go with it; archiving counts its batches itself
+    if getattr(_lines, 'suspended', False):
+        return
+    changes = counters.deltas()
+    counters.count_orders(changes, None, instance.status, -1)
+    for restaurant_id, status in RestaurantOrder.objects.filter(order_id=instance.pk).values_list(
+        'restaurant_id', 'status'
+    ):
+        counters.count_orders(changes, restaurant_id, status, -1)
+    counters.add(changes)
+
+
+@receiver(pre_save, sender=Inventory)
+def remember_inventory_level(sender, instance, **kwargs):
+    instance._previous_level = None
+    if instance.pk:
+        instance._previous_level = Inventory.objects.filter(pk=instance.pk).values_list(
+            'restaurant_id', 'stock_quantity', 'min_stock_level'
+        ).first()
+
+
+@receiver(post_save, sender=Inventory)
+def count_inventory(sender, instance, **kwargs):
+    changes = counters.deltas()
+    previous = getattr(instance, '_previous_level', None)
+    if previous is not None:
+        counters.count_inventory(changes, previous[0], counters.is_low(previous[1], previous[2]), -1)
+    counters.count_inventory(
+        changes, instance.restaurant_id, counters.is_low(instance.stock_quantity, instance.min_stock_level), 1
+    )
+    counters.add(changes)
+
+
+@receiver(post_delete, sender=Inventory)
+def uncount_inventory(sender, instance, **kwargs):
+    changes = counters.deltas()
+    counters.count_inventory(
+        changes, instance.restaurant_id, counters.is_low(instance.stock_quantity, instance.min_stock_level), -1
+    )
+    counters.add(changes)
+
+
+@receiver(pre_save, sender=Delivery)
+def remember_delivery_state(sender, instance, **kwargs):
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = Delivery.objects.filter(pk=instance.pk).values_list('orderID_id', 'status').first()
+
+
+@receiver(post_save, sender=Delivery)
+def count_delivery(sender, instance, **kwargs):
+    previous_order, previous_status = getattr(instance, '_previous_state', None) or (None, None)
+    was_active = previous_status == counters.ACTIVE_DELIVERY
+    is_active = instance.status == counters.ACTIVE_DELIVERY
+    if was_active == is_active and (not is_active or previous_order == instance.orderID_id):
+        return
+    restaurants = counters.order_restaurants({instance.orderID_id, previous_order})
+    changes = counters.deltas()
+    if was_active:
+        counters.count_deliveries(changes, restaurants.get(previous_order, ()), -1)
+    if is_active:
+        counters.count_deliveries(changes, restaurants.get(instance.orderID_id, ()), 1)
+    counters.add(changes)
+
+
+@receiver(pre_delete, sender=Delivery)
+def uncount_delivery(sender, instance, **kwargs):
+    # pre_delete: a deleted order's link rows are still there
+    if getattr(_lines, 'suspended', False) or instance.status != counters.ACTIVE_DELIVERY:
+        return
+    restaurants = counters.order_restaurants([instance.orderID_id])
+    changes = counters.deltas()
+    counters.count_deliveries(changes, restaurants.get(instance.orderID_id, ()), -1)
+    counters.add(changes)
+
+
+# ---- rating aggregates ----
+
+def _review(comment):
+    return comment.resID_id, comment.foodID_id, int(comment.review)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_review(sender, instance, **kwargs):
+    instance._previous_review = None
+    if instance.pk:
+        instance._previous_review = Comment.objects.filter(pk=instance.pk).values_list(
+            'resID_id', 'foodID_id', 'review'
+        ).first()
+
+
+@receiver(post_save, sender=Comment)
+def count_review(sender, instance, **kwargs):
+    ratings.comment_changed(getattr(instance, '_previous_review', None), _review(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_review(sender, instance, **kwargs):
+    ratings.comment_changed(_review(instance), None)
+
+
+# ---- live order feed ----
+
+@receiver(post_save, sender=OrderEvent)
+def publish_order_event(sender, instance, created, **kwargs):
+    if created:
+        events.publish(
+            RestaurantOrder.objects.filter(order_id=instance.order_id).values_list('restaurant_id', flat=True),
+            'order.status',
+            {'orderID': instance.order_id, **order_events.as_dict(instance)},
+        )
@@ -0,0 +1,137 @@
+"""
+Versioned menu snapshots.
+
+Menu responses are rendered once and kept in the cache as JSON bytes under
+a per-restaurant version counter (`scope` is a restaurant id or 'all' for
+the unfiltered menu). Any write to a restaurant's menu bumps its version,
+which makes the old snapshots unreachable and changes the ETag. A request
+whose If-None-Match carries the current ETag gets a 304 straight from the
+cache, without touching the database.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+
+SNAPSHOT_TTL = 60 * 60
+ALL = 'all'
+
+
+def _version_key(scope):
+    return f'menu:version:{scope}'
+
+
+def _food_key(food_id):
+    return f'menu:food:{food_id}'
+
+
+def _new_version():
+    # time based so a version evicted from the cache never comes back
+    return time.time_ns() // 1000
+
+
+def current_version(scope):
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def bump(restaurant_ids, food_ids=()):
+    """Invalidate the menu snapshots of the given restaurants after commit."""
+    scopes = {str(rid) for rid in restaurant_ids if rid is not None}
+    scopes.add(ALL)
+    food_keys = [_food_key(food_id) for food_id in food_ids]
+
+    def apply():
+        _bump(scopes)
+        if food_keys:
+            cache.delete_many(food_keys)
+
+    transaction.on_commit(apply)
+
+
+def _not_modified(request, etag):
+    candidates = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return etag in [c.strip() for c in candidates.split(',')] or candidates.strip() == '*'
+
+
+def _response(body, etag):
+    response = HttpResponse(body, content_type='application/json') if body is not None else HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def variant_of(params, exclude=()):
+    """Short stable hash of the query parameters that shape a response."""
+    items = sorted((k, v) for k in params if k not in exclude for v in params.getlist(k))
+    return hashlib.blake2b(urlencode(items).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def menu_list_response(request, scope, variant, build):
+    """Serve a menu listing snapshot; `build()` returns the response data."""
+    version = current_version(scope)
+    etag = f'"menu-{scope}-{version}-{variant}"'
+    if _not_modified(request, etag):
+        return _response(None, etag)
+
+    cache_key = f'menu:snapshot:{scope}:{version}:{variant}'
+    body = cache.get(cache_key)
+    if body is None:
+        body = JSONRenderer().render(build())
+        cache.set(cache_key, body, SNAPSHOT_TTL)
+    return _response(body, etag)
+
+
+def menu_detail_response(request, food_id, build, variant=''):
+    """
+    Serve a single menu item snapshot.
+
+    `build()` returns `(restaurant_id, data)` or `(None, response)` when
+    the item cannot be rendered (e.g. 404); such responses are not cached.
+    `variant` tells apart differently shaped responses (e.g. ?fields=).
+    """
+    suffix = f'-{variant}' if variant else ''
+    restaurant_id = cache.get(_food_key(food_id))
+    if restaurant_id is not None:
+        version = current_version(str(restaurant_id))
+        etag = f'"food-{food_id}-{restaurant_id}-{version}{suffix}"'
+        if _not_modified(request, etag):
+            return _response(None, etag)
+        body = cache.get(f'menu:snapshot:food:{food_id}:{version}{suffix}')
+        if body is not None:
+            return _response(body, etag)
+
+    # any menu write bumps ALL; if one lands while building, skip caching
+    guard = current_version(ALL)
+    restaurant_id, data = build()
+    if restaurant_id is None:
+        return data
+
+    version = current_version(str(restaurant_id))
+    etag = f'"food-{food_id}-{restaurant_id}-{version}{suffix}"'
+    body = JSONRenderer().render(data)
+    if current_version(ALL) != guard:
+        return HttpResponse(body, content_type='application/json')
+    cache.set_many({
+        _food_key(food_id): restaurant_id,
+        f'menu:snapshot:food:{food_id}:{version}{suffix}': body,
+    }, SNAPSHOT_TTL)
+    return _response(body, etag)
@@ -1,3 +1,1885 @@
-from django.test import TestCase
+import asyncio
+import base64
+import importlib
+import io
+import itertools
+import json
+import re
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import request_finished
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.query import QuerySet
+from django.forms import modelform_factory
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api import db as api_db
+from api.models import (
+    Cart, CartFood, Category, Comment, Coupon, Delivery, Food, Order, OrderFood, Restaurant, RestaurantType, User,
+    Worker,
+)
+from common.serialization import RowTemplate
+from restaurant_web import (
+    analytics, archive, availability, checkout, columnar, counters, dashboard, events, menu_io, order_events,
+    order_links, order_totals, order_workflow, ratings, report_jobs, reports, rollups, top_sellers,
+)
+from restaurant_web import search as menu_search
+from restaurant_web.models import (
+    ArchivedOrder, DailyRevenue, FoodRating, Inventory, Menu, OperatingHours, OrderEvent, ReportJob,
+    RestaurantOrder, RestaurantRating,
+)
+from restaurant_web import views
+
+
+def make_restaurants(n=2):
+    kind = RestaurantType.objects.create(name='fast')
+    return [
+        Restaurant.objects.create(resName=f'Restaurant {i}', location='UB', cateID=kind, branch=str(i), phone=i)
+        for i in range(1, n + 1)
+    ]
+
+
+def make_orders(foods, n, statuses=('pending',), day=None, user=None):
+    """`n` orders of one user, cycling through `statuses`, each with a line of one of `foods`."""
+    user = user or User.objects.create(userName='bat', email='bat@example.com', phone=1, password='x')
+    orders = []
+    for i in range(n):
+        order = Order.objects.create(
+            userID=user, date=day or date.today(), location='UB', status=statuses[i % len(statuses)],
+        )
+        food = foods[i % len(foods)]
+        OrderFood.objects.create(orderID=order, foodID=food, stock=1 + i % 3, price=food.price)
+        orders.append(order)
+    return orders
+
+
+class MenuIOTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant, = make_restaurants(1)
+        cls.category = Category.objects.create(catName='Main')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def row(self, i):
+        return {'foodName': f'Food {i}', 'resID': self.restaurant.pk, 'catID': self.category.pk, 'price': 100 + i}
+
+    def test_json_array_is_read_item_by_item(self):
+        rows = [self.row(i) for i in range(50)]
+        text = ' [\n' + ',\n'.join(json.dumps(row, ensure_ascii=False) for row in rows) + '\n] '
+        # blocks smaller than an item force decoding across reads
+        self.assertEqual(list(menu_io._json_array(io.StringIO(text[text.index('[') + 1:]), block=7)), rows)
+        self.assertEqual(list(menu_io.read_rows(io.StringIO(text), 'json')), rows)
+        self.assertEqual(list(menu_io.read_rows(io.StringIO('[]'), 'json')), [])
+        self.assertEqual(list(menu_io.read_rows(io.StringIO('[1, 2.5, true]'), 'json')), [1, 2.5, True])
+
+    def test_json_array_is_not_read_whole(self):
+        stream = io.StringIO('[' + ','.join(json.dumps(self.row(i)) for i in range(5000)) + ']')
+        rows = menu_io.read_rows(stream, 'json')
+        next(rows)
+        self.assertLess(stream.tell(), 2 * menu_io.READ_SIZE)
+
+    def test_malformed_json_array(self):
+        for text in ('[{"a": 1}', '[{"a": 1} {"b": 2}]', '[{"a": 1},]', '[{"a": }]', '[,]'):
+            with self.subTest(text=text), self.assertRaises(menu_io.ImportFormatError):
+                list(menu_io.read_rows(io.StringIO(text), 'json'))
+
+    def test_non_utf8_upload(self):
+        body = 'foodName,resID,catID,price\nХуушуур,1,1,100\n'.encode('cp1251')
+        upload = SimpleUploadedFile('menu.csv', body, content_type='text/csv')
+        response = self.client.post('/restaurant/menu/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.json()['error'])
+
+    def test_import_json_array_upload(self):
+        body = json.dumps([self.row(i) for i in range(3)]).encode()
+        upload = SimpleUploadedFile('menu.json', body, content_type='application/json')
+        response = self.client.post('/restaurant/menu/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Food.objects.count(), 3)
+
+    def test_export_restaurant_id(self):
+        response = self.client.get('/restaurant/menu/export/', {'fmt': 'json', 'restaurant_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/restaurant/menu/export/', {'fmt': 'json', 'restaurant_id': self.restaurant.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+
+class AvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(3)
+        category = Category.objects.create(catName='Main')
+        cls.foods = []
+        for i in range(12):
+            restaurant = cls.restaurants[i % 3]
+            food = Food.objects.create(foodName=f'Food {i}', resID=restaurant, catID=category, price=100)
+            cls.foods.append(food)
+            if i % 4 != 3:
+                Menu.objects.create(food=food, restaurant=restaurant, category=category, is_available=i % 5 != 0)
+            if i % 3 == 1:
+                Inventory.objects.create(food=food, restaurant=restaurant, stock_quantity=i % 2, min_stock_level=5)
+        # Monday 12:00: restaurant 1 is closed, 2 open past midnight, 3 has no hours
+        OperatingHours.objects.create(
+            restaurant=cls.restaurants[0], day_of_week='monday', open_time=time(13), close_time=time(22))
+        OperatingHours.objects.create(
+            restaurant=cls.restaurants[1], day_of_week='monday', open_time=time(10), close_time=time(2))
+        cls.at = timezone.make_aware(datetime(2026, 10, 19, 12))
+
+    def setUp(self):
+        cache.clear()
+
+    def by_state(self, available, at):
+        ids = set()
+        for restaurant in self.restaurants:
+            ids |= set(availability.filter_available(
+                Food.objects.all(), available, restaurant_id=restaurant.pk, at=at
+            ).filter(resID=restaurant).values_list('pk', flat=True))
+        return ids
+
+    def test_all_restaurants_match_states(self):
+        for at in (self.at, self.at.replace(hour=1), self.at.replace(hour=3), self.at.replace(hour=21)):
+            for available in (True, False):
+                with self.subTest(at=at, available=available):
+                    expected = self.by_state(available, at)
+                    with self.assertNumQueries(1):
+                        got = set(availability.filter_available(
+                            Food.objects.all(), available, at=at
+                        ).values_list('pk', flat=True))
+                    self.assertEqual(got, expected)
+                    for food in self.foods:
+                        self.assertEqual(availability.is_available(food.pk, at), (food.pk in got) == available)
+
+    def test_writes_invalidate_states(self):
+        food = self.foods[2]
+        restaurant_id = food.resID_id
+        self.assertTrue(availability.is_available(food.pk, self.at, restaurant_id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu = Menu.objects.get(food=food)
+            menu.is_available = False
+            menu.save()
+        self.assertFalse(availability.is_available(food.pk, self.at, restaurant_id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu.is_available = True
+            menu.save()
+            Inventory.objects.create(food=food, restaurant_id=restaurant_id, stock_quantity=0)
+        self.assertFalse(availability.is_available(food.pk, self.at, restaurant_id))
+
+    def test_state_built_before_a_write_is_not_served(self):
+        food = self.foods[2]
+        restaurant_id = food.resID_id
+        versions = availability._versions([restaurant_id])
+        with self.captureOnCommitCallbacks(execute=True):
+            Menu.objects.filter(food=food).update(is_available=False)
+            availability.invalidate([restaurant_id])
+        # a reader that looked up the version before the write stores what it read
+        stale = availability._empty_state()
+        cache.set(availability._key(restaurant_id, versions[restaurant_id]), stale)
+        self.assertIn(food.pk, availability.get_state(restaurant_id)['disabled'])
+
+
+class MenuFlagTests(TestCase):
+
+    def test_first_menu_entry_in_meta_ordering_decides(self):
+        restaurant, = make_restaurants(1)
+        low, high = Category.objects.create(catName='A'), Category.objects.create(catName='B')
+        foods = [Food.objects.create(foodName=f'Food {i}', resID=restaurant, catID=low, price=1) for i in range(3)]
+        Menu.objects.create(food=foods[0], restaurant=restaurant, category=high, is_available=True)
+        Menu.objects.create(food=foods[0], restaurant=restaurant, category=low, is_available=False)
+        Menu.objects.create(food=foods[1], restaurant=restaurant, category=low, is_available=True)
+        Menu.objects.create(food=foods[1], restaurant=restaurant, category=high, is_available=False)
+
+        flags = menu_io.menu_flags([food.pk for food in foods])
+        for food in foods:
+            first = Menu.objects.filter(food=food).values_list('is_available', flat=True).first()
+            self.assertEqual(flags.get(food.pk), first)
+        self.assertEqual(flags, {foods[0].pk: False, foods[1].pk: True})
+
+        exported = {row[0]: row[-1] for row in menu_io.export_queryset(restaurant.pk)}
+        self.assertEqual(exported, {food.pk: flags.get(food.pk) for food in foods})
+        for food in foods:
+            detail = APIClient().get(f'/restaurant/menu/{food.pk}/').json()
+            self.assertEqual(detail['is_available'], flags.get(food.pk, True))
+
+
+class OrderWorkflowTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        restaurant, = make_restaurants(1)
+        category = Category.objects.create(catName='Main')
+        food = Food.objects.create(foodName='Food', resID=restaurant, catID=category, price=100)
+        cls.orders = make_orders([food], 4)
+
+    def test_transition_checks_the_expected_status(self):
+        order = self.orders[0]
+        order_workflow.transition(order.pk, 'approved')
+        cases = [
+            # (order id, target, expected) -> (result, old status)
+            ((987654, 'approved', 'approved'), (order_workflow.NOT_FOUND, None)),
+            ((987654, 'delivered', 'pending'), (order_workflow.NOT_FOUND, None)),
+            ((987654, 'approved', 'pending'), (order_workflow.NOT_FOUND, None)),
+            ((order.pk, 'approved', 'approved'), (order_workflow.UNCHANGED, 'approved')),
+            ((order.pk, 'delivered', 'approved'), (order_workflow.INVALID, 'approved')),
+            ((order.pk, 'pending', 'pending'), (order_workflow.CONFLICT, 'approved')),
+            ((order.pk, 'delivered', 'pending'), (order_workflow.CONFLICT, 'approved')),
+            ((order.pk, 'approved', 'pending'), (order_workflow.CONFLICT, 'approved')),
+            ((order.pk, 'preparing', 'approved'), (order_workflow.UPDATED, 'approved')),
+        ]
+        for (order_id, target, expected), (result, old_status) in cases:
+            with self.subTest(order_id=order_id, target=target, expected=expected):
+                outcome = order_workflow.transition(order_id, target, expected=expected)
+                self.assertEqual((outcome.result, outcome.old_status), (result, old_status))
+
+        response = APIClient().put(
+            '/restaurant/orders/987654/', {'status': 'approved', 'expected_status': 'approved'}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_events_are_numbered_per_order_under_the_order_lock(self):
+        ids = [order.pk for order in self.orders[:2]]
+        with CaptureQueriesContext(connection) as queries:
+            order_events.append(ids[::-1], OrderEvent.NOTE, 'first')
+        # the order rows are read (locked on databases that can) before the max seq
+        statements = [q['sql'] for q in queries.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertIn('FROM "tbl_order"', statements[0])
+        order_events.append(ids[:1], OrderEvent.NOTE, 'second')
+        self.assertEqual(
+            list(OrderEvent.objects.order_by('order_id', 'seq').values_list('order_id', 'seq')),
+            [(ids[0], 1), (ids[0], 2), (ids[1], 1)],
+        )
+
+    def test_bulk_reports_only_the_orders_it_moved(self):
+        ids = [order.pk for order in self.orders]
+        set_status = order_workflow._set_status
+
+        def racing(queryset, target):
+            # another writer approves the first order between the read and the UPDATE
+            Order.objects.filter(pk=ids[0]).update(status=target)
+            return set_status(queryset, target)
+
+        with mock.patch.object(order_workflow, '_set_status', racing):
+            result = order_workflow.bulk_transition(ids, 'approved')
+
+        self.assertEqual(result['updated'], 3)
+        self.assertEqual([r['result'] for r in result['results']], ['conflict', 'updated', 'updated', 'updated'])
+        self.assertEqual(OrderEvent.objects.filter(order_id=ids[0]).count(), 0)
+        self.assertEqual(OrderEvent.objects.filter(order_id__in=ids[1:]).count(), 3)
+
+
+class CheckoutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        restaurant, = make_restaurants(1)
+        category = Category.objects.create(catName='Main')
+        cls.food = Food.objects.create(foodName='Food', resID=restaurant, catID=category, price=100)
+        cls.inventory = Inventory.objects.create(food=cls.food, restaurant=restaurant, stock_quantity=10)
+        cls.user = User.objects.create(userName='bat', email='bat@example.com', phone=1, password='x')
+
+    def setUp(self):
+        cache.clear()
+
+    def fill(self, *quantities):
+        for quantity in quantities:
+            CartFood.objects.create(cartID=Cart.objects.create(userID=self.user), foodID=self.food, stock=quantity)
+
+    def test_lines_of_one_food_in_several_carts_are_summed(self):
+        self.fill(3, 4)
+        result = checkout.checkout(self.user.pk, 'home')
+        self.assertEqual(sum(item['quantity'] for item in result.data['items']), 7)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.stock_quantity, 3)
+
+    def test_summed_lines_must_fit_the_stock(self):
+        Inventory.objects.filter(pk=self.inventory.pk).update(stock_quantity=6)
+        self.fill(3, 4)
+        with self.assertRaises(checkout.CheckoutError):
+            checkout.checkout(self.user.pk, 'home')
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.stock_quantity, 6)
+        self.assertFalse(Order.objects.exists())
+
+
+def python_revenue_report(date_from=None, date_to=None, restaurant_id=None, group_by='day'):
+    """The revenue report as RevenueReportView computed it in Python, order by order."""
+    qs = Order.objects.exclude(status='cancelled')
+    if date_from:
+        qs = qs.filter(date__gte=date_from)
+    if date_to:
+        qs = qs.filter(date__lte=date_to)
+    if restaurant_id:
+        qs = order_links.for_restaurant(qs, restaurant_id)
+
+    order_restaurants = {}
+    if group_by == 'restaurant':
+        for order_id, rid in RestaurantOrder.objects.filter(order__in=qs.values('orderID')).values_list(
+            'order_id', 'restaurant_id'
+        ):
+            order_restaurants.setdefault(order_id, set()).add(rid)
+    rows = [qs.values_list('orderID', 'date', 'total_price')]
+
+    if archive.needs_archive(date_from):
+        archived = ArchivedOrder.objects.exclude(status='cancelled')
+        if date_from:
+            archived = archived.filter(date__gte=date_from)
+        if date_to:
+            archived = archived.filter(date__lte=date_to)
+        if restaurant_id:
+            archived = archive.for_restaurant(archived, restaurant_id)
+        if group_by == 'restaurant':
+            order_restaurants.update(archive.order_restaurants(archived))
+        rows.append(archived.values_list('orderID', 'date', 'total_price'))
+
+    total_revenue = 0
+    total_orders = 0
+    by_group = {}
+    for order_id, order_date, order_total in itertools.chain.from_iterable(rows):
+        total_revenue += order_total
+        total_orders += 1
+        if group_by == 'month':
+            keys = [order_date.strftime('%Y-%m')]
+        elif group_by == 'restaurant':
+            keys = [f'restaurant_{rid}' for rid in order_restaurants.get(order_id, ())]
+        else:
+            keys = [order_date.strftime('%Y-%m-%d')]
+        for key in keys:
+            group = by_group.setdefault(key, {'revenue': 0, 'orders': 0})
+            group['revenue'] += order_total
+            group['orders'] += 1
+
+    return {
+        'total_revenue': total_revenue,
+        'total_orders': total_orders,
+        'avg_order': round(total_revenue / total_orders, 2) if total_orders else 0,
+        'groups': [
+            {
+                'group': key,
+                'revenue': val['revenue'],
+                'orders': val['orders'],
+                'avg_order': round(val['revenue'] / val['orders'], 2) if val['orders'] else 0,
+            }
+            for key, val in sorted(by_group.items())
+        ],
+    }
+
+
+class OrderTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        restaurant, = make_restaurants(1)
+        category = Category.objects.create(catName='Main')
+        cls.foods = [Food.objects.create(foodName=f'Food {i}', resID=restaurant, catID=category, price=100 * (i + 1))
+                     for i in range(3)]
+        cls.orders = make_orders(cls.foods, 4)
+
+    def setUp(self):
+        cache.clear()
+
+    def totals(self, order):
+        return tuple(Order.objects.filter(pk=order.pk).values_list('total_price', 'items_count').get())
+
+    def recount(self, order):
+        lines = OrderFood.objects.filter(orderID=order)
+        return sum(line.price * line.stock for line in lines), lines.count()
+
+    def test_line_writes_keep_the_totals(self):
+        first, second = self.orders[:2]
+        line = OrderFood.objects.create(orderID=first, foodID=self.foods[2], stock=2, price=300)
+        self.assertEqual(self.totals(first), self.recount(first))
+        line.stock = 5
+        line.save()
+        self.assertEqual(self.totals(first), self.recount(first))
+        # a line moved to another order updates both
+        line.orderID = second
+        line.save()
+        self.assertEqual(self.totals(first), self.recount(first))
+        self.assertEqual(self.totals(second), self.recount(second))
+        line.delete()
+        self.assertEqual(self.totals(second), self.recount(second))
+        self.assertFalse(order_totals.drifted().exists())
+
+    def test_stale_order_save_keeps_the_totals(self):
+        order = Order.objects.get(pk=self.orders[0].pk)
+        OrderFood.objects.create(orderID=order, foodID=self.foods[1], stock=3, price=200)
+        order.status = 'approved'
+        order.save()
+        self.assertEqual(self.totals(order), self.recount(order))
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'approved')
+        # named explicitly they are still written
+        order.total_price = 1
+        order.save(update_fields=['total_price'])
+        self.assertEqual(self.totals(order)[0], 1)
+
+    def test_totals_are_not_form_fields(self):
+        form = modelform_factory(Order, fields='__all__')()
+        self.assertNotIn('total_price', form.fields)
+        self.assertNotIn('items_count', form.fields)
+
+    def test_reconcile_repairs_drift(self):
+        # writes that skip the signals: a queryset update and a raw delete of lines, a direct total overwrite
+        OrderFood.objects.filter(orderID=self.orders[0]).update(stock=9)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM "{OrderFood._meta.db_table}" WHERE "orderID_id" = %s', [self.orders[1].pk])
+        Order.objects.filter(pk=self.orders[2].pk).update(items_count=7)
+        drifted = {self.orders[0].pk, self.orders[1].pk, self.orders[2].pk}
+        self.assertEqual(set(order_totals.drifted().values_list('pk', flat=True)), drifted)
+
+        out = io.StringIO()
+        call_command('reconcile_order_totals', '--dry-run', stdout=out)
+        self.assertIn('Checked 4 orders. Found 3 drifted.', out.getvalue())
+        self.assertEqual(order_totals.drifted().count(), 3)
+
+        out = io.StringIO()
+        call_command('reconcile_order_totals', '--chunk-size', '3', stdout=out)
+        self.assertIn('Checked 4 orders. Repaired 3 drifted.', out.getvalue())
+        self.assertFalse(order_totals.drifted().exists())
+        for order in self.orders:
+            self.assertEqual(self.totals(order), self.recount(order))
+        self.assertEqual(self.totals(self.orders[1]), (0, 0))
+        self.assertEqual(order_totals.reconcile(), (4, 0))
+
+
+class OrderLinkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        category = Category.objects.create(catName='Main')
+        cls.foods = [Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=category, price=100)
+                     for i in range(4)]
+        # restaurant 1's food only, so each order starts on one restaurant
+        cls.orders = make_orders(cls.foods[::2], 9, statuses=('pending', 'approved', 'delivered'))
+        for i, order in enumerate(cls.orders):
+            Order.objects.filter(pk=order.pk).update(date=date(2026, 1, 1) + timedelta(days=i // 2))
+        order_links.sync_order_links([order.pk for order in cls.orders])
+        for order in cls.orders[::3]:
+            OrderFood.objects.create(orderID=order, foodID=cls.foods[1], stock=1, price=100)
+
+    def setUp(self):
+        cache.clear()
+
+    def links(self):
+        return set(RestaurantOrder.objects.values_list('order_id', 'restaurant_id', 'date', 'status'))
+
+    def expected(self):
+        return set(
+            OrderFood.objects.values_list('orderID_id', 'foodID__resID_id', 'orderID__date', 'orderID__status')
+        )
+
+    def test_line_writes_sync_the_links(self):
+        order = self.orders[1]
+        self.assertEqual({r for o, r, _, _ in self.links() if o == order.pk}, {self.restaurants[0].pk})
+        line = OrderFood.objects.create(orderID=order, foodID=self.foods[3], stock=1, price=100)
+        self.assertEqual({r for o, r, _, _ in self.links() if o == order.pk}, {r.pk for r in self.restaurants})
+        line.delete()
+        self.assertEqual({r for o, r, _, _ in self.links() if o == order.pk}, {self.restaurants[0].pk})
+        OrderFood.objects.get(orderID=order).delete()
+        self.assertFalse(RestaurantOrder.objects.filter(order=order).exists())
+        self.assertEqual(self.links(), self.expected())
+
+    def test_order_changes_are_copied(self):
+        order = Order.objects.get(pk=self.orders[0].pk)
+        order.status, order.date = 'cancelled', date(2026, 3, 1)
+        order.save()
+        self.assertEqual(set(RestaurantOrder.objects.filter(order=order).values_list('status', 'date')),
+                         {('cancelled', date(2026, 3, 1))})
+        self.assertEqual(self.links(), self.expected())
+
+    def test_food_moving_restaurants_moves_its_orders(self):
+        food = self.foods[1]
+        before = set(RestaurantOrder.objects.filter(restaurant=self.restaurants[1]).values_list('order_id', flat=True))
+        self.assertEqual(before, {order.pk for order in self.orders[::3]})
+        food.resID = self.restaurants[0]
+        food.save()
+        self.assertFalse(RestaurantOrder.objects.filter(restaurant=self.restaurants[1]).exists())
+        self.assertEqual(self.links(), self.expected())
+        food.resID = self.restaurants[1]
+        food.save()
+        self.assertEqual(self.links(), self.expected())
+
+    def test_migration_backfills_existing_orders(self):
+        migration = importlib.import_module('restaurant_web.migrations.0004_restaurant_order')
+        RestaurantOrder.objects.all().delete()
+        migration.link_orders(django_apps, None)
+        self.assertEqual(self.links(), self.expected())
+
+    def test_restaurant_listing_filters_and_sorts_on_the_links(self):
+        restaurant = self.restaurants[0]
+        for params in ({}, {'status': 'approved'}, {'date_from': '2026-01-02', 'date_to': '2026-01-04'},
+                       {'status': 'pending', 'date_from': '2026-01-03'}):
+            with self.subTest(**params):
+                orders = order_links.for_restaurant(Order.objects.all(), restaurant.pk)
+                if 'status' in params:
+                    orders = orders.filter(status=params['status'])
+                if 'date_from' in params:
+                    orders = orders.filter(date__gte=params['date_from'])
+                if 'date_to' in params:
+                    orders = orders.filter(date__lte=params['date_to'])
+                expected = list(orders.order_by('-date', '-orderID').values_list('orderID', flat=True))
+                client, got = APIClient(), []
+                body = client.get('/restaurant/orders/', {'restaurant_id': restaurant.pk, 'limit': 2, **params}).json()
+                got.extend(row['orderID'] for row in body['results'])
+                while body['next']:
+                    body = client.get('/restaurant/orders/', {
+                        'restaurant_id': restaurant.pk, 'limit': 2, 'cursor': body['next'], **params,
+                    }).json()
+                    got.extend(row['orderID'] for row in body['results'])
+                self.assertEqual(got, expected)
+                self.assertEqual(body['count'], len(expected))
+
+        with CaptureQueriesContext(connection) as queries:
+            APIClient().get('/restaurant/orders/', {'restaurant_id': restaurant.pk, 'status': 'approved', 'limit': 2})
+        sql = next(q['sql'] for q in queries if 'LIMIT' in q['sql'])
+        self.assertIn('"tbl_restaurant_order"."status" = ', sql)
+        self.assertNotIn('"tbl_order"."status" = ', sql)
+        self.assertEqual(sql.count('JOIN "tbl_restaurant_order"'), 1)
+
+
+class OrderEventFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        category = Category.objects.create(catName='Main')
+        cls.foods = [Food.objects.create(foodName=f'Food {i}', resID=restaurant, catID=category, price=100)
+                     for i, restaurant in enumerate(cls.restaurants)]
+
+    def setUp(self):
+        cache.clear()
+        # a fresh in-process backend on the module hub for every test
+        self.backend = events.LocalBackend(events.hub)
+        patcher = mock.patch.object(events, '_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hub_delivers_to_the_restaurants_subscriptions_only(self):
+        hub = events.EventHub()
+        backend = events.LocalBackend(hub)
+
+        async def run():
+            first, second = hub.subscribe(1), hub.subscribe(2)
+            backend.publish(1, 'order.created', {'orderID': 7})
+            # publishing from another thread (a request thread) is delivered too
+            thread = threading.Thread(target=backend.publish, args=(1, 'order.status', {'orderID': 7}))
+            thread.start()
+            thread.join()
+            got = [await asyncio.wait_for(first.get(), 1) for _ in range(2)]
+            await asyncio.sleep(0)
+            self.assertTrue(second.queue.empty())
+            hub.unsubscribe(first)
+            backend.publish(1, 'order.status', {'orderID': 8})
+            await asyncio.sleep(0)
+            self.assertTrue(first.queue.empty())
+            hub.unsubscribe(second)
+            return got
+
+        got = asyncio.run(run())
+        self.assertEqual([(e['type'], e['restaurant_id'], e['data']) for e in got], [
+            ('order.created', 1, {'orderID': 7}), ('order.status', 1, {'orderID': 7}),
+        ])
+        self.assertLess(got[0]['id'], got[1]['id'])
+        self.assertEqual(hub._subscriptions, {})
+        # the backlog resumes after a given id, per restaurant
+        self.assertEqual([e['data'] for e in backend.since(1, got[0]['id'])], [{'orderID': 7}, {'orderID': 8}])
+        self.assertEqual(backend.since(2, 0), [])
+
+    def test_slow_subscription_overflows_instead_of_blocking(self):
+        hub = events.EventHub()
+        backend = events.LocalBackend(hub)
+
+        async def run():
+            with mock.patch.object(events, 'QUEUE_SIZE', 2):
+                subscription = hub.subscribe(1)
+            for i in range(3):
+                backend.publish(1, 'order.status', {'orderID': i})
+            await asyncio.sleep(0)
+            hub.unsubscribe(subscription)
+            return subscription
+
+        subscription = asyncio.run(run())
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(subscription.queue.qsize(), 2)
+
+    def test_new_lines_publish_to_their_restaurants_after_commit(self):
+        user = User.objects.create(userName='bat', email='bat@example.com', phone=1, password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(userID=user, date=date.today(), location='UB', status='pending')
+            OrderFood.objects.create(orderID=order, foodID=self.foods[1], stock=1, price=100)
+            self.assertEqual(self.backend.since(self.restaurants[1].pk, 0), [])
+        created = self.backend.since(self.restaurants[1].pk, 0)
+        self.assertEqual([(e['type'], e['data']['orderID']) for e in created], [('order.created', order.pk)])
+        self.assertEqual(self.backend.since(self.restaurants[0].pk, 0), [])
+
+    def feed(self, restaurant_id, **params):
+        request = AsyncRequestFactory().get('/restaurant/orders/feed/', {'restaurant_id': restaurant_id, **params})
+        return views.order_feed(request)
+
+    def test_feed_streams_backlog_then_live_events_of_its_restaurant(self):
+        self.backend.publish(1, 'order.created', {'orderID': 1})
+        old, = self.backend.since(1, 0)
+        self.backend.publish(1, 'order.status', {'orderID': 1, 'status': 'approved'})
+
+        async def run():
+            response = await self.feed(1, last_event_id=old['id'])
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            chunks = aiter(response.streaming_content)
+            received = [await anext(chunks), await anext(chunks)]
+            # another restaurant's event is not sent, the next one of this restaurant is
+            self.backend.publish(2, 'order.created', {'orderID': 2})
+            self.backend.publish(1, 'order.created', {'orderID': 3})
+            received.append(await asyncio.wait_for(anext(chunks), 1))
+            await chunks.aclose()
+            return [chunk.decode('utf-8') for chunk in received]
+
+        retry, backlog, live = asyncio.run(run())
+        self.assertEqual(retry, 'retry: 3000\n\n')
+        lines = backlog.splitlines()
+        self.assertEqual(lines[:2], [f'id: {old["id"] + 1}', 'event: order.status'])
+        self.assertEqual(json.loads(lines[2][len('data: '):]), {'type': 'order.status', 'orderID': 1, 'status': 'approved'})
+        self.assertIn('"orderID": 3', live)
+        # the stream unsubscribed when it was closed
+        self.assertEqual(events.hub._subscriptions, {})
+
+    def test_feed_rejects_bad_requests(self):
+        response = asyncio.run(self.feed('abc'))
+        self.assertEqual(response.status_code, 400)
+        response = asyncio.run(self.feed(1, token='not-a-jwt'))
+        self.assertEqual(response.status_code, 401)
+        # a WSGI request would buffer the endless stream
+        self.assertEqual(self.client.get('/restaurant/orders/feed/', {'restaurant_id': 1}).status_code, 501)
+
+
+class RevenueReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        category = Category.objects.create(catName='Main')
+        foods = [
+            Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=category, price=100 + i)
+            for i in range(6)
+        ]
+        cls.today = date.today()
+        orders = make_orders(foods, 40, statuses=('pending', 'delivered', 'cancelled', 'approved', None, 'delivered'))
+        for i, order in enumerate(orders):
+            Order.objects.filter(pk=order.pk).update(date=cls.today - timedelta(days=(i * 3) % 50))
+        # an order from both restaurants, and one without lines
+        both = orders[1]
+        OrderFood.objects.create(orderID=both, foodID=foods[2], stock=2, price=70)
+        Order.objects.create(
+            userID=both.userID, date=cls.today - timedelta(days=3), location='UB', status='approved',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def params(self):
+        day = lambda n: str(self.today - timedelta(days=n))
+        first, second = (str(r.pk) for r in self.restaurants)
+        return [
+            {}, {'group_by': 'month'}, {'group_by': 'restaurant'}, {'restaurant_id': first},
+            {'restaurant_id': second, 'group_by': 'restaurant'}, {'date_from': day(5), 'date_to': day(1)},
+            {'date_from': day(5), 'group_by': 'restaurant'}, {'date_to': day(6), 'group_by': 'month'},
+            {'date_from': day(0), 'date_to': day(0)}, {'restaurant_id': first, 'date_from': day(50), 'group_by': 'month'},
+        ]
+
+    def assert_matches_python(self):
+        client = APIClient()
+        for params in self.params():
+            with self.subTest(**params):
+                expected = python_revenue_report(**params)
+                self.assertEqual(reports.revenue_report(**params), expected)
+                self.assertEqual(client.get('/restaurant/revenue-report/', params).json(), json.loads(
+                    json.dumps(expected, cls=DjangoJSONEncoder)
+                ))
+        # an unknown grouping groups by day, as before
+        self.assertEqual(
+            client.get('/restaurant/revenue-report/', {'group_by': 'bogus'}).json()['groups'],
+            python_revenue_report()['groups'],
+        )
+
+    def test_matches_python_report(self):
+        self.assert_matches_python()
+
+    def test_matches_python_report_across_the_archive(self):
+        call_command('archive_orders', '--older-than-days=3', stdout=io.StringIO())
+        self.assertTrue(ArchivedOrder.objects.exists())
+        self.assert_matches_python()
+
+
+class RevenueRollupTests(RevenueReportTests):
+    """The revenue report tests again, with the days until ten days ago rolled up."""
+
+    def setUp(self):
+        super().setUp()
+        call_command('rebuild_revenue_rollups', '--to', str(self.today - timedelta(days=10)), stdout=io.StringIO())
+
+    def test_reads_build_nothing(self):
+        rows = DailyRevenue.objects.count()
+        with self.assertNumQueries(1):
+            self.assertEqual(rollups.rolled_through(), self.today - timedelta(days=10))
+        reports.revenue_report(group_by='restaurant')
+        self.assertEqual(DailyRevenue.objects.count(), rows)
+
+    def test_catch_up(self):
+        call_command('rebuild_revenue_rollups', '--catch-up', stdout=io.StringIO())
+        self.assertEqual(rollups.rolled_through(), self.today - timedelta(days=1))
+        self.assert_matches_python()
+
+    def test_late_changes_are_rolled_up(self):
+        order = Order.objects.filter(date__lt=self.today - timedelta(days=10)).exclude(status='cancelled').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'cancelled'
+            order.save()
+            OrderFood.objects.filter(orderID__date__lt=self.today - timedelta(days=10)).first().delete()
+        self.assert_matches_python()
+
+    def test_rebuild_reads_under_the_day_locks(self):
+        days = [self.today - timedelta(days=n) for n in (12, 15, 60)]
+        locked = dict(DailyRevenue.objects.filter(restaurant__isnull=True, day__in=days).values_list('day', 'pk'))
+        reads = []
+
+        def inside(func):
+            def read(*args):
+                # the all-orders row of every day exists (and is locked) before the orders are read
+                reads.append((len(connection.savepoint_ids) - depth,
+                              DailyRevenue.objects.filter(restaurant__isnull=True, day__in=days).count()))
+                return func(*args)
+            return read
+
+        depth = len(connection.savepoint_ids)
+        with mock.patch.object(rollups, '_compute', inside(rollups._compute)), \
+                mock.patch.object(rollups, 'food_sales', inside(rollups.food_sales)), \
+                CaptureQueriesContext(connection) as queries:
+            rollups.rebuild_days(days)
+        # one transaction (a savepoint here) deeper than the caller
+        self.assertEqual(reads, [(1, 3), (1, 3)])
+        if connection.features.has_select_for_update:
+            self.assertTrue(any('FOR UPDATE' in query['sql'] for query in queries))
+        # existing day rows are updated in place, a new one (60 days back) is added
+        rows = dict(DailyRevenue.objects.filter(restaurant__isnull=True, day__in=days).values_list('day', 'pk'))
+        self.assertEqual({day: rows[day] for day in locked}, locked)
+        self.assertEqual(len(rows), 3)
+        self.assert_matches_python()
+
+
+def python_top_sellers(date_from=None, date_to=None, restaurant_id=None, limit=top_sellers.DEFAULT_LIMIT):
+    """The top sellers report summed and ranked in Python, line by line."""
+    (start, end), (previous_start, previous_end) = top_sellers.periods(date_from, date_to)
+    sold = {}
+    for line in OrderFood.objects.select_related('orderID', 'foodID__catID'):
+        order, food = line.orderID, line.foodID
+        if order.status == 'cancelled' or not previous_start <= order.date <= end:
+            continue
+        if restaurant_id and food.resID_id != int(restaurant_id):
+            continue
+        row = sold.setdefault(food.pk, {'food': food, 'now': [0, 0], 'before': [0, 0]})
+        sums = row['now'] if order.date >= start else row['before']
+        sums[0] += line.stock
+        sums[1] += line.stock * line.price
+
+    def pct(now, before):
+        return round((now - before) * 100 / before, 1) if before else None
+
+    restaurants = []
+    for rid in sorted({row['food'].resID_id for row in sold.values()}):
+        rows = [row for row in sold.values() if row['food'].resID_id == rid]
+        revenue = sum(row['now'][1] for row in rows)
+        previous_revenue = sum(row['before'][1] for row in rows)
+        categories = {}
+        for row in rows:
+            category = categories.setdefault(row['food'].catID, [0, 0, 0])
+            category[0] += row['now'][0]
+            category[1] += row['now'][1]
+            category[2] += row['before'][1]
+        restaurant = {
+            'restaurantID': rid,
+            'revenue': revenue,
+            'previous_revenue': previous_revenue,
+            'revenue_change_pct': pct(revenue, previous_revenue),
+            'categories': [{
+                'catID': category.pk,
+                'catName': category.catName,
+                'quantity': quantity,
+                'revenue': now,
+                'share': round(now / revenue, 4) if revenue else 0,
+                'previous_revenue': before,
+                'previous_share': round(before / previous_revenue, 4) if previous_revenue else 0,
+                'revenue_change_pct': pct(now, before),
+            } for category, (quantity, now, before) in sorted(
+                categories.items(), key=lambda item: (-item[1][1], -item[1][2], item[0].pk)
+            )],
+        }
+        for i, by in enumerate(top_sellers.RANKINGS):
+            def ranked(period):
+                return sorted(rows, key=lambda row: (-row[period][i], -row[period][1 - i], row['food'].pk))
+            previous_ranks = {row['food'].pk: rank for rank, row in enumerate(ranked('before'), 1)}
+            restaurant[f'top_by_{by}'] = [{
+                'rank': rank,
+                'foodID': row['food'].pk,
+                'foodName': row['food'].foodName,
+                'quantity': row['now'][0],
+                'revenue': row['now'][1],
+                'previous_rank': previous_ranks[row['food'].pk] if row['before'][0] else None,
+                'previous_quantity': row['before'][0],
+                'previous_revenue': row['before'][1],
+                'quantity_change_pct': pct(row['now'][0], row['before'][0]),
+                'revenue_change_pct': pct(row['now'][1], row['before'][1]),
+            } for rank, row in enumerate(ranked('now')[:limit], 1) if row['now'][i]]
+        restaurants.append(restaurant)
+    return {
+        'date_from': start,
+        'date_to': end,
+        'previous_from': previous_start,
+        'previous_to': previous_end,
+        'restaurants': restaurants,
+    }
+
+
+class TopSellersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        categories = [Category.objects.create(catName=name) for name in ('Main', 'Drinks', 'Dessert')]
+        cls.foods = [
+            Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=categories[i % 3],
+                                price=100 + i * 7)
+            for i in range(9)
+        ]
+        cls.today = date.today()
+        orders = make_orders(cls.foods, 90, statuses=('pending', 'delivered', 'cancelled', 'approved', None))
+        for i, order in enumerate(orders):
+            Order.objects.filter(pk=order.pk).update(date=cls.today - timedelta(days=(i * 7) % 65))
+            # a second line with a price that differs from the menu, and ties
+            food = cls.foods[(i * 5) % 9]
+            OrderFood.objects.create(orderID=order, foodID=food, stock=1 + i % 2, price=food.price - i % 4)
+
+    def setUp(self):
+        cache.clear()
+
+    def params(self):
+        day = lambda n: str(self.today - timedelta(days=n))
+        return [
+            {}, {'restaurant_id': str(self.restaurants[0].pk), 'limit': 3},
+            {'date_from': day(9), 'date_to': day(0), 'limit': 2}, {'date_from': day(40), 'date_to': day(12)},
+            {'date_from': day(0), 'date_to': day(0)},
+        ]
+
+    def assert_matches_python(self):
+        for params in self.params():
+            with self.subTest(**params):
+                cache.clear()
+                self.assertEqual(top_sellers.top_sellers(**params), python_top_sellers(**params))
+
+    def test_matches_python_report(self):
+        self.assert_matches_python()
+
+    def test_only_the_top_rows_leave_the_database(self):
+        current_range, previous_range = top_sellers.periods()
+        with CaptureQueriesContext(connection) as queries:
+            rows = top_sellers._ranked(top_sellers._sales(current_range, previous_range, None), 1)
+        self.assertIn('ROW_NUMBER() OVER', queries[-1]['sql'])
+        for row in rows:
+            self.assertTrue(row['rank_quantity'] == 1 or row['rank_revenue'] == 1 or row['category_row'] == 1)
+        # one row per category carries its sums
+        self.assertEqual(
+            sorted((row['restaurant'], row['category']) for row in rows if row['category_row'] == 1),
+            sorted({(food.resID_id, food.catID_id) for food in self.foods}),
+        )
+
+    def test_archived_orders_are_left_out(self):
+        # archiving recomputes the rolled-up days it empties once it commits
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_orders', '--older-than-days=20', stdout=io.StringIO())
+        self.assertTrue(ArchivedOrder.objects.exists())
+        self.assert_matches_python()
+
+
+class TopSellersRollupTests(TopSellersTests):
+    """The top sellers tests again, with the days until five days ago rolled up."""
+
+    def setUp(self):
+        super().setUp()
+        call_command('rebuild_revenue_rollups', '--to', str(self.today - timedelta(days=5)), stdout=io.StringIO())
+
+    def test_late_changes_are_rolled_up(self):
+        old = Order.objects.filter(date__lt=self.today - timedelta(days=5)).exclude(status='cancelled')
+        with self.captureOnCommitCallbacks(execute=True):
+            order_workflow.transition(old.filter(status='pending')[0].pk, 'cancelled')
+            line = OrderFood.objects.filter(orderID__in=old.values('orderID')).first()
+            line.stock = 9
+            line.save()
+        self.assert_matches_python()
+
+    def test_query_count(self):
+        # rolled_through, then the rollups and today's lines ranked in one statement
+        with self.assertNumQueries(2):
+            top_sellers.top_sellers()
+
+
+class AnalyticsPrimitiveTests(TestCase):
+
+    def test_group_percentile_matches_numpy(self):
+        rng = np.random.default_rng(1)
+        keys = rng.integers(0, 50, 10000)
+        values = rng.integers(0, 1000, 10000)
+        q = (0, 10, 50, 99, 100)
+        result = analytics.group_percentile(keys, values, q, size=52)
+        self.assertEqual(result.shape, (52, len(q)))
+        for key in range(50):
+            np.testing.assert_allclose(result[key], np.percentile(values[keys == key], q))
+        self.assertTrue(np.isnan(result[50:]).all())
+
+        one = analytics.group_percentile(np.array([0, 1, 1]), np.array([7, 1, 3]), (50, 90))
+        np.testing.assert_allclose(one, [[7, 7], [2, 2.8]])
+        self.assertEqual(analytics.group_percentile(np.array([], int), np.array([]), (50,), size=2).shape, (2, 1))
+
+    def test_encode(self):
+        ids = np.array([40, 10, 30], dtype=np.int64)
+        new_ids = [30, 99, 10, 5, 99, 40]
+        codes, extended = columnar._encode(ids, new_ids)
+        # known ids keep their codes, new ones are appended in sorted order
+        np.testing.assert_array_equal(extended, [40, 10, 30, 5, 99])
+        np.testing.assert_array_equal(codes, [2, 4, 1, 3, 4, 0])
+        np.testing.assert_array_equal(extended[codes], new_ids)
+
+        codes, extended = columnar._encode(np.empty(0, np.int64), [3, 1, 3])
+        np.testing.assert_array_equal(extended, [1, 3])
+        np.testing.assert_array_equal(codes, [1, 0, 1])
+        codes, extended = columnar._encode(ids, [])
+        self.assertEqual(codes.size, 0)
+        np.testing.assert_array_equal(extended, ids)
+
+
+def decoded(store):
+    """The rows of a columnar export with the dictionary codes resolved, in id order."""
+    orders = sorted(zip(
+        store.order_id.tolist(), store.order_date.tolist(),
+        [store.statuses[code] for code in store.order_status.tolist()],
+        store.user_ids[store.order_user].tolist(), store.order_total.tolist(), store.order_items.tolist(),
+    ))
+    lines = sorted(zip(
+        store.line_id.tolist(), store.order_id[store.line_order].tolist(), store.food_ids[store.line_food].tolist(),
+        store.restaurant_ids[store.line_restaurant].tolist(), store.line_quantity.tolist(), store.line_price.tolist(),
+    ))
+    foods = sorted(zip(
+        store.food_ids.tolist(), store.restaurant_ids[store.food_restaurant].tolist(),
+        store.food_category.tolist(), store.food_price.tolist(),
+    ))
+    return orders, lines, foods
+
+
+class ColumnarRefreshTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        category = Category.objects.create(catName='Main')
+        cls.foods = [
+            Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=category, price=100 + i)
+            for i in range(6)
+        ]
+        cls.orders = make_orders(cls.foods, 20, statuses=('pending', 'delivered', 'cancelled', None))
+        for i, order in enumerate(cls.orders):
+            Order.objects.filter(pk=order.pk).update(date=date.today() - timedelta(days=i * 2))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for patch in (mock.patch.object(columnar, 'ANALYTICS_DIR', directory.name),
+                      mock.patch.object(columnar, '_loaded', None)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def assert_incremental_is_full(self):
+        incremental = columnar.refresh()
+        full = columnar.refresh(full=True)
+        self.assertEqual(decoded(incremental), decoded(full))
+        for params in ({}, {'group_by': 'month'}, {'group_by': 'restaurant'},
+                       {'restaurant_id': self.restaurants[0].pk, 'date_from': date.today() - timedelta(days=9)}):
+            self.assertEqual(analytics.revenue_report(incremental, **params), analytics.revenue_report(full, **params))
+        for name in ('basket-size', 'restaurant-mix', 'price-elasticity'):
+            self.assertEqual(analytics.ANALYSES[name](incremental), analytics.ANALYSES[name](full))
+
+    def test_incremental_refresh_equals_full(self):
+        columnar.refresh(full=True)
+        # a new order, a new line on an exported order, a status change
+        new = make_orders(self.foods, 1, user=self.orders[0].userID)[0]
+        OrderFood.objects.create(orderID=self.orders[0], foodID=self.foods[5], stock=2, price=33)
+        order_workflow.transition(self.orders[4].pk, 'approved')
+        Food.objects.create(foodName='Food new', resID=self.restaurants[1], catID=self.foods[0].catID, price=5)
+        self.assertIn(new.pk, [row[0] for row in decoded(columnar.refresh())[0]])
+        self.assert_incremental_is_full()
+
+        call_command('archive_orders', '--older-than-days=10', stdout=io.StringIO())
+        self.assertTrue(ArchivedOrder.objects.exists())
+        self.assert_incremental_is_full()
+
+    def test_matches_the_revenue_report(self):
+        store = columnar.refresh(full=True)
+        for params in ({}, {'group_by': 'month'}, {'group_by': 'restaurant'}, {'restaurant_id': self.restaurants[1].pk}):
+            self.assertEqual(analytics.revenue_report(store, **params), reports.revenue_report(**params))
+
+    def test_bad_parameters(self):
+        columnar.refresh(full=True)
+        client = APIClient()
+        for url, params in (('/restaurant/analytics/basket-size/', {}),
+                            ('/restaurant/revenue-report/', {'source': 'columnar'})):
+            response = client.get(url, {**params, 'restaurant_id': 'x'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('restaurant_id', response.json()['error'])
+            response = client.get(url, {**params, 'date_from': 'yesterday'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('YYYY-MM-DD', response.json()['error'])
+
+
+class DashboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        category = Category.objects.create(catName='Main')
+        cls.foods = [
+            Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=category, price=100 + i)
+            for i in range(4)
+        ]
+        Menu.objects.create(food=cls.foods[0], restaurant=cls.restaurants[0], category=category, is_available=False)
+        cls.orders = make_orders(cls.foods, 6, statuses=('pending', 'approved', 'delivered'))
+        cls.restaurant_id = cls.restaurants[0].pk
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_counts(self):
+        # cold: counters, revenue, the availability state (menu, inventory, hours), foods, ratings,
+        # then the shared workers and deliveries
+        with self.assertNumQueries(9):
+            cold = dashboard.stats(self.restaurant_id)
+        cache.clear()
+        availability.get_states([self.restaurant_id])
+        with self.assertNumQueries(6):
+            self.assertEqual(dashboard.stats(self.restaurant_id), cold)
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard.stats(self.restaurant_id), cold)
+        self.assertEqual(cold['menu'], {'total_foods': 2, 'available_foods': 1})
+
+    def test_scope_is_normalised(self):
+        client = APIClient()
+        first = client.get('/restaurant/', {'restaurant_id': '01'}).json()
+        self.assertEqual(client.get('/restaurant/', {'restaurant_id': '1'}).json(), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            dashboard.changed([self.restaurant_id])
+        # the scope is rebuilt (availability and the shared part stay cached)
+        with self.assertNumQueries(4):
+            dashboard.stats('01')
+
+    def test_bad_restaurant_id(self):
+        response = APIClient().get('/restaurant/', {'restaurant_id': '1; drop'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('restaurant_id', response.json()['error'])
+
+
+class CounterTests(TestCase):
+    """Every write path keeps the live counters equal to a recount."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        category = Category.objects.create(catName='Main')
+        cls.foods = [
+            Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=category, price=100 + i)
+            for i in range(4)
+        ]
+        cls.orders = make_orders(cls.foods, 8, statuses=('pending', 'approved', 'preparing', None))
+        cls.user = cls.orders[0].userID
+        cls.worker = Worker.objects.create(workerName='Dorj', phone=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_reconciled(self):
+        self.assertEqual(counters.reconcile(dry_run=True), [])
+
+    def test_order_saves_and_deletes(self):
+        self.assert_reconciled()
+        order = Order.objects.create(userID=self.user, date=date.today(), location='UB')
+        OrderFood.objects.create(orderID=order, foodID=self.foods[0], stock=1, price=1)
+        line = OrderFood.objects.create(orderID=order, foodID=self.foods[1], stock=1, price=1)
+        self.assert_reconciled()
+        order.status = 'cancelled'
+        order.save()
+        self.assert_reconciled()
+        line.delete()
+        self.assert_reconciled()
+        self.orders[1].delete()
+        self.assert_reconciled()
+
+    def test_transitions(self):
+        order_workflow.transition(self.orders[0].pk, 'approved')
+        self.assert_reconciled()
+        order_workflow.bulk_transition([order.pk for order in self.orders], 'cancelled')
+        self.assert_reconciled()
+
+    def test_checkout(self):
+        Inventory.objects.create(food=self.foods[0], restaurant=self.restaurants[0], stock_quantity=12,
+                                 min_stock_level=10)
+        CartFood.objects.create(cartID=Cart.objects.create(userID=self.user), foodID=self.foods[0], stock=3)
+        checkout.checkout(self.user.pk, 'home')
+        self.assert_reconciled()
+
+    def test_archive(self):
+        order_workflow.bulk_transition([order.pk for order in self.orders], 'cancelled')
+        Order.objects.update(date=date.today() - timedelta(days=800))
+        self.assertEqual(sum(archive.archive_orders(cutoff=date.today())), len(self.orders))
+        self.assert_reconciled()
+
+    def test_inventory_saves(self):
+        inventory = Inventory.objects.create(food=self.foods[0], restaurant=self.restaurants[0],
+                                             stock_quantity='1', min_stock_level=5)
+        self.assert_reconciled()
+        inventory.stock_quantity = 100
+        inventory.save()
+        self.assert_reconciled()
+        inventory.restaurant = self.restaurants[1]
+        inventory.save()
+        self.assert_reconciled()
+        inventory.delete()
+        self.assert_reconciled()
+
+    def test_delivery_saves(self):
+        delivery = Delivery.objects.create(orderID=self.orders[0], workerID=self.worker, status='on_the_way')
+        self.assert_reconciled()
+        delivery.status = 'delivered'
+        delivery.save()
+        self.assert_reconciled()
+        delivery.status = 'on_the_way'
+        delivery.save()
+        delivery.delete()
+        self.assert_reconciled()
+
+    def test_reconcile_repairs_a_bypassing_write(self):
+        Order.objects.filter(pk=self.orders[0].pk).update(status='cancelled')
+        self.assertTrue(counters.reconcile(dry_run=True))
+        counters.reconcile()
+        self.assert_reconciled()
+
+
+class ReportJobTests(TestCase):
+
+    def setUp(self):
+        patch = mock.patch.object(report_jobs, 'THREADS', 0)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_body_must_be_an_object(self):
+        client = APIClient()
+        for body in ([{'report': 'revenue'}], 'revenue', 1, {'report': 'revenue', 'params': [1]}):
+            with self.subTest(body=body):
+                response = client.post('/restaurant/report-jobs/', body, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        response = client.post('/restaurant/report-jobs/', {'report': 'revenue'}, format='json')
+        self.assertEqual(response.status_code, 202)
+
+    def test_one_active_job_per_key(self):
+        job = report_jobs.submit('revenue', {'group_by': 'month'})
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ReportJob.objects.create(report=job.report, params=job.params, key=job.key)
+        # a finished job does not block a new one
+        ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.FAILED)
+        self.assertNotEqual(report_jobs.submit('revenue', {'group_by': 'month'}).pk, job.pk)
+
+    def test_concurrent_submit_gets_the_queued_job(self):
+        job = report_jobs.submit('revenue', {'group_by': 'month'})
+        first = QuerySet.first
+        calls = []
+
+        def lookup(queryset):
+            # the first lookup ran before the other submit committed its job
+            calls.append(queryset)
+            return None if len(calls) == 1 else first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=lookup):
+            self.assertEqual(report_jobs.submit('revenue', {'group_by': 'month'}).pk, job.pk)
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+
+class RatingTests(TestCase):
+    """The rating aggregates stay equal to a recount of the comments."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        category = Category.objects.create(catName='Main')
+        cls.foods = [
+            Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=category, price=100)
+            for i in range(4)
+        ]
+        cls.user = User.objects.create(userName='bat', email='bat@example.com', phone=1, password='x')
+        for i in range(10):
+            cls.review(cls.foods[i % 4], 1 + i % 5)
+
+    @classmethod
+    def review(cls, food, stars):
+        return Comment.objects.create(userID=cls.user, resID=food.resID, foodID=food, review=stars, comment='',
+                                      date=date.today())
+
+    def assert_recounted(self):
+        for model, key in ((RestaurantRating, 'resID_id'), (FoodRating, 'foodID_id')):
+            recount = {}
+            for comment in Comment.objects.all():
+                row = recount.setdefault(getattr(comment, key), [0, 0, [0] * 5])
+                row[0] += 1
+                row[1] += comment.review
+                if comment.review in ratings.STARS:
+                    row[2][comment.review - 1] += 1
+            stored = {
+                rating.pk: [rating.count, rating.total, [getattr(rating, f'stars_{star}') for star in ratings.STARS]]
+                for rating in model.objects.filter(count__gt=0)
+            }
+            with self.subTest(model=model.__name__):
+                self.assertEqual(stored, recount)
+                for rating in model.objects.filter(count__gt=0):
+                    self.assertAlmostEqual(rating.average, rating.total / rating.count)
+
+    def test_create_change_move_and_delete(self):
+        self.assert_recounted()
+        comment = self.review(self.foods[0], '4')
+        self.review(self.foods[1], 9)
+        self.assert_recounted()
+        comment.review = 2
+        comment.save()
+        self.assert_recounted()
+        comment.foodID = self.foods[1]
+        comment.resID = self.foods[1].resID
+        comment.save()
+        self.assert_recounted()
+        comment.delete()
+        self.assert_recounted()
+
+    def test_cascade_deletes(self):
+        self.foods[0].delete()
+        self.assert_recounted()
+        self.restaurants[1].delete()
+        self.assert_recounted()
+        self.assertFalse(RestaurantRating.objects.filter(pk=self.restaurants[1].pk).exists())
+
+    def test_rebuild(self):
+        # writes that bypass the signals leave the aggregates off until a rebuild
+        Comment.objects.filter(foodID=self.foods[0]).update(review=5)
+        RestaurantRating.objects.update(count=0, total=0)
+        self.assertEqual(ratings.rebuild(), (2, 4))
+        self.assert_recounted()
+        FoodRating.objects.all().delete()
+        call_command('rebuild_ratings', stdout=io.StringIO())
+        self.assert_recounted()
+
+
+class FieldSetTests(TestCase):
+    """The value-row serializers against the model-instance loops the list views used to run."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        categories = [Category.objects.create(catName=name) for name in ('Main', "Chef's")]
+        cls.foods = [
+            Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=categories[i % 2],
+                                price=100 + i, description=f'about {i}', image=f'{i}.png')
+            for i in range(5)
+        ]
+        orders = make_orders(cls.foods, 6, statuses=('pending', None, 'delivered'))
+        OrderFood.objects.create(orderID=orders[0], foodID=cls.foods[1], stock=4, price=50)
+        worker = Worker.objects.create(workerName='Dorj', phone=99)
+        Delivery.objects.create(orderID=orders[0], workerID=worker, status='on_the_way', startdate=date.today())
+        Delivery.objects.create(orderID=orders[1], workerID=worker, status='pending')
+        user = User.objects.get()
+        for i, food in enumerate(cls.foods):
+            Comment.objects.create(userID=user, resID=food.resID, foodID=food, review=1 + i % 5, comment=f'c{i}',
+                                   date=date.today())
+            Inventory.objects.create(food=food, restaurant=food.resID, stock_quantity=i * 4, min_stock_level=8)
+        Coupon.objects.create(code='A', percent='10', duration='7', active=True)
+        Coupon.objects.create(code='B', percent='20', duration='30', active=False)
+
+    def setUp(self):
+        cache.clear()
+
+    # the response dicts as the list views built them from model instances
+
+    @staticmethod
+    def old_menu(food):
+        return {
+            'foodID': food.foodID, 'foodName': food.foodName,
+            'restaurant': {'resID': food.resID.resID, 'resName': food.resID.resName},
+            'category': {'catID': food.catID.catID, 'catName': food.catID.catName},
+            'price': food.price, 'description': food.description, 'image': food.image,
+        }
+
+    @staticmethod
+    def old_order(order):
+        lines = order.orderfood_set.all()
+        return {
+            'orderID': order.orderID,
+            'user': {'userID': order.userID.userID, 'userName': order.userID.userName,
+                     'email': order.userID.email, 'phone': order.userID.phone},
+            'date': order.date, 'location': order.location, 'status': order.status or 'pending',
+            'total_price': sum(line.price * line.stock for line in lines), 'items_count': lines.count(),
+        }
+
+    @staticmethod
+    def old_review(review):
+        return {
+            'commID': review.commID,
+            'user': {'userID': review.userID.userID, 'userName': review.userID.userName},
+            'restaurant': {'resID': review.resID.resID, 'resName': review.resID.resName},
+            'food': {'foodID': review.foodID.foodID, 'foodName': review.foodID.foodName},
+            'review': review.review, 'comment': review.comment, 'date': review.date,
+        }
+
+    @staticmethod
+    def old_delivery(d):
+        return {
+            'deliveryID': d.payID, 'orderID': d.orderID.orderID,
+            'worker': {'workerID': d.workerID.workerID, 'workerName': d.workerID.workerName, 'phone': d.workerID.phone},
+            'status': d.status, 'startdate': d.startdate, 'enddate': d.enddate,
+        }
+
+    @staticmethod
+    def old_coupon(coupon):
+        return {'ID': coupon.ID, 'code': coupon.code, 'percent': coupon.percent, 'duration': coupon.duration,
+                'active': coupon.active}
+
+    @staticmethod
+    def old_inventory(inv):
+        return {
+            'ID': inv.ID,
+            'food': {'foodID': inv.food.foodID, 'foodName': inv.food.foodName},
+            'restaurant': {'resID': inv.restaurant.resID, 'resName': inv.restaurant.resName},
+            'stock_quantity': inv.stock_quantity, 'min_stock_level': inv.min_stock_level, 'unit': inv.unit,
+            'is_low_stock': inv.is_low_stock, 'last_updated': inv.last_updated,
+        }
+
+    @staticmethod
+    def old_restaurant(restaurant):
+        rating = getattr(restaurant, 'rating', None)
+        return {
+            'resID': restaurant.resID, 'resName': restaurant.resName, 'location': restaurant.location,
+            'branch': restaurant.branch, 'phone': restaurant.phone,
+            'restaurantType': {'ID': restaurant.cateID.ID, 'name': restaurant.cateID.name},
+            'rating': {'average': rating.average if rating else 0.0, 'count': rating.count if rating else 0},
+        }
+
+    def get(self, url, **params):
+        response = APIClient().get(url, {'limit': 100, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_list_views_match_the_model_serializers(self):
+        cases = [
+            ('/restaurant/menu/', self.old_menu, Food.objects.order_by('foodID')),
+            ('/restaurant/orders/', self.old_order, Order.objects.order_by('-date', '-orderID')),
+            ('/restaurant/reviews/', self.old_review, Comment.objects.order_by('-date', '-commID')),
+            ('/restaurant/deliveries/', self.old_delivery, Delivery.objects.order_by(
+                F('startdate').desc(nulls_last=True), '-payID')),
+            ('/restaurant/coupons/', self.old_coupon, Coupon.objects.order_by('-ID')),
+            ('/restaurant/inventory/', self.old_inventory, Inventory.objects.order_by('ID')),
+            ('/restaurant/restaurants/', self.old_restaurant, Restaurant.objects.order_by('resID')),
+        ]
+        renderer = JSONRenderer()
+        for url, old, queryset in cases:
+            with self.subTest(url):
+                expected = json.loads(renderer.render([old(instance) for instance in queryset]))
+                self.assertEqual(self.get(url)['results'], expected)
+                # the snapshot / second render goes through the cached template
+                self.assertEqual(self.get(url)['results'], expected)
+
+    def test_fields_and_exclude_select_parts_of_the_shape(self):
+        results = self.get('/restaurant/menu/', fields='restaurant.resName,foodName,foodID')['results']
+        food = self.foods[0]
+        # declared key order, whatever the order of the request
+        self.assertEqual(json.dumps(results[0]), json.dumps(
+            {'foodID': food.foodID, 'foodName': food.foodName, 'restaurant': {'resName': food.resID.resName}},
+        ))
+        results = self.get('/restaurant/orders/', exclude='user.email,user.phone,location')['results']
+        self.assertEqual(list(results[0]), ['orderID', 'user', 'date', 'status', 'total_price', 'items_count'])
+        self.assertEqual(list(results[0]['user']), ['userID', 'userName'])
+        results = self.get('/restaurant/inventory/', fields='is_low_stock')['results']
+        self.assertEqual([row for row in results], [{'is_low_stock': i * 4 <= 8} for i in range(5)])
+
+    def test_selection_queries_only_the_needed_columns(self):
+        request = mock.Mock(query_params={'fields': 'foodID,foodName'})
+        selection = views.MENU_FIELDS.select(request)
+        self.assertIs(views.MENU_FIELDS.select(request), selection)
+        self.assertEqual(selection.columns, ['foodID', 'foodName'])
+        sql = str(selection.query(Food.objects.select_related('resID', 'catID')).query)
+        self.assertNotIn('JOIN', sql)
+        selection = views.MENU_FIELDS.select(mock.Mock(query_params={'fields': 'foodID,restaurant.resName'}))
+        self.assertIn('JOIN', str(selection.query(Food.objects.all()).query))
+
+    def test_unknown_fields_are_rejected(self):
+        for url, params, name in [
+            ('/restaurant/menu/', {'fields': 'foodID,nope'}, 'nope'),
+            ('/restaurant/menu/', {'fields': 'restaurant.nope'}, 'restaurant.nope'),
+            ('/restaurant/menu/', {'fields': 'foodName.length'}, 'foodName.length'),
+            ('/restaurant/orders/', {'exclude': 'user.password'}, 'user.password'),
+            ('/restaurant/reviews/', {'exclude': 'review.stars'}, 'review.stars'),
+            ('/restaurant/coupons/', {'fields': 'secret'}, 'secret'),
+        ]:
+            with self.subTest(**params):
+                response = APIClient().get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': f'Буруу талбар: {name}'})
+
+    def test_row_template_renders_each_leaf_kind(self):
+        template = RowTemplate({
+            "it's": ('column', 1),
+            'nested': {'sum': ('call', lambda a, b: a + b, [0, 1])},
+            'flag': ('batch', 0, 0, True, None),
+            'second': ('batch', 1, 0, ('-', '?'), 1),
+        })
+        rows = [(1, 10), (2, 20)]
+        batches = [{1: False}, {2: ('x', 'y')}]
+        self.assertEqual(template.render_all(rows, batches), [
+            {"it's": 10, 'nested': {'sum': 11}, 'flag': False, 'second': '?'},
+            {"it's": 20, 'nested': {'sum': 22}, 'flag': True, 'second': 'y'},
+        ])
+
+
+class PaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        restaurant, = make_restaurants(1)
+        category = Category.objects.create(catName='Main')
+        food = Food.objects.create(foodName='Food', resID=restaurant, catID=category, price=100)
+        # three orders a day, so the date key ties and orderID decides
+        cls.orders = make_orders([food], 11)
+        for i, order in enumerate(cls.orders):
+            Order.objects.filter(pk=order.pk).update(date=date(2026, 1, 1) + timedelta(days=i // 3))
+        worker = Worker.objects.create(workerName='Dorj', phone=1)
+        cls.deliveries = [
+            Delivery.objects.create(orderID=order, workerID=worker, status='on_the_way',
+                                    startdate=None if i % 4 == 0 else date(2026, 1, 1) + timedelta(days=i // 2))
+            for i, order in enumerate(cls.orders)
+        ]
+
+    def walk(self, url, limit, **params):
+        """Every page going forward, then every page going back from the last one."""
+        client = APIClient()
+        pages, body = [], client.get(url, {**params, 'limit': limit}).json()
+        pages.append(body)
+        while body['next']:
+            body = client.get(url, {**params, 'limit': limit, 'cursor': body['next']}).json()
+            pages.append(body)
+        back = [pages[-1]]
+        while back[-1]['prev']:
+            back.append(client.get(url, {**params, 'limit': limit, 'cursor': back[-1]['prev']}).json())
+        return pages, back[::-1]
+
+    def test_round_trips(self):
+        expected = [o.pk for o in sorted(Order.objects.all(), key=lambda o: (o.date, o.pk), reverse=True)]
+        for limit in (1, 3, 4, 20):
+            with self.subTest(limit=limit):
+                pages, back = self.walk('/restaurant/orders/', limit)
+                ids = [[row['orderID'] for row in page['results']] for page in pages]
+                self.assertEqual(sum(ids, []), expected)
+                self.assertTrue(all(len(page) == limit for page in ids[:-1]))
+                self.assertEqual([[row['orderID'] for row in page['results']] for page in back], ids)
+                self.assertEqual({page['count'] for page in pages}, {len(expected)})
+
+    def test_nullable_key(self):
+        # NULL start dates come last going forward
+        expected = [d.pk for d in sorted(self.deliveries, key=lambda d: (d.startdate is not None, d.startdate
+                                                                          or date.min, d.pk), reverse=True)]
+        for limit in (2, 5):
+            with self.subTest(limit=limit):
+                pages, back = self.walk('/restaurant/deliveries/', limit)
+                ids = [[row['deliveryID'] for row in page['results']] for page in pages]
+                self.assertEqual(sum(ids, []), expected)
+                self.assertEqual([[row['deliveryID'] for row in page['results']] for page in back], ids)
+
+    def test_annotated_key(self):
+        category = Category.objects.get()
+        foods = [Food.objects.create(foodName=f'Food {i}', resID=Restaurant.objects.get(), catID=category, price=1)
+                 for i in range(5)]
+        user = User.objects.get()
+        for i, food in enumerate(foods):
+            for stars in range(1, 2 + i % 3):
+                Comment.objects.create(userID=user, resID=food.resID, foodID=food, review=stars, comment='',
+                                       date=date.today())
+        pages, back = self.walk('/restaurant/menu/', 2, sort='rating')
+        ids = [[row['foodID'] for row in page['results']] for page in pages]
+        self.assertEqual(sorted(sum(ids, [])), sorted(Food.objects.values_list('pk', flat=True)))
+        self.assertEqual([[row['foodID'] for row in page['results']] for page in back], ids)
+
+    def test_limit(self):
+        client = APIClient()
+        with mock.patch.object(views.OrderListView.paginator, 'max_limit', 4):
+            self.assertEqual(len(client.get('/restaurant/orders/', {'limit': 1000}).json()['results']), 4)
+        self.assertEqual(len(client.get('/restaurant/orders/', {'limit': 0}).json()['results']), 1)
+        self.assertEqual(client.get('/restaurant/orders/', {'limit': 'x'}).status_code, 400)
+
+    def test_bad_cursors(self):
+        def cursor(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+        client = APIClient()
+        for raw in ('x', '!!', cursor([1]), cursor({'d': 'n'}), cursor({'d': 'x', 'v': ['2026-01-01', 1]}),
+                    cursor({'d': 'n', 'v': 5}), cursor({'d': 'n', 'v': ['2026-01-01']}),
+                    cursor({'d': 'n', 'v': ['yesterday', 1]}), cursor({'d': 'n', 'v': ['2026-01-01', {'a': 1}]}),
+                    cursor({'d': 'n', 'v': [None, 1]}), cursor({'d': 'n', 'v': [['2026-01-01'], 1]}),
+                    cursor({'d': 'n', 'v': ['2026-01-01', 'x']})):
+            with self.subTest(cursor=raw):
+                response = client.get('/restaurant/orders/', {'cursor': raw})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json()['error'])
+        self.assertEqual(client.get('/restaurant/orders/', {'cursor': cursor({'d': 'n', 'v': ['2026-01-02', 5]})})
+                         .status_code, 200)
+
+
+class StreamingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        restaurant, = make_restaurants(1)
+        category = Category.objects.create(catName='Main')
+        foods = [Food.objects.create(foodName=f'Food {i}', resID=restaurant, catID=category, price=100) for i in range(3)]
+        cls.orders = make_orders(foods, 7)
+        for i, order in enumerate(cls.orders):
+            Order.objects.filter(pk=order.pk).update(date=date(2026, 1, 1) + timedelta(days=i // 2))
+        user = User.objects.get()
+        worker = Worker.objects.create(workerName='Dorj', phone=1)
+        for i, order in enumerate(cls.orders):
+            Delivery.objects.create(orderID=order, workerID=worker, status='on_the_way',
+                                    startdate=None if i % 3 == 0 else date(2026, 1, 1) + timedelta(days=i // 2))
+            Comment.objects.create(userID=user, resID=restaurant, foodID=foods[i % 3], review=1 + i % 5, comment='',
+                                   date=date(2026, 1, 1) + timedelta(days=i // 3))
+        for i, food in enumerate(foods):
+            Inventory.objects.create(food=food, restaurant=restaurant, stock_quantity=i * 10, min_stock_level=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def stream(self, url, headers=None, **params):
+        response = APIClient().get(url, params, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def paged(self, url, **params):
+        return APIClient().get(url, {**params, 'limit': 500}).json()
+
+    def test_json_stream_has_the_rows_then_count_and_aggregates(self):
+        for url, extra in [
+            ('/restaurant/orders/', ()),
+            ('/restaurant/deliveries/', ()),
+            ('/restaurant/reviews/', ('average_rating', 'rating_distribution')),
+            ('/restaurant/inventory/', ('low_stock_count',)),
+        ]:
+            with self.subTest(url):
+                page = self.paged(url)
+                response, text = self.stream(url, stream='1')
+                self.assertEqual(response['Content-Type'], 'application/json')
+                body = json.loads(text)
+                # the rows come first, the members only known at the end follow them
+                self.assertEqual(list(body), ['results', 'count', *extra])
+                self.assertEqual(body['results'], page['results'])
+                self.assertEqual(body['count'], page['count'])
+                for key in extra:
+                    self.assertEqual(body[key], page[key])
+
+    def test_ndjson_by_parameter_and_by_accept_header(self):
+        page = self.paged('/restaurant/orders/')
+        for response, text in (
+            self.stream('/restaurant/orders/', stream='ndjson'),
+            self.stream('/restaurant/orders/', headers={'Accept': 'application/x-ndjson'}),
+        ):
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            self.assertTrue(text.endswith('\n'))
+            self.assertEqual([json.loads(line) for line in text.splitlines()], page['results'])
+
+    def test_fields_apply_to_streams(self):
+        _, text = self.stream('/restaurant/reviews/', stream='ndjson', fields='commID,food.foodName')
+        rows = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual(rows, [
+            {'commID': row['commID'], 'food': {'foodName': row['food']['foodName']}}
+            for row in self.paged('/restaurant/reviews/')['results']
+        ])
+        self.assertEqual(APIClient().get('/restaurant/orders/', {'stream': '1', 'fields': 'nope'}).status_code, 400)
+
+    def test_filtered_stream_is_empty_but_well_formed(self):
+        _, text = self.stream('/restaurant/orders/', stream='1', status='no-such-status')
+        self.assertEqual(json.loads(text), {'results': [], 'count': 0})
+
+    def test_chunks_continue_past_the_last_key(self):
+        paginator = views.DeliveryListView.paginator
+        rows = views.DELIVERY_FIELDS.select(mock.Mock(query_params={})).query(
+            Delivery.objects.all(), extra=[name for name, _ in paginator.keys],
+        )
+        expected = [row.payID for row in paginator.order(rows)]
+        for size in (1, 2, 3, 7, 100):
+            with self.subTest(size=size):
+                with CaptureQueriesContext(connection) as queries:
+                    chunks = [[row.payID for row in chunk] for chunk in paginator.chunks(rows, size)]
+                self.assertEqual(sum(chunks, []), expected)
+                self.assertTrue(all(len(chunk) == size for chunk in chunks[:-1]))
+                # one query per chunk, plus one finding nothing after a full last chunk
+                self.assertEqual(len(queries), len(expected) // size + 1)
+
+
+class SearchTests(TestCase):
+    """Menu search on the SQLite FTS5 backend; TermSearchTests runs them on the term index."""
+    backend = 'fts5'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        soup, main = Category.objects.create(catName='Soup'), Category.objects.create(catName='Main')
+        cls.buuz = Food.objects.create(foodName='Buuz', resID=cls.restaurants[0], catID=main, price=1,
+                                       description='steamed dumplings')
+        cls.khuushuur = Food.objects.create(foodName='Khuushuur', resID=cls.restaurants[1], catID=main, price=1,
+                                            description='fried, like buuz')
+        cls.noodles = Food.objects.create(foodName='Noodle soup', resID=cls.restaurants[0], catID=soup, price=1,
+                                          description='beef')
+        cls.buuz_soup = Food.objects.create(foodName='Buuz soup', resID=cls.restaurants[1], catID=soup, price=1,
+                                            description='')
+
+    def setUp(self):
+        cache.clear()
+        overridden = override_settings(MENU_SEARCH_BACKEND=self.backend)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        menu_search.clear_index()
+        menu_search.reindex_foods(Food.objects.values_list('pk', flat=True))
+
+    def search(self, query, restaurant_id=None):
+        return menu_search.search_foods(query, restaurant_id=restaurant_id)
+
+    def test_backend(self):
+        self.assertEqual(menu_search.get_backend().name, self.backend)
+
+    def test_ranking(self):
+        # title matches first, then the description match; prefixes match
+        found = self.search('buuz')
+        self.assertEqual(set(found[:2]), {self.buuz.pk, self.buuz_soup.pk})
+        self.assertEqual(found[2:], [self.khuushuur.pk])
+        self.assertEqual(self.search('bu')[2:], [self.khuushuur.pk])
+        # every word has to match, in any field
+        self.assertEqual(self.search('soup buuz'), [self.buuz_soup.pk])
+        self.assertEqual(self.search('beef noodle'), [self.noodles.pk])
+        self.assertEqual(self.search('pizza'), [])
+
+    def test_restaurant_filter(self):
+        self.assertEqual(self.search('buuz', self.restaurants[0].pk), [self.buuz.pk])
+        self.assertEqual(set(self.search('soup', self.restaurants[1].pk)), {self.buuz_soup.pk})
+
+    def test_writes_reindex(self):
+        self.buuz.foodName = 'Bansh'
+        self.buuz.save()
+        self.assertNotIn(self.buuz.pk, self.search('buuz'))
+        self.assertEqual(self.search('bansh'), [self.buuz.pk])
+        category = self.noodles.catID
+        category.catName = 'Broth'
+        category.save()
+        self.assertEqual(set(self.search('broth')), {self.noodles.pk, self.buuz_soup.pk})
+        restaurant = self.restaurants[1]
+        restaurant.resName = 'Nomin'
+        restaurant.save()
+        self.assertEqual(set(self.search('nomin')), {self.khuushuur.pk, self.buuz_soup.pk})
+        self.buuz_soup.delete()
+        self.assertEqual(self.search('nomin'), [self.khuushuur.pk])
+
+    def test_menu_list_reports_truncation(self):
+        client = APIClient()
+        body = client.get('/restaurant/menu/', {'search': 'buuz'}).json()
+        self.assertEqual(body['search'], {'limit': menu_search.MAX_RESULTS, 'truncated': False})
+        self.assertEqual([row['foodID'] for row in body['results']], self.search('buuz'))
+        with mock.patch.object(menu_search, 'MAX_RESULTS', 2):
+            body = client.get('/restaurant/menu/', {'search': 'buuz', 'limit': 1}).json()
+            self.assertEqual(body['search'], {'limit': 2, 'truncated': True})
+            self.assertEqual(body['count'], 2)
+            second = client.get('/restaurant/menu/', {'search': 'buuz', 'limit': 1, 'cursor': body['next']}).json()
+            self.assertIsNone(second['next'])
+        self.assertEqual([row['foodID'] for row in body['results'] + second['results']], self.search('buuz')[:2])
+
+
+class TermSearchTests(SearchTests):
+    backend = 'terms'
+
+
+class SnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurants = make_restaurants(2)
+        cls.category = Category.objects.create(catName='Main')
+        cls.foods = [
+            Food.objects.create(foodName=f'Food {i}', resID=cls.restaurants[i % 2], catID=cls.category, price=100)
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, etag=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, params, **headers)
+
+    def etags(self):
+        return {
+            scope: self.get('/restaurant/menu/', **params)['ETag']
+            for scope, params in (('all', {}), *((r.pk, {'restaurant_id': r.pk}) for r in self.restaurants))
+        }
+
+    def test_not_modified_from_the_cache(self):
+        first = self.get('/restaurant/menu/', restaurant_id=self.restaurants[0].pk)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            again = self.get('/restaurant/menu/', first['ETag'], restaurant_id=self.restaurants[0].pk)
+            cached = self.get('/restaurant/menu/', restaurant_id=self.restaurants[0].pk)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertEqual(cached.content, first.content)
+        # another variant of the same scope has its own ETag
+        self.assertNotEqual(self.get('/restaurant/menu/', restaurant_id=self.restaurants[0].pk, limit=1)['ETag'],
+                            first['ETag'])
+
+    def test_food_writes_bump_their_restaurant(self):
+        before = self.etags()
+        first, second = self.restaurants
+        with self.captureOnCommitCallbacks(execute=True):
+            self.foods[0].foodName = 'Renamed'
+            self.foods[0].save()
+        after = self.etags()
+        self.assertNotEqual(after['all'], before['all'])
+        self.assertNotEqual(after[first.pk], before[first.pk])
+        self.assertEqual(after[second.pk], before[second.pk])
+        response = self.get('/restaurant/menu/', before[first.pk], restaurant_id=first.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Renamed', [row['foodName'] for row in response.json()['results']])
+
+        # a food moving restaurants changes both
+        before = after
+        with self.captureOnCommitCallbacks(execute=True):
+            self.foods[0].resID = second
+            self.foods[0].save()
+        after = self.etags()
+        self.assertNotEqual(after[first.pk], before[first.pk])
+        self.assertNotEqual(after[second.pk], before[second.pk])
+
+    def test_menu_writes_bump_their_restaurant(self):
+        before = self.etags()
+        first, second = self.restaurants
+        with self.captureOnCommitCallbacks(execute=True):
+            menu = Menu.objects.create(food=self.foods[1], restaurant=second, category=self.category)
+        after = self.etags()
+        self.assertEqual(after[first.pk], before[first.pk])
+        self.assertNotEqual(after[second.pk], before[second.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            menu.delete()
+        self.assertNotEqual(self.etags()[second.pk], after[second.pk])
+
+    def test_detail(self):
+        url = f'/restaurant/menu/{self.foods[2].pk}/'
+        first = self.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(url, first['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.foods[2].price = 150
+            self.foods[2].save()
+        response = self.get(url, first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['price'], 150)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(self.get('/restaurant/menu/999999/').status_code, 404)
+
+
+class ApiDbTests(TestCase):
+    """The pooled sqlite3 connections of api.db, on a scratch copy of the menu table."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'api.sqlite3'
+        with closing(sqlite3.connect(path)) as conn:
+            conn.execute('CREATE TABLE menu (id INTEGER PRIMARY KEY, name TEXT NOT NULL, price REAL NOT NULL)')
+            conn.executemany('INSERT INTO menu (id, name, price) VALUES (?, ?, ?)', [(i, f'Food {i}', i) for i in range(1, 26)])
+            conn.commit()
+        api_db.close_db()
+        for patcher in (mock.patch.object(api_db, 'DB_PATH', path), mock.patch.object(api_db, '_wal_ready', False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(api_db.close_db)
+
+    def test_connections_are_reused_per_thread(self):
+        writer, reader = api_db.get_db(), api_db.get_db(readonly=True)
+        self.assertIsNot(writer, reader)
+        self.assertIs(api_db.get_db(), writer)
+        self.assertIs(api_db.get_db(readonly=True), reader)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(api_db.get_db(readonly=True)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], reader)
+        self.assertIn(other[0], api_db._registry)
+
+        # the end of a request closes the connections of finished threads only
+        request_finished.send(sender=self.__class__)
+        self.assertNotIn(other[0], api_db._registry)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            other[0].execute('SELECT 1')
+        self.assertEqual(reader.execute('SELECT count(*) FROM menu').fetchone(), (25,))
+
+    def test_reader_rejects_writes(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            api_db.get_db(readonly=True).execute("INSERT INTO menu (name, price) VALUES ('x', 1)")
+        writer = api_db.get_db()
+        writer.execute("INSERT INTO menu (name, price) VALUES ('x', 1)")
+        writer.commit()
+        self.assertEqual(api_db.get_db(readonly=True).execute('SELECT count(*) FROM menu').fetchone(), (26,))
+
+    def test_menu_pages_through_the_link_header(self):
+        client, url, pages = APIClient(), '/api/menu/?limit=10', []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.json()])
+            link = re.fullmatch(r'<(.+)>; rel="next"', response.get('Link', ''))
+            url = link and link.group(1)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), list(range(1, 26)))
+
+        response = client.get('/api/menu/', {'limit': 5, 'after': 20})
+        self.assertEqual([row['id'] for row in response.json()], [21, 22, 23, 24, 25])
+        # a full last page still links on, to an empty page without a Link
+        last = client.get(re.fullmatch(r'<(.+)>; rel="next"', response['Link']).group(1))
+        self.assertEqual(last.json(), [])
+        self.assertNotIn('Link', last)
+        self.assertEqual(client.get('/api/menu/', {'limit': 'x'}).status_code, 400)
@@ -0,0 +1,241 @@
+"""
+Top sellers and product mix, ranked in the database.
+
+A report covers a date range and the range of the same length right
+before it. What it needs per food is four sums over both ranges: quantity
+and revenue now and before, counting the orders that are not cancelled
+(like the revenue report). Complete days are read from the per food daily
+rollups (restaurant_web.rollups, `DailyFoodSales`) and only the days after
+them (normally today) from the order lines, each a conditional-aggregate
+query grouped by food. One statement adds the two up per food, ranks the
+foods with ROW_NUMBER() OVER (PARTITION BY restaurant ...) and sums the
+categories and restaurants with SUM() OVER windows; only the top N foods
+per restaurant and one row per category leave the database.
+
+Line revenue is price * stock at the price ordered. Archived orders
+(restaurant_web.archive) are not included.
+
+Reports are cached per (restaurant, range, limit) for
+TOP_SELLERS_CACHE_TTL seconds; there is no invalidation, a report is at
+most that old.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import dateparse, timezone
+
+from api.models import OrderFood
+from restaurant_web import rollups
+from restaurant_web.models import DailyFoodSales
+
+
+TOP_SELLERS_TTL = getattr(settings, 'TOP_SELLERS_CACHE_TTL', 300)
+DEFAULT_DAYS = 30
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+RANKINGS = ('quantity', 'revenue')
+SUMS = ('quantity', 'revenue', 'previous_quantity', 'previous_revenue')
+
+# `{sales}` is the UNION ALL of the per food parts (see _sales); the sums
+# are added up per food, then ranked and totalled per restaurant. Rows
+# leave for the top `limit` of either ranking and for the first food of
+# each category, which carries the category's sums.
+RANKED_SQL = """
+SELECT * FROM (
+    SELECT foods.*,
+        ROW_NUMBER() OVER (PARTITION BY restaurant ORDER BY quantity DESC, revenue DESC, food) AS rank_quantity,
+        ROW_NUMBER() OVER (
+            PARTITION BY restaurant ORDER BY previous_quantity DESC, previous_revenue DESC, food
+        ) AS previous_rank_quantity,
+        ROW_NUMBER() OVER (PARTITION BY restaurant ORDER BY revenue DESC, quantity DESC, food) AS rank_revenue,
+        ROW_NUMBER() OVER (
+            PARTITION BY restaurant ORDER BY previous_revenue DESC, previous_quantity DESC, food
+        ) AS previous_rank_revenue,
+        ROW_NUMBER() OVER (PARTITION BY restaurant, category ORDER BY food) AS category_row,
+        SUM(quantity) OVER (PARTITION BY restaurant, category) AS category_quantity,
+        SUM(revenue) OVER (PARTITION BY restaurant, category) AS category_revenue,
+        SUM(previous_revenue) OVER (PARTITION BY restaurant, category) AS category_previous_revenue,
+        SUM(revenue) OVER (PARTITION BY restaurant) AS total,
+        SUM(previous_revenue) OVER (PARTITION BY restaurant) AS previous_total
+    FROM (
+        SELECT food, name, restaurant, category, category_name,
+            SUM(sold_quantity) AS quantity, SUM(sold_revenue) AS revenue,
+            SUM(previous_quantity) AS previous_quantity, SUM(previous_revenue) AS previous_revenue
+        FROM ({sales}) sales
+        GROUP BY food, name, restaurant, category, category_name
+    ) foods
+) ranked
+WHERE rank_quantity <= %s OR rank_revenue <= %s OR category_row = 1
+"""
+# columns summed in the database; PostgreSQL returns SUM(bigint) as numeric
+_INTEGERS = (
+    *SUMS, 'category_quantity', 'category_revenue', 'category_previous_revenue', 'total', 'previous_total',
+)
+
+
+def periods(date_from=None, date_to=None):
+    """
+    ((start, end), (previous start, previous end)) for 'YYYY-MM-DD' bounds;
+    the range defaults to the last DEFAULT_DAYS days. Raises ValueError for
+    malformed or reversed bounds.
+    """
+    bounds = []
+    for value in (date_from, date_to):
+        if value and isinstance(value, str):
+            parsed = dateparse.parse_date(value)
+            if parsed is None:
+                raise ValueError(value)
+            value = parsed
+        bounds.append(value or None)
+    end = bounds[1] or timezone.localdate()
+    start = bounds[0] or end - timedelta(days=DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValueError(date_from)
+    length = end - start + timedelta(days=1)
+    return (start, end), (start - length, start - timedelta(days=1))
+
+
+def _sums(day, current_from, quantity, revenue):
+    # `day` / `quantity` / `revenue` name the columns of the rows summed
+    current = Q(**{f'{day}__gte': current_from})
+    return {
+        'sold_quantity': Coalesce(Sum(quantity, filter=current), Value(0)),
+        'sold_revenue': Coalesce(Sum(revenue, filter=current), Value(0)),
+        'previous_quantity': Coalesce(Sum(quantity, filter=~current), Value(0)),
+        'previous_revenue': Coalesce(Sum(revenue, filter=~current), Value(0)),
+    }
+
+
+def _sales(current_range, previous_range, restaurant_id):
+    """
+    The per food sums of both ranges as querysets with the same columns:
+    the rolled-up days from DailyFoodSales, the days after them from the
+    order lines.
+    """
+    start, end = previous_range[0], current_range[1]
+    rolled = rollups.rolled_through()
+    parts = []
+    if rolled is not None and start <= rolled:
+        rows = DailyFoodSales.objects.filter(day__gte=start, day__lte=min(end, rolled))
+        if restaurant_id:
+            rows = rows.filter(food__resID_id=restaurant_id)
+        parts.append(rows.values(
+            'food', name=F('food__foodName'), restaurant=F('food__resID'),
+            category=F('food__catID'), category_name=F('food__catID__catName'),
+        ).annotate(**_sums('day', current_range[0], 'quantity', 'revenue')).order_by())
+        start = rolled + timedelta(days=1)
+    if start <= end:
+        lines = OrderFood.objects.filter(
+            orderID__date__gte=start, orderID__date__lte=end
+        ).exclude(orderID__status='cancelled')
+        if restaurant_id:
+            lines = lines.filter(foodID__resID_id=restaurant_id)
+        parts.append(lines.values(
+            food=F('foodID'), name=F('foodID__foodName'), restaurant=F('foodID__resID'),
+            category=F('foodID__catID'), category_name=F('foodID__catID__catName'),
+        ).annotate(**_sums('orderID__date', current_range[0], 'stock', F('price') * F('stock'))).order_by())
+    return parts
+
+
+def _ranked(parts, limit):
+    """The RANKED_SQL rows over the UNION ALL of `parts`, as dicts."""
+    db = parts[0].db
+    sales, params = [], []
+    for part in parts:
+        sql, part_params = part.query.get_compiler(db).as_sql()
+        sales.append(sql)
+        params.extend(part_params)
+    with connections[db].cursor() as cursor:
+        cursor.execute(RANKED_SQL.format(sales=' UNION ALL '.join(sales)), [*params, limit, limit])
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, values)) for values in cursor.fetchall()]
+    for row in rows:
+        for name in _INTEGERS:
+            row[name] = int(row[name])
+    return rows
+
+
+def _share(part, whole):
+    return round(part / whole, 4) if whole else 0
+
+
+def _pct(now, before):
+    return round((now - before) * 100 / before, 1) if before else None
+
+
+def _food(row, by):
+    return {
+        'rank': row[f'rank_{by}'],
+        'foodID': row['food'],
+        'foodName': row['name'],
+        'quantity': row['quantity'],
+        'revenue': row['revenue'],
+        'previous_rank': row[f'previous_rank_{by}'] if row['previous_quantity'] else None,
+        'previous_quantity': row['previous_quantity'],
+        'previous_revenue': row['previous_revenue'],
+        'quantity_change_pct': _pct(row['quantity'], row['previous_quantity']),
+        'revenue_change_pct': _pct(row['revenue'], row['previous_revenue']),
+    }
+
+
+def _category(row):
+    return {
+        'catID': row['category'],
+        'catName': row['category_name'],
+        'quantity': row['category_quantity'],
+        'revenue': row['category_revenue'],
+        'share': _share(row['category_revenue'], row['total']),
+        'previous_revenue': row['category_previous_revenue'],
+        'previous_share': _share(row['category_previous_revenue'], row['previous_total']),
+        'revenue_change_pct': _pct(row['category_revenue'], row['category_previous_revenue']),
+    }
+
+
+def _build(current_range, previous_range, restaurant_id, limit):
+    restaurants = {}
+    for row in _ranked(_sales(current_range, previous_range, restaurant_id), limit):
+        restaurant = restaurants.get(row['restaurant'])
+        if restaurant is None:
+            restaurant = restaurants[row['restaurant']] = {
+                'restaurantID': row['restaurant'],
+                'revenue': row['total'],
+                'previous_revenue': row['previous_total'],
+                'revenue_change_pct': _pct(row['total'], row['previous_total']),
+                'categories': [],
+                **{f'top_by_{by}': [] for by in RANKINGS},
+            }
+        if row['category_row'] == 1:
+            restaurant['categories'].append(_category(row))
+        for by in RANKINGS:
+            # foods sold only in the previous range rank last; they are
+            # ranked anyway so the previous ranks stay complete
+            if row[f'rank_{by}'] <= limit and row[by]:
+                restaurant[f'top_by_{by}'].append(_food(row, by))
+
+    for restaurant in restaurants.values():
+        restaurant['categories'].sort(key=lambda c: (-c['revenue'], -c['previous_revenue'], c['catID']))
+        for by in RANKINGS:
+            restaurant[f'top_by_{by}'].sort(key=lambda f: f['rank'])
+    return {
+        'date_from': current_range[0],
+        'date_to': current_range[1],
+        'previous_from': previous_range[0],
+        'previous_to': previous_range[1],
+        'restaurants': [restaurants[rid] for rid in sorted(restaurants)],
+    }
+
+
+def top_sellers(date_from=None, date_to=None, restaurant_id=None, limit=DEFAULT_LIMIT):
+    """The top sellers report body, cached per (restaurant, range, limit)."""
+    current_range, previous_range = periods(date_from, date_to)
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    key = f'top-sellers:{restaurant_id or "all"}:{current_range[0]}:{current_range[1]}:{limit}'
+    report = cache.get(key)
+    if report is None:
+        report = _build(current_range, previous_range, restaurant_id, limit)
+        cache.set(key, report, TOP_SELLERS_TTL)
+    return report
@@ -1,14 +1,23 @@
 from django.urls import path
 from .views import (
     dashboard,
+    order_feed,
     MenuListView,
     MenuDetailView,
+    MenuImportView,
+    MenuExportView,
     OrderListView,
     OrderDetailView,
     OrderApproveView,
+    OrderBulkStatusView,
     RevenueReportView,
+    TopSellersView,
+    AnalyticsView,
+    ReportJobListView,
+    ReportJobDetailView,
     DeliveryListView,
     DeliveryDetailView,
+    RestaurantListView,
     RestaurantProfileView,
     OperatingHoursListView,
     CouponListView,
@@ -28,20 +37,29 @@ urlpatterns = [
     # Menu Management
     path('menu/', MenuListView.as_view(), name='menu-list'),
     path('menu/<int:food_id>/', MenuDetailView.as_view(), name='menu-detail'),
+    path('menu/import/', MenuImportView.as_view(), name='menu-import'),
+    path('menu/export/', MenuExportView.as_view(), name='menu-export'),
     
     # Order Management
     path('orders/', OrderListView.as_view(), name='order-list'),
     path('orders/<int:order_id>/', OrderDetailView.as_view(), name='order-detail'),
     path('orders/<int:order_id>/approve/', OrderApproveView.as_view(), name='order-approve'),
+    path('orders/bulk-status/', OrderBulkStatusView.as_view(), name='order-bulk-status'),
+    path('orders/feed/', order_feed, name='order-feed'),
     
     # Reports
     path('revenue-report/', RevenueReportView.as_view(), name='revenue-report'),
+    path('top-sellers/', TopSellersView.as_view(), name='top-sellers'),
+    path('analytics/<str:analysis>/', AnalyticsView.as_view(), name='analytics'),
+    path('report-jobs/', ReportJobListView.as_view(), name='report-job-list'),
+    path('report-jobs/<int:job_id>/', ReportJobDetailView.as_view(), name='report-job-detail'),
     
     # Delivery Tracking
     path('deliveries/', DeliveryListView.as_view(), name='delivery-list'),
     path('deliveries/<int:delivery_id>/', DeliveryDetailView.as_view(), name='delivery-detail'),
     
     # Restaurant Profile
+    path('restaurants/', RestaurantListView.as_view(), name='restaurant-list'),
     path('restaurant/<int:restaurant_id>/', RestaurantProfileView.as_view(), name='restaurant-profile'),
     
     # Operating Hours
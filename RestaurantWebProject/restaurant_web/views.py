@@ -2,15 +2,178 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import api_view
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Prefetch, Sum, F, Avg
+from django.http import StreamingHttpResponse, JsonResponse
+from django.db.models import Prefetch, F, Case, When, Value
+from django.db.models.functions import Coalesce
 from django.db import models as db_models
-from django.utils import timezone, dateparse
+from django.utils import dateparse
 
 from api.models import Food, Order, OrderFood, Category, Restaurant, Delivery, DeliveryPrice, Worker, Coupon, Comment
-from restaurant_web.models import Menu, OrderStatus, OperatingHours, Inventory
+from restaurant_web.models import Menu, OperatingHours, Inventory, ReportJob
 from common.permissions import JWTAuthentication
-from datetime import datetime, timedelta
+from common.pagination import KeysetPaginator
+from common.fieldsets import FieldSet, Computed, Batch
+from common.streaming import STREAM_RENDERERS, stream_format, stream_response
+from restaurant_web import search as menu_search
+from restaurant_web import snapshots
+from restaurant_web import menu_io
+from restaurant_web import availability
+from restaurant_web import order_links
+from restaurant_web import events
+from restaurant_web import order_workflow
+from restaurant_web import order_events
+from restaurant_web import archive
+from restaurant_web import reports
+from restaurant_web import top_sellers
+from restaurant_web import report_jobs
+from restaurant_web import ratings
+from restaurant_web import columnar
+from restaurant_web import analytics
+from restaurant_web import dashboard as dashboard_stats
+from common.jwt import decode_token
+from asgiref.sync import sync_to_async
+from datetime import datetime
+import asyncio
+import io
+import jwt
+
+
+# Response shapes; clients trim them with ?fields= / ?exclude=
+MENU_FIELDS = FieldSet({
+    'foodID': 'foodID',
+    'foodName': 'foodName',
+    'restaurant': {
+        'resID': 'resID_id',
+        'resName': 'resID__resName',
+    },
+    'category': {
+        'catID': 'catID_id',
+        'catName': 'catID__catName',
+    },
+    'price': 'price',
+    'description': 'description',
+    'image': 'image',
+})
+
+# ?sort=rating listings; `rating_average` is annotated (0 for unrated)
+RATING_FIELDS = {
+    'average': 'rating_average',
+    'count': Computed(lambda value: value or 0, requires=('rating__count',)),
+}
+
+MENU_RATED_FIELDS = FieldSet({
+    **MENU_FIELDS.spec,
+    'rating': RATING_FIELDS,
+})
+
+RESTAURANT_FIELDS = FieldSet({
+    'resID': 'resID',
+    'resName': 'resName',
+    'location': 'location',
+    'branch': 'branch',
+    'phone': 'phone',
+    'restaurantType': {
+        'ID': 'cateID_id',
+        'name': 'cateID__name',
+    },
+    'rating': RATING_FIELDS,
+})
+
+
+def _rated(queryset):
+    return queryset.annotate(rating_average=Coalesce(F('rating__average'), Value(0.0)))
+
+
+MENU_DETAIL_FIELDS = FieldSet({
+    **MENU_FIELDS.spec,
+    'is_available': Batch(menu_io.menu_flags, key='foodID', default=True),
+})
+
+ORDER_FIELDS = FieldSet({
+    'orderID': 'orderID',
+    'user': {
+        'userID': 'userID_id',
+        'userName': 'userID__userName',
+        'email': 'userID__email',
+        'phone': 'userID__phone',
+    },
+    'date': 'date',
+    'location': 'location',
+    'status': Computed(lambda value: value or 'pending', requires=('status',)),
+    'total_price': 'total_price',
+    'items_count': 'items_count',
+})
+
+REVIEW_FIELDS = FieldSet({
+    'commID': 'commID',
+    'user': {
+        'userID': 'userID_id',
+        'userName': 'userID__userName',
+    },
+    'restaurant': {
+        'resID': 'resID_id',
+        'resName': 'resID__resName',
+    },
+    'food': {
+        'foodID': 'foodID_id',
+        'foodName': 'foodID__foodName',
+    },
+    'review': 'review',
+    'comment': 'comment',
+    'date': 'date',
+})
+
+REVIEW_DETAIL_FIELDS = FieldSet({
+    **REVIEW_FIELDS.spec,
+    'user': {
+        **REVIEW_FIELDS.spec['user'],
+        'email': 'userID__email',
+    },
+})
+
+DELIVERY_FIELDS = FieldSet({
+    'deliveryID': 'payID',
+    'orderID': 'orderID_id',
+    'worker': {
+        'workerID': 'workerID_id',
+        'workerName': 'workerID__workerName',
+        'phone': 'workerID__phone',
+    },
+    'status': 'status',
+    'startdate': 'startdate',
+    'enddate': 'enddate',
+})
+
+COUPON_FIELDS = FieldSet({
+    'ID': 'ID',
+    'code': 'code',
+    'percent': 'percent',
+    'duration': 'duration',
+    'active': 'active',
+})
+
+INVENTORY_FIELDS = FieldSet({
+    'ID': 'ID',
+    'food': {
+        'foodID': 'food_id',
+        'foodName': 'food__foodName',
+    },
+    'restaurant': {
+        'resID': 'restaurant_id',
+        'resName': 'restaurant__resName',
+    },
+    'stock_quantity': 'stock_quantity',
+    'min_stock_level': 'min_stock_level',
+    'unit': 'unit',
+    'is_low_stock': Computed(lambda stock, minimum: stock <= minimum, requires=('stock_quantity', 'min_stock_level')),
+    'last_updated': 'last_updated',
+})
+
+
+def _keys(paginator):
+    return [name for name, _ in paginator.keys]
 
 
 class MenuListView(APIView):
@@ -19,9 +182,25 @@ class MenuListView(APIView):
     POST: Create new menu item (Food)
     """
     authentication_classes = [JWTAuthentication]
+    paginator = KeysetPaginator(ordering=('foodID',))
+    search_paginator = KeysetPaginator(ordering=('search_rank', 'foodID'))
+    rating_paginator = KeysetPaginator(ordering=('-rating_average', 'foodID'))
 
     def get(self, request):
         """List all menu items with optional filters"""
+        restaurant_id = request.query_params.get('restaurant_id')
+        # search results, time-dependent availability and ratings are never snapshotted
+        if (request.query_params.get('search') or 'is_available' in request.query_params
+                or request.query_params.get('sort') == 'rating'
+                or (restaurant_id and not restaurant_id.isdigit())):
+            return Response(self.list_menu(request))
+
+        # Served from the per-restaurant snapshot (ETag / If-None-Match aware)
+        scope = str(int(restaurant_id)) if restaurant_id else snapshots.ALL
+        variant = snapshots.variant_of(request.query_params, exclude=('restaurant_id',))
+        return snapshots.menu_list_response(request, scope, variant, lambda: self.list_menu(request))
+
+    def list_menu(self, request):
         restaurant_id = request.query_params.get('restaurant_id')
         category_id = request.query_params.get('category_id')
         is_available = request.query_params.get('is_available')
@@ -35,40 +214,42 @@ class MenuListView(APIView):
         if category_id:
             queryset = queryset.filter(catID_id=category_id)
         if is_available is not None:
-            # Note: Food model doesn't have is_available, but Menu does
-            menu_ids = Menu.objects.filter(is_available=is_available.lower() == 'true').values_list('food_id', flat=True)
-            if is_available.lower() == 'true':
-                queryset = queryset.filter(foodID__in=menu_ids)
-            else:
-                queryset = queryset.exclude(foodID__in=menu_ids)
-        if search:
-            queryset = queryset.filter(
-                Q(foodName__icontains=search) | 
-                Q(description__icontains=search)
+            # Menu flag + stock + opening hours, from the availability engine
+            queryset = availability.filter_available(
+                queryset, available=is_available.lower() == 'true', restaurant_id=restaurant_id
             )
+        paginator = self.paginator
+        extra = {}
+        if search:
+            # Ranked ids come from the full-text index; rank order is kept via CASE.
+            # One id past the cap tells whether the matches were cut.
+            food_ids = menu_search.search_foods(search, restaurant_id=restaurant_id, limit=menu_search.MAX_RESULTS + 1)
+            extra['search'] = {'limit': menu_search.MAX_RESULTS, 'truncated': len(food_ids) > menu_search.MAX_RESULTS}
+            food_ids = food_ids[:menu_search.MAX_RESULTS]
+            if food_ids:
+                queryset = queryset.filter(foodID__in=food_ids).annotate(
+                    search_rank=Case(
+                        *[When(foodID=food_id, then=Value(rank)) for rank, food_id in enumerate(food_ids)],
+                        output_field=db_models.IntegerField(),
+                    )
+                )
+                paginator = self.search_paginator
+            else:
+                queryset = queryset.none()
 
-        foods = []
-        for food in queryset:
-            foods.append({
-                'foodID': food.foodID,
-                'foodName': food.foodName,
-                'restaurant': {
-                    'resID': food.resID.resID,
-                    'resName': food.resID.resName,
-                },
-                'category': {
-                    'catID': food.catID.catID,
-                    'catName': food.catID.catName,
-                },
-                'price': food.price,
-                'description': food.description,
-                'image': food.image,
-            })
+        fields = MENU_FIELDS
+        if request.query_params.get('sort') == 'rating':
+            # best rated first, from the stored aggregates (restaurant_web.ratings)
+            queryset = _rated(queryset)
+            paginator, fields = self.rating_paginator, MENU_RATED_FIELDS
 
-        return Response({
-            'count': len(foods),
-            'results': foods
-        })
+        # only the requested columns (plus the sort key) are selected, as plain rows
+        fields = fields.select(request)
+        page = paginator.paginate(fields.query(queryset, extra=_keys(paginator)), request)
+
+        foods = fields.serialize(page.rows)
+
+        return page.envelope(foods, **extra)
 
     def post(self, request):
         """Create new menu item (Food)"""
@@ -123,32 +304,22 @@ class MenuDetailView(APIView):
 
     def get(self, request, food_id):
         """Get menu item details"""
+        fields = MENU_DETAIL_FIELDS.select(request)
+        variant = snapshots.variant_of(request.query_params) if request.query_params else ''
+        return snapshots.menu_detail_response(
+            request, food_id, lambda: self.menu_item(food_id, fields), variant=variant
+        )
+
+    def menu_item(self, food_id, fields):
         try:
-            food = Food.objects.select_related('resID', 'catID').get(foodID=food_id)
+            food = fields.query(Food.objects.all(), extra=('resID_id',)).get(foodID=food_id)
         except Food.DoesNotExist:
-            return Response(
+            return None, Response(
                 {'error': 'Меню олдсонгүй'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        menu = Menu.objects.filter(food=food).first()
-        
-        return Response({
-            'foodID': food.foodID,
-            'foodName': food.foodName,
-            'restaurant': {
-                'resID': food.resID.resID,
-                'resName': food.resID.resName,
-            },
-            'category': {
-                'catID': food.catID.catID,
-                'catName': food.catID.catName,
-            },
-            'price': food.price,
-            'description': food.description,
-            'image': food.image,
-            'is_available': menu.is_available if menu else True,
-        })
+        return food.resID_id, fields.serialize([food])[0]
 
     def put(self, request, food_id):
         """Update menu item"""
@@ -225,11 +396,92 @@ class MenuDetailView(APIView):
         )
 
 
+class MenuImportView(APIView):
+    """
+    Олон хоол нэг дор оруулах (bulk import)
+
+    POST /restaurant/menu/import/?dry_run=true
+        JSON: {"items": [{foodName, resID, catID, price, description, image, is_available}, ...]}
+        эсвэл multipart: file=<menu.csv|menu.json>, fmt=csv|json
+    """
+    authentication_classes = [JWTAuthentication]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        dry_run = request.query_params.get('dry_run', 'false').lower() == 'true'
+        upload = request.FILES.get('file')
+
+        if upload is not None:
+            fmt = (request.data.get('fmt') or upload.name.rsplit('.', 1)[-1]).lower()
+            if fmt in ('jsonl', 'ndjson'):
+                fmt = 'json'
+            if fmt not in menu_io.FORMATS:
+                return Response(
+                    {'error': f'Формат буруу. Зөв формат: {", ".join(menu_io.FORMATS)}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            rows = menu_io.read_rows(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), fmt)
+        else:
+            rows = request.data.get('items')
+            if not isinstance(rows, list):
+                return Response(
+                    {'error': 'items эсвэл file шаардлагатай'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            result = menu_io.import_menu(rows, dry_run=dry_run)
+        except menu_io.ImportFormatError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if dry_run:
+            result['message'] = f"{result['created']} мөр зөв, {result['failed']} мөр алдаатай"
+        else:
+            result['message'] = f"{result['created']} хоол нэмэгдлээ, {result['failed']} мөр алдаатай"
+        return Response(
+            result,
+            status=status.HTTP_200_OK if dry_run or not result['created'] else status.HTTP_201_CREATED
+        )
+
+
+class MenuExportView(APIView):
+    """
+    Меню экспорт (streaming)
+
+    GET /restaurant/menu/export/?fmt=csv|json&restaurant_id=1
+
+    (`format` is reserved by DRF for renderer selection)
+    """
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request):
+        fmt = request.query_params.get('fmt', 'csv').lower()
+        if fmt not in menu_io.FORMATS:
+            return Response(
+                {'error': f'Формат буруу. Зөв формат: {", ".join(menu_io.FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        restaurant_id = request.query_params.get('restaurant_id')
+        if restaurant_id and not restaurant_id.isdigit():
+            return Response({'error': 'restaurant_id буруу байна'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            menu_io.export_menu(fmt, restaurant_id=restaurant_id),
+            content_type='text/csv; charset=utf-8' if fmt == 'csv' else 'application/json',
+        )
+        response['Content-Disposition'] = f'attachment; filename="menu.{fmt}"'
+        return response
+
+
 class OrderListView(APIView):
     """
     GET: List all orders with filtering
     """
     authentication_classes = [JWTAuthentication]
+    renderer_classes = STREAM_RENDERERS
+    paginator = KeysetPaginator(ordering=('-date', '-orderID'))
+    # same order, on the link row's columns (see order_links.restaurant_orders)
+    restaurant_paginator = KeysetPaginator(ordering=('-link_date', '-link_order'))
 
     def get(self, request):
         """List orders with optional status filter"""
@@ -238,71 +490,62 @@ class OrderListView(APIView):
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
 
-        queryset = Order.objects.select_related('userID').prefetch_related(
-            Prefetch('orderfood_set', queryset=OrderFood.objects.select_related('foodID'))
-        ).all()
+        queryset = Order.objects.all()
+        paginator = self.paginator
 
         # Apply filters
-        if order_status:
-            queryset = queryset.filter(status=order_status)
         if restaurant_id:
-            # Filter by restaurant through order foods
-            queryset = queryset.filter(orderfood_set__foodID__resID_id=restaurant_id).distinct()
-        if date_from:
-            queryset = queryset.filter(date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(date__lte=date_to)
+            # filtered and sorted on the restaurant -> order link table and its indexes
+            queryset = order_links.restaurant_orders(queryset, restaurant_id, order_status, date_from, date_to)
+            paginator = self.restaurant_paginator
+        else:
+            if order_status:
+                queryset = queryset.filter(status=order_status)
+            if date_from:
+                queryset = queryset.filter(date__gte=date_from)
+            if date_to:
+                queryset = queryset.filter(date__lte=date_to)
 
-        orders = []
-        for order in queryset.order_by('-date', '-orderID'):
-            order_foods = order.orderfood_set.all()
-            total_price = sum(of.price * of.stock for of in order_foods)
+        fields = ORDER_FIELDS.select(request)
+        fmt = stream_format(request)
+        if fmt:
+            return stream_response(fmt, paginator, fields.query(queryset, extra=_keys(paginator)), fields)
+        page = paginator.paginate(fields.query(queryset, extra=_keys(paginator)), request)
 
-            orders.append({
-                'orderID': order.orderID,
-                'user': {
-                    'userID': order.userID.userID,
-                    'userName': order.userID.userName,
-                    'email': order.userID.email,
-                    'phone': order.userID.phone,
-                },
-                'date': order.date,
-                'location': order.location,
-                'status': order.status or 'pending',
-                'total_price': total_price,
-                'items_count': order_foods.count(),
-            })
+        orders = fields.serialize(page.rows)
 
-        return Response({
-            'count': len(orders),
-            'results': orders
-        })
+        return Response(page.envelope(orders))
 
 
 class OrderDetailView(APIView):
     """
-    GET: Get order details
+    GET: Get order details (?events_since=<seq> returns only newer history)
     PUT: Update order status
     """
     authentication_classes = [JWTAuthentication]
 
     def get(self, request, order_id):
         """Get order details with all items"""
+        try:
+            events_since = int(request.query_params.get('events_since') or 0)
+        except ValueError:
+            return Response({'error': 'events_since бүхэл тоо байх ёстой'}, status=status.HTTP_400_BAD_REQUEST)
         try:
             order = Order.objects.select_related('userID').prefetch_related(
                 Prefetch('orderfood_set', queryset=OrderFood.objects.select_related('foodID'))
             ).get(orderID=order_id)
         except Order.DoesNotExist:
+            archived = archive.order_detail(order_id, events_since)
+            if archived is not None:
+                return Response(archived)
             return Response(
                 {'error': 'Захиалга олдсонгүй'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
         order_foods = []
-        total_price = 0
         for of in order.orderfood_set.all():
             item_total = of.price * of.stock
-            total_price += item_total
             order_foods.append({
                 'ID': of.ID,
                 'food': {
@@ -316,14 +559,8 @@ class OrderDetailView(APIView):
                 'total': item_total,
             })
 
-        # Get status history
-        status_history = OrderStatus.objects.filter(order=order).order_by('-created_at')
-        history = [{
-            'status': s.status,
-            'notes': s.notes,
-            'created_at': s.created_at,
-            'updated_by': s.updated_by,
-        } for s in status_history]
+        # Event log, newest first
+        history = [order_events.as_dict(e) for e in order_events.since(order.orderID, events_since).reverse()]
 
         return Response({
             'orderID': order.orderID,
@@ -337,20 +574,12 @@ class OrderDetailView(APIView):
             'location': order.location,
             'status': order.status or 'pending',
             'items': order_foods,
-            'total_price': total_price,
+            'total_price': order.total_price,
             'status_history': history,
         })
 
     def put(self, request, order_id):
-        """Update order status"""
-        try:
-            order = Order.objects.get(orderID=order_id)
-        except Order.DoesNotExist:
-            return Response(
-                {'error': 'Захиалга олдсонгүй'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
+        """Update order status (optional expected_status for optimistic concurrency)"""
         new_status = request.data.get('status')
         if not new_status:
             return Response(
@@ -359,33 +588,60 @@ class OrderDetailView(APIView):
             )
 
         # Validate status
-        valid_statuses = ['pending', 'approved', 'preparing', 'ready', 'delivered', 'cancelled']
+        valid_statuses = order_workflow.STATUSES
         if new_status not in valid_statuses:
             return Response(
                 {'error': f'Буруу status. Зөв status: {", ".join(valid_statuses)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        old_status = order.status or 'pending'
-        order.status = new_status
-        order.save()
-
-        # Create status history entry
-        OrderStatus.objects.create(
-            order=order,
-            status=new_status,
+        outcome = order_workflow.transition(
+            order_id,
+            new_status,
             notes=request.data.get('notes', ''),
-            updated_by=request.data.get('updated_by', 'system')
+            updated_by=request.data.get('updated_by', 'system'),
+            expected=request.data.get('expected_status') or None,
         )
+        error = _transition_error(outcome, new_status)
+        if error:
+            return error
 
         return Response({
-            'orderID': order.orderID,
-            'old_status': old_status,
+            'orderID': order_id,
+            'old_status': outcome.old_status,
             'new_status': new_status,
             'message': 'Захиалгын статус амжилттай шинэчлэгдлээ'
+            if outcome.result == order_workflow.UPDATED else 'Захиалгын статус өөрчлөгдөөгүй'
         })
 
 
+def _transition_error(outcome, new_status):
+    """Error response for a failed state machine transition, or None."""
+    if outcome.result == order_workflow.NOT_FOUND:
+        return Response(
+            {'error': 'Захиалга олдсонгүй'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if outcome.result == order_workflow.INVALID:
+        allowed = sorted(order_workflow.TRANSITIONS.get(outcome.old_status, ()))
+        return Response(
+            {
+                'error': f'{outcome.old_status} статусаас {new_status} руу шилжих боломжгүй',
+                'allowed': allowed,
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if outcome.result == order_workflow.CONFLICT:
+        return Response(
+            {
+                'error': 'Захиалгын статусыг өөр хүсэлт өөрчилсөн байна',
+                'current_status': outcome.old_status,
+            },
+            status=status.HTTP_409_CONFLICT
+        )
+    return None
+
+
 class OrderApproveView(APIView):
     """
     POST: Approve order (set status to approved)
@@ -394,46 +650,76 @@ class OrderApproveView(APIView):
 
     def post(self, request, order_id):
         """Approve an order"""
-        try:
-            order = Order.objects.get(orderID=order_id)
-        except Order.DoesNotExist:
-            return Response(
-                {'error': 'Захиалга олдсонгүй'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        outcome = order_workflow.transition(
+            order_id,
+            'approved',
+            notes=request.data.get('notes', 'Захиалга батлагдлаа'),
+            updated_by=request.data.get('updated_by', getattr(request.user, 'username', 'system')),
+        )
 
-        if order.status == 'approved':
+        if outcome.result == order_workflow.UNCHANGED:
             return Response(
                 {'message': 'Захиалга аль хэдийн батлагдсан'},
                 status=status.HTTP_200_OK
             )
 
-        if order.status == 'cancelled':
+        if outcome.result == order_workflow.INVALID and outcome.old_status == 'cancelled':
             return Response(
                 {'error': 'Цуцлагдсан захиалгыг батлах боломжгүй'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        old_status = order.status or 'pending'
-        order.status = 'approved'
-        order.save()
-
-        # Create status history
-        OrderStatus.objects.create(
-            order=order,
-            status='approved',
-            notes=request.data.get('notes', 'Захиалга батлагдлаа'),
-            updated_by=request.data.get('updated_by', getattr(request.user, 'username', 'system'))
-        )
+        error = _transition_error(outcome, 'approved')
+        if error:
+            return error
 
         return Response({
-            'orderID': order.orderID,
-            'old_status': old_status,
+            'orderID': order_id,
+            'old_status': outcome.old_status,
             'new_status': 'approved',
             'message': 'Захиалга амжилттай батлагдлаа'
         })
 
 
+class OrderBulkStatusView(APIView):
+    """
+    Олон захиалгын статусыг нэг дор солих
+
+    POST /restaurant/orders/bulk-status/
+        {order_ids: [1, 2, 3], status: 'approved', notes: '', updated_by: 'staff'}
+    """
+    authentication_classes = [JWTAuthentication]
+
+    def post(self, request):
+        order_ids = request.data.get('order_ids')
+        new_status = request.data.get('status')
+
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response({'error': 'order_ids жагсаалт шаардлагатай'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(order_ids) > order_workflow.MAX_BULK:
+            return Response(
+                {'error': f'Нэг удаад {order_workflow.MAX_BULK}-аас ихгүй захиалга'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            order_ids = [int(order_id) for order_id in order_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'order_ids бүхэл тоо байх ёстой'}, status=status.HTTP_400_BAD_REQUEST)
+        if new_status not in order_workflow.STATUSES:
+            return Response(
+                {'error': f'Буруу status. Зөв status: {", ".join(order_workflow.STATUSES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = order_workflow.bulk_transition(
+            order_ids,
+            new_status,
+            notes=request.data.get('notes', ''),
+            updated_by=request.data.get('updated_by', 'system'),
+        )
+        return Response(result)
+
+
 class RevenueReportView(APIView):
     """
     Орлогын тайлан (report)
@@ -443,78 +729,155 @@ class RevenueReportView(APIView):
         &date_to=2025-01-31
         &restaurant_id=1
         &group_by=day|month|restaurant
+        &source=columnar  (from the analytics export, as of its last refresh)
+        &async=1  (computed as a report job, see ReportJobListView)
+    """
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request):
+        params = {
+            'date_from': request.query_params.get('date_from'),
+            'date_to': request.query_params.get('date_to'),
+            'restaurant_id': request.query_params.get('restaurant_id'),
+            'group_by': request.query_params.get('group_by', 'day'),
+        }
+        if request.query_params.get('source') == 'columnar':
+            return _analytics_response(analytics.revenue_report, params)
+        if request.query_params.get('async') in ('1', 'true'):
+            return _job_response('revenue', params)
+        # grouped and summed in the database, see restaurant_web.reports
+        return Response(reports.revenue_report(**params))
+
+
+class TopSellersView(APIView):
+    """
+    Хамгийн их борлуулалттай хоол, ангиллын эзлэх хувь (restaurant_web.top_sellers)
+
+    GET /restaurant/top-sellers/?
+        date_from=2025-01-01
+        &date_to=2025-01-31  (default: the last 30 days)
+        &restaurant_id=1
+        &limit=10
+    Each figure comes with the previous range of the same length.
     """
     authentication_classes = [JWTAuthentication]
 
     def get(self, request):
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
         restaurant_id = request.query_params.get('restaurant_id')
-        group_by = request.query_params.get('group_by', 'day')
+        limit = request.query_params.get('limit', top_sellers.DEFAULT_LIMIT)
+        if (restaurant_id and not str(restaurant_id).isdigit()) or not str(limit).isdigit():
+            return Response({'error': 'restaurant_id, limit нь тоо байх ёстой'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = top_sellers.top_sellers(
+                date_from=request.query_params.get('date_from'),
+                date_to=request.query_params.get('date_to'),
+                restaurant_id=int(restaurant_id) if restaurant_id else None,
+                limit=int(limit),
+            )
+        except ValueError:
+            return Response({'error': 'Огноо буруу байна. Зөв формат: YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
 
-        qs = Order.objects.prefetch_related(
-            Prefetch('orderfood_set', queryset=OrderFood.objects.select_related('foodID', 'foodID__resID'))
+def _analytics_response(analysis, params):
+    restaurant_id = params.get('restaurant_id')
+    if restaurant_id and not str(restaurant_id).isdigit():
+        return Response({'error': 'restaurant_id бүхэл тоо байх ёстой'}, status=status.HTTP_400_BAD_REQUEST)
+    store = columnar.load()
+    if store is None:
+        return Response(
+            {'error': 'Аналитикийн өгөгдөл бэлтгэгдээгүй байна (manage.py refresh_analytics)'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
         )
+    try:
+        result = analysis(store, **params)
+    except ValueError:
+        return Response({'error': 'Огноо буруу байна. Зөв формат: YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if isinstance(result, dict):
+        return Response({**result, 'refreshed_at': store.meta['refreshed_at']})
+    return Response({'results': result, 'refreshed_at': store.meta['refreshed_at']})
 
-        # filter only finished / paid orders (optional: here just ignore cancelled)
-        qs = qs.exclude(status='cancelled')
 
-        if date_from:
-            qs = qs.filter(date__gte=date_from)
-        if date_to:
-            qs = qs.filter(date__lte=date_to)
-        if restaurant_id:
-            qs = qs.filter(orderfood_set__foodID__resID_id=restaurant_id).distinct()
-
-        # raw aggregation in Python for simplicity
-        total_revenue = 0
-        total_orders = 0
-        by_group = {}
-
-        for order in qs:
-            order_total = 0
-            for of in order.orderfood_set.all():
-                order_total += of.price * of.stock
-
-            total_revenue += order_total
-            total_orders += 1
-
-            if group_by == 'month':
-                key = order.date.strftime('%Y-%m')
-            elif group_by == 'restaurant':
-                # if order has multiple restaurants, group by each
-                rest_ids = set(of.foodID.resID_id for of in order.orderfood_set.all())
-                for rid in rest_ids:
-                    rkey = f"restaurant_{rid}"
-                    if rkey not in by_group:
-                        by_group[rkey] = {'revenue': 0, 'orders': 0}
-                    by_group[rkey]['revenue'] += order_total
-                    by_group[rkey]['orders'] += 1
-                continue
-            else:  # day
-                key = order.date.strftime('%Y-%m-%d')
-
-            if key not in by_group:
-                by_group[key] = {'revenue': 0, 'orders': 0}
-            by_group[key]['revenue'] += order_total
-            by_group[key]['orders'] += 1
-
-        # Build response
-        grouped_list = []
-        for key, val in sorted(by_group.items(), key=lambda x: x[0]):
-            grouped_list.append({
-                'group': key,
-                'revenue': val['revenue'],
-                'orders': val['orders'],
-                'avg_order': round(val['revenue'] / val['orders'], 2) if val['orders'] else 0,
-            })
+class AnalyticsView(APIView):
+    """
+    Түүхэн захиалгын шинжилгээ (columnar export дээр, restaurant_web.analytics)
 
-        return Response({
-            'total_revenue': total_revenue,
-            'total_orders': total_orders,
-            'avg_order': round(total_revenue / total_orders, 2) if total_orders else 0,
-            'groups': grouped_list,
-        })
+    GET /restaurant/analytics/basket-size/
+    GET /restaurant/analytics/price-elasticity/?limit=20&min_prices=2
+    GET /restaurant/analytics/restaurant-mix/
+        ?date_from=2025-01-01&date_to=2025-12-31&restaurant_id=1
+    """
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request, analysis):
+        if analysis not in analytics.ANALYSES:
+            return Response(
+                {'error': f'Шинжилгээ олдсонгүй. Боломжтой: {", ".join(analytics.ANALYSES)}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        params = {
+            'date_from': request.query_params.get('date_from'),
+            'date_to': request.query_params.get('date_to'),
+            'restaurant_id': request.query_params.get('restaurant_id'),
+        }
+        if analysis == 'price-elasticity':
+            try:
+                params['limit'] = int(request.query_params.get('limit') or analytics.ELASTICITY_LIMIT)
+                params['min_prices'] = int(request.query_params.get('min_prices') or 2)
+            except ValueError:
+                return Response(
+                    {'error': 'limit, min_prices бүхэл тоо байх ёстой'}, status=status.HTTP_400_BAD_REQUEST
+                )
+        return _analytics_response(analytics.ANALYSES[analysis], params)
+
+
+def _job_response(report, params):
+    try:
+        job = report_jobs.submit(report, params)
+    except KeyError:
+        return Response(
+            {'error': f'Тайлан олдсонгүй. Боломжтой: {", ".join(report_jobs.REPORTS)}'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except ValueError:
+        return Response({'error': 'Тайлангийн параметр буруу байна'}, status=status.HTTP_400_BAD_REQUEST)
+    data = report_jobs.as_dict(job)
+    return Response(data, status=status.HTTP_200_OK if 'result' in data else status.HTTP_202_ACCEPTED)
+
+
+class ReportJobListView(APIView):
+    """
+    Тайлангийн ажил үүсгэх (restaurant_web.report_jobs)
+
+    POST /restaurant/report-jobs/
+        {"report": "revenue", "params": {"date_from": "2025-01-01", "date_to": "2025-12-31", "group_by": "month"}}
+        {"report": "top-sellers", "params": {"restaurant_id": 1, "limit": 10}}
+    202 with the job (poll GET /restaurant/report-jobs/<id>/), or 200 with
+    the result when the same report was computed recently.
+    """
+    authentication_classes = [JWTAuthentication]
+    parser_classes = [JSONParser]
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Хүсэлт объект байх ёстой'}, status=status.HTTP_400_BAD_REQUEST)
+        params = request.data.get('params') or {}
+        if not isinstance(params, dict):
+            return Response({'error': 'params нь объект байх ёстой'}, status=status.HTTP_400_BAD_REQUEST)
+        return _job_response(request.data.get('report'), params)
+
+
+class ReportJobDetailView(APIView):
+    """
+    Тайлангийн ажлын явц, үр дүн
+
+    GET /restaurant/report-jobs/<id>/
+    """
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, ID=job_id)
+        return Response(report_jobs.as_dict(job))
 
 
 class DeliveryListView(APIView):
@@ -526,8 +889,13 @@ class DeliveryListView(APIView):
         &worker_id=1
         &date_from=2025-01-01
         &date_to=2025-01-31
+        &limit=50
+        &cursor=<next|prev>
+        &stream=1|ndjson   (бүх мөрийг урсгалаар буцаана)
     """
     authentication_classes = [JWTAuthentication]
+    renderer_classes = STREAM_RENDERERS
+    paginator = KeysetPaginator(ordering=('-startdate', '-payID'), nullable=('startdate',))
 
     def get(self, request):
         status_filter = request.query_params.get('status')
@@ -535,7 +903,7 @@ class DeliveryListView(APIView):
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
 
-        qs = Delivery.objects.select_related('orderID', 'workerID')
+        qs = Delivery.objects.all()
 
         if status_filter:
             qs = qs.filter(status=status_filter)
@@ -546,25 +914,15 @@ class DeliveryListView(APIView):
         if date_to:
             qs = qs.filter(startdate__lte=date_to)
 
-        deliveries = []
-        for d in qs.order_by('-startdate', '-payID'):
-            deliveries.append({
-                'deliveryID': d.payID,
-                'orderID': d.orderID.orderID,
-                'worker': {
-                    'workerID': d.workerID.workerID,
-                    'workerName': d.workerID.workerName,
-                    'phone': d.workerID.phone,
-                },
-                'status': d.status,
-                'startdate': d.startdate,
-                'enddate': d.enddate,
-            })
+        fields = DELIVERY_FIELDS.select(request)
+        fmt = stream_format(request)
+        if fmt:
+            return stream_response(fmt, self.paginator, fields.query(qs, extra=_keys(self.paginator)), fields)
+        page = self.paginator.paginate(fields.query(qs, extra=_keys(self.paginator)), request)
 
-        return Response({
-            'count': len(deliveries),
-            'results': deliveries,
-        })
+        deliveries = fields.serialize(page.rows)
+
+        return Response(page.envelope(deliveries))
 
 
 class DeliveryDetailView(APIView):
@@ -585,10 +943,8 @@ class DeliveryDetailView(APIView):
         order = d.orderID
         order_foods = order.orderfood_set.select_related('foodID')
         items = []
-        total_price = 0
         for of in order_foods:
             item_total = of.price * of.stock
-            total_price += item_total
             items.append({
                 'foodID': of.foodID.foodID,
                 'foodName': of.foodID.foodName,
@@ -612,7 +968,7 @@ class DeliveryDetailView(APIView):
                 'location': order.location,
                 'date': order.date,
                 'status': order.status,
-                'total_price': total_price,
+                'total_price': order.total_price,
                 'items': items,
             }
         })
@@ -653,6 +1009,26 @@ class DeliveryDetailView(APIView):
 
 # ==================== RESTAURANT PROFILE MANAGEMENT ====================
 
+class RestaurantListView(APIView):
+    """
+    GET: List restaurants with their rating
+        ?sort=rating  (best rated first)
+    """
+    authentication_classes = [JWTAuthentication]
+    paginator = KeysetPaginator(ordering=('resID',))
+    rating_paginator = KeysetPaginator(ordering=('-rating_average', 'resID'))
+
+    def get(self, request):
+        """List restaurants"""
+        queryset = _rated(Restaurant.objects.all())
+        paginator = self.rating_paginator if request.query_params.get('sort') == 'rating' else self.paginator
+
+        fields = RESTAURANT_FIELDS.select(request)
+        page = paginator.paginate(fields.query(queryset, extra=_keys(paginator)), request)
+
+        return Response(page.envelope(fields.serialize(page.rows)))
+
+
 class RestaurantProfileView(APIView):
     """
     GET: Get restaurant profile
@@ -800,6 +1176,7 @@ class CouponListView(APIView):
     POST: Create new coupon
     """
     authentication_classes = [JWTAuthentication]
+    paginator = KeysetPaginator(ordering=('-ID',))
 
     def get(self, request):
         """List coupons with optional filters"""
@@ -809,20 +1186,12 @@ class CouponListView(APIView):
         if active_only:
             queryset = queryset.filter(active=True)
 
-        coupons = []
-        for coupon in queryset.order_by('-ID'):
-            coupons.append({
-                'ID': coupon.ID,
-                'code': coupon.code,
-                'percent': coupon.percent,
-                'duration': coupon.duration,
-                'active': coupon.active,
-            })
+        fields = COUPON_FIELDS.select(request)
+        page = self.paginator.paginate(fields.query(queryset, extra=_keys(self.paginator)), request)
 
-        return Response({
-            'count': len(coupons),
-            'results': coupons
-        })
+        coupons = fields.serialize(page.rows)
+
+        return Response(page.envelope(coupons))
 
     def post(self, request):
         """Create new coupon"""
@@ -938,6 +1307,8 @@ class ReviewListView(APIView):
     GET: List all reviews/comments for restaurant or food
     """
     authentication_classes = [JWTAuthentication]
+    renderer_classes = STREAM_RENDERERS
+    paginator = KeysetPaginator(ordering=('-date', '-commID'))
 
     def get(self, request):
         """List reviews with filters"""
@@ -945,7 +1316,7 @@ class ReviewListView(APIView):
         food_id = request.query_params.get('food_id')
         min_rating = request.query_params.get('min_rating')
 
-        queryset = Comment.objects.select_related('userID', 'resID', 'foodID').all()
+        queryset = Comment.objects.all()
 
         if restaurant_id:
             queryset = queryset.filter(resID_id=restaurant_id)
@@ -954,35 +1325,27 @@ class ReviewListView(APIView):
         if min_rating:
             queryset = queryset.filter(review__gte=min_rating)
 
-        reviews = []
-        for review in queryset.order_by('-date'):
-            reviews.append({
-                'commID': review.commID,
-                'user': {
-                    'userID': review.userID.userID,
-                    'userName': review.userID.userName,
-                },
-                'restaurant': {
-                    'resID': review.resID.resID,
-                    'resName': review.resID.resName,
-                },
-                'food': {
-                    'foodID': review.foodID.foodID,
-                    'foodName': review.foodID.foodName,
-                },
-                'review': review.review,
-                'comment': review.comment,
-                'date': review.date,
-            })
+        def rating():
+            # a restaurant's or a food's reviews have stored aggregates; other filters are counted
+            if min_rating or (restaurant_id and food_id):
+                summary = ratings.summarize(queryset)
+            elif food_id:
+                summary = ratings.food(food_id)
+            else:
+                summary = ratings.restaurant(restaurant_id)
+            return {'average_rating': summary['average'], 'rating_distribution': summary['distribution']}
+
+        fields = REVIEW_FIELDS.select(request)
+        fmt = stream_format(request)
+        if fmt:
+            return stream_response(
+                fmt, self.paginator, fields.query(queryset, extra=_keys(self.paginator)), fields, extra=rating,
+            )
+        page = self.paginator.paginate(fields.query(queryset, extra=_keys(self.paginator)), request)
 
-        # Calculate average rating
-        avg_rating = queryset.aggregate(avg=Avg('review'))['avg'] or 0
+        reviews = fields.serialize(page.rows)
 
-        return Response({
-            'count': len(reviews),
-            'average_rating': round(avg_rating, 2),
-            'results': reviews
-        })
+        return Response(page.envelope(reviews, **rating()))
 
 
 class ReviewDetailView(APIView):
@@ -994,33 +1357,16 @@ class ReviewDetailView(APIView):
 
     def get(self, request, review_id):
         """Get review details"""
+        fields = REVIEW_DETAIL_FIELDS.select(request)
         try:
-            review = Comment.objects.select_related('userID', 'resID', 'foodID').get(commID=review_id)
+            review = fields.query(Comment.objects.all()).get(commID=review_id)
         except Comment.DoesNotExist:
             return Response(
                 {'error': 'Сэтгэгдэл олдсонгүй'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        return Response({
-            'commID': review.commID,
-            'user': {
-                'userID': review.userID.userID,
-                'userName': review.userID.userName,
-                'email': review.userID.email,
-            },
-            'restaurant': {
-                'resID': review.resID.resID,
-                'resName': review.resID.resName,
-            },
-            'food': {
-                'foodID': review.foodID.foodID,
-                'foodName': review.foodID.foodName,
-            },
-            'review': review.review,
-            'comment': review.comment,
-            'date': review.date,
-        })
+        return Response(fields.serialize([review])[0])
 
     def delete(self, request, review_id):
         """Delete review"""
@@ -1047,43 +1393,36 @@ class InventoryListView(APIView):
     POST: Create inventory entry
     """
     authentication_classes = [JWTAuthentication]
+    renderer_classes = STREAM_RENDERERS
+    paginator = KeysetPaginator(ordering=('ID',))
 
     def get(self, request):
         """List inventory with filters"""
         restaurant_id = request.query_params.get('restaurant_id')
         low_stock_only = request.query_params.get('low_stock_only', 'false').lower() == 'true'
 
-        queryset = Inventory.objects.select_related('food', 'restaurant').all()
+        queryset = Inventory.objects.all()
 
         if restaurant_id:
             queryset = queryset.filter(restaurant_id=restaurant_id)
         if low_stock_only:
             queryset = queryset.filter(stock_quantity__lte=F('min_stock_level'))
 
-        inventory_items = []
-        for inv in queryset:
-            inventory_items.append({
-                'ID': inv.ID,
-                'food': {
-                    'foodID': inv.food.foodID,
-                    'foodName': inv.food.foodName,
-                },
-                'restaurant': {
-                    'resID': inv.restaurant.resID,
-                    'resName': inv.restaurant.resName,
-                },
-                'stock_quantity': inv.stock_quantity,
-                'min_stock_level': inv.min_stock_level,
-                'unit': inv.unit,
-                'is_low_stock': inv.is_low_stock,
-                'last_updated': inv.last_updated,
-            })
+        fields = INVENTORY_FIELDS.select(request)
+        fmt = stream_format(request)
+        if fmt:
+            return stream_response(
+                fmt, self.paginator, fields.query(queryset, extra=_keys(self.paginator)), fields,
+                extra=lambda: {'low_stock_count': queryset.filter(stock_quantity__lte=F('min_stock_level')).count()},
+            )
+        page = self.paginator.paginate(fields.query(queryset, extra=_keys(self.paginator)), request)
 
-        return Response({
-            'count': len(inventory_items),
-            'low_stock_count': sum(1 for inv in queryset if inv.is_low_stock),
-            'results': inventory_items
-        })
+        inventory_items = fields.serialize(page.rows)
+
+        # Low-stock total covers every filtered row, not just this page
+        low_stock_count = queryset.filter(stock_quantity__lte=F('min_stock_level')).count()
+
+        return Response(page.envelope(inventory_items, low_stock_count=low_stock_count))
 
     def post(self, request):
         """Create inventory entry"""
@@ -1333,100 +1672,82 @@ class WorkerDetailView(APIView):
         )
 
 
+# ==================== LIVE ORDER FEED ====================
+
+FEED_KEEPALIVE = 15
+
+
+async def order_feed(request):
+    """
+    Захиалгын шууд урсгал (Server-Sent Events, ASGI)
+
+    GET /restaurant/orders/feed/?restaurant_id=1[&token=<jwt>]
+        Last-Event-ID: <сүүлд хүлээн авсан id>  (эсвэл ?last_event_id=)
+
+    Events: order.created, order.status
+    """
+    # EventSource cannot send headers, so the token may also come as ?token=
+    token = request.GET.get('token')
+    auth = request.headers.get('Authorization', '')
+    if auth:
+        parts = auth.split()
+        if len(parts) != 2 or parts[0].lower() != 'bearer':
+            return JsonResponse({'error': 'Invalid token header'}, status=401)
+        token = parts[1]
+    if token:
+        try:
+            decode_token(token)
+        except jwt.InvalidTokenError:
+            return JsonResponse({'error': 'Invalid token'}, status=401)
+
+    restaurant_id = request.GET.get('restaurant_id', '')
+    if not restaurant_id.isdigit():
+        return JsonResponse({'error': 'restaurant_id шаардлагатай'}, status=400)
+    if not hasattr(request, 'scope'):
+        # under WSGI the endless stream would be buffered, never sent
+        return JsonResponse({'error': 'Энэ endpoint ASGI сервер шаардлагатай'}, status=501)
+    restaurant_id = int(restaurant_id)
+
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or ''
+    last_id = int(last_id) if last_id.isdigit() else None
+
+    backend = await sync_to_async(events.get_backend)()
+    # subscribe before reading the backlog so nothing falls in between
+    subscription = events.hub.subscribe(restaurant_id)
+
+    async def stream():
+        seen = last_id or 0
+        try:
+            yield 'retry: 3000\n\n'
+            if last_id is not None:
+                for event in await sync_to_async(backend.since)(restaurant_id, last_id):
+                    seen = max(seen, event['id'])
+                    yield events.format_event(event)
+            while not subscription.overflowed:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), FEED_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if event['id'] > seen:
+                    seen = event['id']
+                    yield events.format_event(event)
+        finally:
+            events.hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # ==================== ENHANCED DASHBOARD ====================
 
 @api_view(['GET'])
 def dashboard(request):
     """Enhanced dashboard with comprehensive statistics"""
+    # one aggregate query per section, cached per restaurant; see restaurant_web.dashboard
     restaurant_id = request.query_params.get('restaurant_id')
-    
-    # Base querysets
-    orders_qs = Order.objects.prefetch_related('orderfood_set')
-    foods_qs = Food.objects.all()
-    
-    if restaurant_id:
-        orders_qs = orders_qs.filter(orderfood_set__foodID__resID_id=restaurant_id).distinct()
-        foods_qs = foods_qs.filter(resID_id=restaurant_id)
-
-    # Order statistics
-    total_orders = orders_qs.count()
-    pending_orders = orders_qs.filter(status='pending').count()
-    approved_orders = orders_qs.filter(status='approved').count()
-    preparing_orders = orders_qs.filter(status='preparing').count()
-    ready_orders = orders_qs.filter(status='ready').count()
-    delivered_orders = orders_qs.filter(status='delivered').count()
-    cancelled_orders = orders_qs.filter(status='cancelled').count()
-
-    # Today's statistics
-    today = timezone.now().date()
-    today_orders = orders_qs.filter(date=today).count()
-    today_revenue = 0
-    for order in orders_qs.filter(date=today):
-        for of in order.orderfood_set.all():
-            today_revenue += of.price * of.stock
-
-    # This week's statistics
-    week_start = today - timedelta(days=today.weekday())
-    week_orders = orders_qs.filter(date__gte=week_start).count()
-    week_revenue = 0
-    for order in orders_qs.filter(date__gte=week_start):
-        for of in order.orderfood_set.all():
-            week_revenue += of.price * of.stock
-
-    # Menu statistics
-    total_foods = foods_qs.count()
-    available_foods = Menu.objects.filter(is_available=True, food__in=foods_qs).count() if restaurant_id else Menu.objects.filter(is_available=True).count()
-
-    # Inventory statistics
-    inventory_qs = Inventory.objects.all()
-    if restaurant_id:
-        inventory_qs = inventory_qs.filter(restaurant_id=restaurant_id)
-    low_stock_items = inventory_qs.filter(stock_quantity__lte=F('min_stock_level')).count()
-    total_inventory_items = inventory_qs.count()
-
-    # Review statistics
-    reviews_qs = Comment.objects.all()
-    if restaurant_id:
-        reviews_qs = reviews_qs.filter(resID_id=restaurant_id)
-    total_reviews = reviews_qs.count()
-    avg_rating = reviews_qs.aggregate(avg=Avg('review'))['avg'] or 0
-
-    # Worker statistics
-    total_workers = Worker.objects.count()
-    active_deliveries = Delivery.objects.filter(status='on_the_way').count()
-
-    return Response({
-        'orders': {
-            'total': total_orders,
-            'pending': pending_orders,
-            'approved': approved_orders,
-            'preparing': preparing_orders,
-            'ready': ready_orders,
-            'delivered': delivered_orders,
-            'cancelled': cancelled_orders,
-        },
-        'today': {
-            'orders': today_orders,
-            'revenue': today_revenue,
-        },
-        'this_week': {
-            'orders': week_orders,
-            'revenue': week_revenue,
-        },
-        'menu': {
-            'total_foods': total_foods,
-            'available_foods': available_foods,
-        },
-        'inventory': {
-            'total_items': total_inventory_items,
-            'low_stock_items': low_stock_items,
-        },
-        'reviews': {
-            'total': total_reviews,
-            'average_rating': round(avg_rating, 2),
-        },
-        'workers': {
-            'total': total_workers,
-            'active_deliveries': active_deliveries,
-        }
-    })
+    if restaurant_id and not restaurant_id.isdigit():
+        return Response({'error': 'restaurant_id бүхэл тоо байх ёстой'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(dashboard_stats.stats(restaurant_id))